@@ -1,34 +1,195 @@
+import json
+import os
 import random
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, Any, List
-from data_handler import load_character_dna, save_character_dna, load_json, save_json, load_supporting_characters, backfill_last_update
-from gemini_integration import generate_gemini_content
-from config import DNA_FILE, INSTAGRAM_HISTORY_FILE, TWITTER_HISTORY_FILE, WHATSAPP_HISTORY_FILE, RANDOM_EVENTS_FILE, SUPPORTING_CHARS_DIR, RELATIONSHIP_FILE
+from data_handler import load_character_dna, save_character_dna, load_json, save_json
+from migrations import run_migrations
+from history_archive import ArchivedHistory, HistoryArchive, archive_cold_records
+from record_schemas import CharacterDNA, EventLogEntry, Post, SchemaError, Tweet, WhatsAppMessage, validate, validate_records
+from character_registry import CharacterRegistry
+from comment_index import CommentIndex
+from post_queue import DuePostQueue
+from interaction_engine import InteractionEngine
+from history_store import open_history_store
+from sqlite_store import get_database
+from write_behind import writer
+from simulation_clock import wall_clock
+from world_log import get_world_log
+from gemini_integration import generate_gemini_content, stream_gemini_content
+from content_extractors import stream_extractor, TASK_POST_CAPTION, TASK_TWEET, TASK_COMMENT, TASK_REPLY, TASK_WHATSAPP, TASK_EVENT
+from rate_limiter import GenerationError
+from fallback_content import FallbackContentGenerator, is_degraded
+from utils import parse_timestamp
+from config import DNA_FILE, INSTAGRAM_HISTORY_FILE, TWITTER_HISTORY_FILE, WHATSAPP_HISTORY_FILE, RANDOM_EVENTS_FILE, SUPPORTING_CHARS_DIR, RELATIONSHIP_FILE, RELATIONSHIP_GRAPH_FILE, MAX_CONCURRENT_GENERATIONS, BATCH_COMMENT_GENERATION, DEGRADED_CONTENT_ENABLED, HISTORY_STORAGE, CHARACTER_REFRESH_INTERVAL
+from config import HISTORY_ARCHIVE_DIR, HISTORY_ARCHIVE_AFTER_DAYS, HISTORY_ARCHIVE_CODEC, DATA_DIR, SCHEMA_VERSIONS_FILE, SQLITE_DB_FILE
+from config import POST_INTERACTION_BASE_INTERVAL, POST_INTERACTION_AGE_SCALE, POST_INTERACTION_MAX_INTERVAL, HISTORY_MEMORY_WINDOW, HISTORY_PAGE_SIZE
 import uuid
 
 class CharacterSimulator:
-    def __init__(self):
-        
-        backfill_last_update(INSTAGRAM_HISTORY_FILE)
-
-        
-        self.dna = load_character_dna(DNA_FILE)
-        self.instagram_history = load_json(INSTAGRAM_HISTORY_FILE)
-        self.twitter_history = load_json(TWITTER_HISTORY_FILE)
-        self.whatsapp_history = load_json(WHATSAPP_HISTORY_FILE)
-        self.random_events = load_json(RANDOM_EVENTS_FILE)
-        self.supporting_characters = load_supporting_characters(SUPPORTING_CHARS_DIR)
+    def __init__(self, data_dir=None, character_registry=None, generation_pool=None, clock=None, interaction_engine=None):
+        """Loads a main character from `data_dir` (DATA_DIR by default).
+
+        A World passes its shared character registry, generation pool and
+        interaction engine so that many simulators can run side by side without
+        each loading its own copy.
+        All timestamps and time-of-day decisions come from `clock` (real time by
+        default; a VirtualClock for fast-forwarded runs).
+        """
+        self.clock = clock or wall_clock
+        self.data_dir = data_dir or DATA_DIR
+        self.dna_file = self._data_path(DNA_FILE)
+        self.instagram_history_file = self._data_path(INSTAGRAM_HISTORY_FILE)
+        self.twitter_history_file = self._data_path(TWITTER_HISTORY_FILE)
+        self.whatsapp_history_file = self._data_path(WHATSAPP_HISTORY_FILE)
+        self.random_events_file = self._data_path(RANDOM_EVENTS_FILE)
+        if HISTORY_STORAGE == "wal":
+            # DNA, histories and the events log are recovered together from one write-ahead log
+            self.world_log = get_world_log(self.data_dir)
+            self.dna = self.world_log.recover("dna", lambda: load_character_dna(self.dna_file))
+            self.world_log.track("dna", lambda: self.dna, lambda dna: save_character_dna(self.dna_file, dna))
+        else:
+            self.world_log = None
+            self.dna = load_character_dna(self.dna_file)
+        self.instagram_store = open_history_store(self.instagram_history_file)
+        self.twitter_store = open_history_store(self.twitter_history_file)
+        self.whatsapp_store = open_history_store(self.whatsapp_history_file)
+        self.instagram_history = self.instagram_store.load()
+        self.twitter_history = self.twitter_store.load()
+        self.whatsapp_history = self.whatsapp_store.load()
+        if self.world_log is not None:
+            self.random_events = self.world_log.recover("random_events", self._load_random_events)
+            self.world_log.track("random_events", lambda: self.random_events, lambda events: save_json(self.random_events_file, events))
+        else:
+            self.random_events = self._load_random_events()
+            if HISTORY_STORAGE == "sqlite":
+                self._load_event_log_from_database()
         self.name = self.dna.get("Basic Information", {}).get("Name", "AI Character")
-        self.relationships = load_json(RELATIONSHIP_FILE)
+        # Parsed supporting characters and relationships, reloaded only when their files change
+        self.character_registry = character_registry or CharacterRegistry(SUPPORTING_CHARS_DIR, RELATIONSHIP_FILE, CHARACTER_REFRESH_INTERVAL, RELATIONSHIP_GRAPH_FILE)
+        # Interaction chances for all character pairs, and the relationship graph they are based on
+        self.interaction_engine = interaction_engine or InteractionEngine()
+        self.relationship_graph = self.interaction_engine.graph
+        self._graph_version = None
         self._available_characters = []
         self._refresh_available_characters()
+        if self.world_log is not None:
+            # Snapshotted for a complete picture of the world; relationships.json stays the source
+            self.world_log.track("relationships", lambda: self.relationships)
+        # Only once every dataset is recovered and tracked: a flush during a migration may take a snapshot
+        self._run_migrations()
+        self._validate_loaded_data()
+        self.instagram_archive = self._open_archive("instagram_history")
+        self.whatsapp_archive = self._open_archive("whatsapp_history")
+        if HISTORY_ARCHIVE_AFTER_DAYS > 0:
+            archive_cold_records(self.instagram_store, self.instagram_archive, HISTORY_ARCHIVE_AFTER_DAYS, self.clock.now())
+            archive_cold_records(self.whatsapp_store, self.whatsapp_archive, HISTORY_ARCHIVE_AFTER_DAYS, self.clock.now())
+        # Feeds page through the live history and then on into the archive
+        self.instagram_feed = ArchivedHistory(self.instagram_store, self.instagram_archive)
+        self.whatsapp_feed = ArchivedHistory(self.whatsapp_store, self.whatsapp_archive)
+        # id -> comment and parent -> replies lookups for the loaded posts, kept current on insert;
+        # bounded like the posts themselves when only a window of them is in memory
+        self.comment_index = CommentIndex(HISTORY_MEMORY_WINDOW + HISTORY_PAGE_SIZE if HISTORY_STORAGE in ("paged", "sqlite") else None)
+        self.comment_index.build(self.instagram_history)
+        # Posts ordered by when they next get an interaction pass (old posts less often)
+        self.post_queue = DuePostQueue(POST_INTERACTION_BASE_INTERVAL, POST_INTERACTION_AGE_SCALE, POST_INTERACTION_MAX_INTERVAL)
+        for post in self.instagram_history:
+            self.post_queue.schedule(post, self.clock.now())
+        # Bounded pool so independent comment threads are generated concurrently
+        self._generation_pool = generation_pool or ThreadPoolExecutor(max_workers=MAX_CONCURRENT_GENERATIONS)
+        # Callbacks invoked when mood or energy change (e.g. to drop pre-generated drafts)
+        self.state_listeners = []
+        # Template content used while the LLM backend is unavailable
+        self._fallback_content = FallbackContentGenerator()
         
-    def _refresh_available_characters(self):
+    def _data_path(self, path):
+        """Maps a path from config (under DATA_DIR) into this character's data directory."""
+        return os.path.join(self.data_dir, os.path.basename(path))
+
+    def _open_archive(self, name):
+        """The archive of a history, if archiving is on or an earlier run archived records (None otherwise)."""
+        directory = os.path.join(self._data_path(HISTORY_ARCHIVE_DIR), name)
+        if HISTORY_ARCHIVE_AFTER_DAYS > 0 or os.path.isdir(directory):
+            return HistoryArchive(directory, HISTORY_ARCHIVE_CODEC)
+        return None
+
+    def _run_migrations(self):
+        """Brings the loaded histories up to the current schema version (a no-op once they are)."""
+        versions_file = self._data_path(SCHEMA_VERSIONS_FILE)
+        context = {'main_character': self.dna.get("Basic Information", {}).get("Name", "AI Character"),
+                   'now': self.clock.now().isoformat()}
+        run_migrations("instagram_history", self.instagram_store, context, versions_file)
+        run_migrations("twitter_history", self.twitter_store, context, versions_file)
+        run_migrations("whatsapp_history", self.whatsapp_store, context, versions_file)
+
+    def _load_random_events(self):
+        """Reads the event definitions and log, as a {"events": [...], "log": [...]} dict even if the file is missing."""
+        random_events = load_json(self.random_events_file)
+        return random_events if isinstance(random_events, dict) else {"log": []}
+
+    def _load_event_log_from_database(self):
+        """In SQLite mode the events log lives in the events table, imported from the JSON file on first use."""
+        db = get_database(self._data_path(SQLITE_DB_FILE))
+        if db.is_empty("events"):
+            db.import_events(self.random_events.get("log", []))
+        self.random_events["log"] = db.event_log()
+
+    def _validate_loaded_data(self):
+        """Checks loaded DNA and histories against their record schemas.
+
+        Invalid DNA is only logged; an invalid history or event record raises SchemaError.
+        """
+        try:
+            validate(CharacterDNA, self.dna, self.dna_file)
+        except SchemaError as e:
+            print(f"DEBUG: Invalid character DNA: {e}")
+        validate_records(Post, self.instagram_history, self.instagram_history_file)
+        validate_records(Tweet, self.twitter_history, self.twitter_history_file)
+        validate_records(WhatsAppMessage, self.whatsapp_history, self.whatsapp_history_file)
+        validate_records(EventLogEntry, self.random_events.get("log", []), self.random_events_file)
+
+    def _refresh_available_characters(self, force=False):
         """Refreshes the list of available supporting character names."""
-        self.supporting_characters = load_supporting_characters(SUPPORTING_CHARS_DIR)
-        self.relationships = load_json(RELATIONSHIP_FILE)
+        self.character_registry.refresh(force)
+        self.supporting_characters = self.character_registry.characters
+        self.relationships = self.character_registry.relationships
+        if self._graph_version != self.character_registry.version:
+            # relationships.json holds this character's relationships, in both directions
+            self.relationship_graph.add_relationships(self.name, self.relationships, symmetric=True)
+            for source, relationships in self.character_registry.graph_relationships.items():
+                self.relationship_graph.add_relationships(source, relationships)
+            self._graph_version = self.character_registry.version
+        self.interaction_engine.sync(self.supporting_characters, self.character_registry.version)
         self._available_characters = list(self.relationships.keys()) # Just the names
 
+    def _generate_text(self, prompt, author_dna=None, **kwargs):
+        """Generates content, falling back to template content from `author_dna` if generation fails.
+
+        Fallback text is a DegradedText, so callers can flag the entries it ends up in.
+        """
+        try:
+            return generate_gemini_content(prompt, **kwargs)
+        except GenerationError as e:
+            if author_dna is None or not DEGRADED_CONTENT_ENABLED:
+                raise
+            print(f"DEBUG: Using degraded content: {e}")
+            return self._fallback_content.generate(kwargs.get('task'), author_dna)
+
+    def _try_generate(self, prompt, author_dna=None, **kwargs):
+        """Like `_generate_text`, but returns None instead of raising when generation fails."""
+        try:
+            return self._generate_text(prompt, author_dna, **kwargs)
+        except GenerationError as e:
+            print(f"DEBUG: Skipping generation: {e}")
+            return None
+
+    @staticmethod
+    def _flag_degraded(record, *texts):
+        """Marks a history entry built from degraded content so it can be regenerated later."""
+        if any(is_degraded(text) for text in texts):
+            record['degraded'] = True
+        return record
+
     def _get_random_supporting_character(self):
         if not self._available_characters:
             print("WARNING: No available supporting characters. Returning None.")
@@ -51,8 +212,27 @@ class CharacterSimulator:
        context += f"They enjoy the hobbies: {', '.join(character_dna.get('Hobbies', []))}. Their diet is {character_dna.get('Diet', 'unknown')} and their favourite foods are {', '.join(character_dna.get('Favourite foods', []))}"
        return context
 
-    def _generate_social_media_post(self, platform: str):
-        """Generates a social media post."""
+    def _stream_content(self, prompt, task, on_content, author_dna, **kwargs):
+        """Streams a generation, reporting the text extracted so far after every chunk."""
+        extractor = stream_extractor(task)
+        try:
+            for chunk in stream_gemini_content(prompt, task=task, **kwargs):
+                on_content(extractor.feed(chunk))
+        except GenerationError as e:
+            if not DEGRADED_CONTENT_ENABLED:
+                raise
+            print(f"DEBUG: Using degraded content: {e}")
+            text = self._fallback_content.generate(task, author_dna)
+            on_content(text)
+            return text
+        return extractor.text
+
+    def _generate_social_media_post(self, platform: str, on_content=None):
+        """Generates a social media post.
+
+        If `on_content` is given, the post content is streamed and the callback receives
+        the partially generated content as it arrives.
+        """
         prompt_prefix = f"You are simulating a social media post for {self.name}."
         character_context = self._get_character_context(self.dna)
 
@@ -60,16 +240,24 @@ class CharacterSimulator:
 
             prompt_describe = f"{prompt_prefix} {character_context} Generate a short description of the post including the item in the photo and the emotion, like 'posted a picture of their new dog while looking happy', limit to 12 words"
 
-            description = generate_gemini_content(prompt_describe)
+            # The prompt is keyed on the character state, so an unchanged state reuses its description;
+            # the caption is generated fresh so that consecutive posts still differ
+            description = self._generate_text(prompt_describe, self.dna)
 
             prompt_content = f"{prompt_prefix} {character_context} Based on the post description : '{description}', generate a short caption for the post. Include a suggestion for a visual description (if not using real images). The response should start with 'Caption:' and should be followed by the caption. And should be followed by 'Visual Description:' and then the visual description."
-            content = generate_gemini_content(prompt_content)
-            return {"description": description, "content": content}
+            if on_content:
+                content = self._stream_content(prompt_content, TASK_POST_CAPTION, on_content, self.dna, use_cache=False)
+            else:
+                content = self._generate_text(prompt_content, self.dna, task=TASK_POST_CAPTION, use_cache=False)
+            return self._flag_degraded({"description": description, "content": content}, description, content)
 
         elif platform == "Twitter":
             prompt_content = f"{prompt_prefix} {character_context} Generate a short, opinionated Tweet (no more than 280 characters). The response should start with 'Tweet:' followed by the tweet content."
-            content = generate_gemini_content(prompt_content)
-            return {"content": content}
+            if on_content:
+                content = self._stream_content(prompt_content, TASK_TWEET, on_content, self.dna, use_cache=False)
+            else:
+                content = self._generate_text(prompt_content, self.dna, task=TASK_TWEET, use_cache=False)
+            return self._flag_degraded({"content": content}, content)
 
     def _generate_whatsapp_message(self, recipient_dna: Dict[str, Any]):
         """Generates a WhatsApp message."""
@@ -79,58 +267,34 @@ class CharacterSimulator:
         reciever_context = self._get_character_context(recipient_dna)
 
         prompt = f"You are simulating a whatsapp message. {sender_context} The main character wants to message {recipient_name} who is {reciever_context}. Simulate a short Whatsapp message from {self.name} to {recipient_name}."
-        message = generate_gemini_content(prompt)
+        message = self._generate_text(prompt, self.dna, task=TASK_WHATSAPP, use_cache=False)
         return message
 
     def _should_interact(self, char1_name, char2_name, relationship_strength):
         """Determines if two characters should interact based on mood and relationship."""
+        return self.interaction_engine.should_interact(char1_name, char2_name, relationship_strength)
 
-        char1_data = self.supporting_characters.get(char1_name)
-        char2_data = self.supporting_characters.get(char2_name)
-
-
-        base_chance = relationship_strength / 100
-
-        social_modifier = char1_data.get('social_battery', 5) / 10
-
-        mood_map = {
-            'Happy': 1.2,
-            'Excited': 1.3,
-            'Content': 1.0,
-            'Neutral': 0.8,
-            'Tired': 0.6,
-            'Irritated': 0.4,
-            'Angry': 0.2
-        }
-        mood_modifier = mood_map.get(char1_data.get('current_mood', 'Neutral'), 0.8)
-
-        interaction_chance = base_chance * social_modifier * mood_modifier
-
-        print(f"DEBUG: Interaction check for {char1_name} and {char2_name}:")
-        print(f"DEBUG:   Relationship Strength: {relationship_strength}")
-        print(f"DEBUG:   Social Modifier: {social_modifier}")
-        print(f"DEBUG:   Mood Modifier: {mood_modifier}")
-        print(f"DEBUG:   Interaction Chance: {interaction_chance}")
-        result = random.random() < interaction_chance
-        print(f"DEBUG:   Result: {result}")
-        return result
+    def _plan_comment_thread(self, initial_author, max_depth=3):
+        """Decides who replies in a comment thread, without generating any text.
 
-    def _generate_comment_thread(self, post, initial_comment, max_depth=3):
-        thread = [initial_comment]
+        Returns a list of (responder_name, relationship_strength) tuples, where each
+        responder replies to the previous entry (the first one replies to `initial_author`).
+        """
+        plan = []
+        last_author = initial_author
         current_depth = 0
 
         commenters = set()  # Keep track of who has commented
 
         while current_depth < max_depth:
-            last_comment = thread[-1]
-            commenters.add(last_comment['author'])  # Add the last commenter
+            commenters.add(last_author)  # Add the last commenter
 
             potential_responders = [
                 char_name for char_name in self._available_characters
-                if char_name != last_comment['author'] and char_name not in commenters
+                if char_name != last_author and char_name not in commenters
             ]
 
-            if last_comment['author'] != self.name and self.name not in commenters:
+            if last_author != self.name and self.name not in commenters:
                 potential_responders.append(self.name)
             
             if not potential_responders:
@@ -147,56 +311,225 @@ class CharacterSimulator:
               break
             
             responder_data = self.supporting_characters.get(responder_name)
-            commenter_data = self.supporting_characters.get(last_comment['author'])
+            commenter_data = self.supporting_characters.get(last_author)
 
             if responder_data and commenter_data:
-                relationship_strength = self.relationships.get(responder_name, {}).get("interaction_frequency", 0.5) * 100
-                if self._should_interact(responder_name, last_comment['author'], relationship_strength):
+                relationship_strength = self.relationship_graph.strength(responder_name, last_author)
+                if self._should_interact(responder_name, last_author, relationship_strength):
+
+                    if self._should_interact(responder_name, last_author, relationship_strength):
+                        plan.append((responder_name, relationship_strength))
+                        last_author = responder_name
+
+                        if random.random() < 0.7 - (current_depth * 0.2):
+                            break
+            elif not commenter_data:
+                print(f"DEBUG: Commenter data not found for {last_author}")
+            elif not responder_data:
+                print(f"DEBUG: Responder data not found for {responder_name}")
+
+            current_depth += 1
+
+        return plan
 
-                    if self._should_interact(responder_name, last_comment['author'], relationship_strength):
-                        response_prompt = f"""
-                    You are {responder_name}, responding to this comment: "{last_comment['text']}" by {last_comment['author']} on the post: "{post['content']}"
+    def _reply_prompt(self, responder_name, responder_data, relationship_strength, parent_comment, post_content):
+        """Builds the prompt for replying to a comment."""
+        return f"""
+                    You are {responder_name}, responding to this comment: "{parent_comment['text']}" by {parent_comment['author']} on the post: "{post_content}"
 
-                    Your relationship with {last_comment['author']} is {relationship_strength}/100.
+                    Your relationship with {parent_comment['author']} is {relationship_strength}/100.
                     Your current mood is {responder_data.get('current_mood', 'Neutral')}.
 
                     Generate a natural, short response that reflects your personality,
                     mood, and relationship with the commenter.
                     Keep it under 2 sentences.
                     """
-                        response_text = generate_gemini_content(response_prompt)
 
-                        thread.append({
-                            'author': responder_name,  # Corrected: Use responder_name
-                            'text': response_text,
-                            'timestamp': datetime.now().isoformat(),
-                            'parent_id': last_comment.get('id'),
-                            'id': str(uuid.uuid4())
-                        })
-
-                        if random.random() < 0.7 - (current_depth * 0.2):
-                            break
-                elif not commenter_data:
-                    print(f"DEBUG: Commenter data not found for {last_comment['author']}")
-                elif not responder_data:
-                    print(f"DEBUG: Responder data not found for {responder_name}")
+    def _generate_comment_thread(self, post, initial_comment, max_depth=3):
+        thread = [initial_comment]
 
-            current_depth += 1
+        for responder_name, relationship_strength in self._plan_comment_thread(initial_comment['author'], max_depth):
+            last_comment = thread[-1]
+            responder_data = self.supporting_characters.get(responder_name)
+            response_prompt = self._reply_prompt(responder_name, responder_data, relationship_strength, last_comment, post['content'])
+            response_text = self._try_generate(response_prompt, responder_data, task=TASK_REPLY, use_cache=False)
+            if response_text is None:
+                break
+
+            thread.append(self._flag_degraded({
+                'author': responder_name,  # Corrected: Use responder_name
+                'text': response_text,
+                'timestamp': self.clock.now().isoformat(),
+                'parent_id': last_comment.get('id'),
+                'id': str(uuid.uuid4())
+            }, response_text))
 
         return thread
 
-    def simulate_instagram_post(self):
-            """Simulates creating an Instagram post with interactive comment threads."""
-            post_data = self._generate_social_media_post("Instagram")
-            timestamp = datetime.now().isoformat()
+    def _choose_initial_commenters(self, num_initial_comments):
+        """Picks the supporting characters that will comment on a new post."""
+        picks = [random.choice(self._available_characters) for _ in range(num_initial_comments)]
+        known = [name for name in picks if self.supporting_characters.get(name)]
+        outcomes = self.interaction_engine.sample([(name, self.name) for name in known])
+        commenters = [(name, self.supporting_characters[name]) for name, interacts in zip(known, outcomes) if interacts]
+        print(f"DEBUG: {len(commenters)} of {len(picks)} picked commenters will comment")
+        return commenters
+
+    def _comment_prompt(self, commenter_name, commenter_data, post_content):
+        """Builds the prompt for an initial comment on a post."""
+        return f"""
+            You are {commenter_name}, with these traits:
+            Personality: {commenter_data.get('Personality', {})}
+            Current mood: {commenter_data.get('current_mood', 'Neutral')}
+
+            Generate a natural comment for this Instagram post:
+            {post_content}
+            """
+
+    def _generate_initial_thread(self, post, commenter_name, commenter_data, post_content, timestamp):
+        """Generates an initial comment and its reply thread for a post."""
+        comment_prompt = self._comment_prompt(commenter_name, commenter_data, post_content)
+        # The same commenter can be picked twice for one post; keep their comments distinct
+        comment_text = self._try_generate(comment_prompt, commenter_data, task=TASK_COMMENT, use_cache=False, coalesce=False)
+        if comment_text is None:
+            return []
+
+        initial_comment = self._flag_degraded({
+            'author': commenter_name,
+            'text': comment_text,
+            'timestamp': timestamp,
+            'id': str(uuid.uuid4())
+        }, comment_text)
+
+        return self._generate_comment_thread(post, initial_comment)
+
+    def _generate_batched_comments(self, post, commenters, timestamp):
+        """Generates every comment and reply for a post with a single LLM call.
+
+        Thread structure is planned up front, then one structured prompt asks for a
+        JSON array with the text of every planned comment. Entries missing from or
+        malformed in the response fall back to an individual generation.
+        """
+        entries = []
+        for commenter_name, commenter_data in commenters:
+            entries.append({'author': commenter_name, 'data': commenter_data, 'reply_to': None, 'relationship_strength': None})
+            for responder_name, relationship_strength in self._plan_comment_thread(commenter_name):
+                entries.append({
+                    'author': responder_name,
+                    'data': self.supporting_characters.get(responder_name),
+                    'reply_to': len(entries) - 1,
+                    'relationship_strength': relationship_strength,
+                })
+
+        if not entries:
+            return []
+
+        comment_lines = []
+        for index, entry in enumerate(entries):
+            line = f"{index}. {entry['author']} (mood: {entry['data'].get('current_mood', 'Neutral')}, personality: {entry['data'].get('Personality', {})})"
+            if entry['reply_to'] is None:
+                line += " writes a comment on the post."
+            else:
+                line += f" replies to comment {entry['reply_to']} (relationship strength {entry['relationship_strength']}/100)."
+            comment_lines.append(line)
+        comment_list = "\n".join(comment_lines)
+
+        batch_prompt = f"""
+            Several people are reacting to this social media post by {post['author']}:
+            {post['content']}
+
+            Write one short comment (under 2 sentences) for each numbered entry below. Each
+            comment must reflect its author's personality and mood, and replies must respond
+            to the comment they reference.
+
+            {comment_list}
+
+            Respond ONLY with a JSON array, one object per entry, in the form
+            [{{"index": 0, "text": "..."}}]
+            """
+        texts = self._parse_batched_comments(self._try_generate(batch_prompt, use_cache=False) or "")
+
+        comments = []
+        comments_by_index = {}
+        for index, entry in enumerate(entries):
+            parent = None
+            if entry['reply_to'] is not None:
+                parent = comments_by_index.get(entry['reply_to'])
+                if parent is None:
+                    continue  # the comment being replied to could not be generated
+            text = texts.get(index)
+            if not text:
+                print(f"DEBUG: Batched comment {index} by {entry['author']} missing or malformed, generating individually")
+                if parent is None:
+                    prompt = self._comment_prompt(entry['author'], entry['data'], post['content'])
+                    task = TASK_COMMENT
+                else:
+                    prompt = self._reply_prompt(entry['author'], entry['data'], entry['relationship_strength'], parent, post['content'])
+                    task = TASK_REPLY
+                text = self._try_generate(prompt, entry['data'], task=task, use_cache=False)
+                if text is None:
+                    continue
+
+            comment = {
+                'author': entry['author'],
+                'text': text,
+                'timestamp': timestamp if parent is None else self.clock.now().isoformat(),
+                'id': str(uuid.uuid4())
+            }
+            if parent is not None:
+                comment['parent_id'] = parent['id']
+            comments.append(self._flag_degraded(comment, text))
+            comments_by_index[index] = comment
+
+        return comments
+
+    @staticmethod
+    def _parse_batched_comments(response_text):
+        """Extracts an {index: text} mapping from a batched comment response."""
+        start = response_text.find('[')
+        end = response_text.rfind(']')
+        if start == -1 or end <= start:
+            return {}
+        try:
+            items = json.loads(response_text[start:end + 1])
+        except json.JSONDecodeError:
+            print("DEBUG: Could not decode batched comment response")
+            return {}
+
+        texts = {}
+        if isinstance(items, list):
+            for position, item in enumerate(items):
+                if not isinstance(item, dict):
+                    continue
+                index = item.get('index', position)
+                text = item.get('text')
+                if isinstance(index, int) and isinstance(text, str) and text.strip():
+                    texts[index] = text.strip()
+        return texts
+
+    def simulate_instagram_post(self, on_content=None, on_comment=None):
+            """Simulates creating an Instagram post with interactive comment threads.
+
+            `on_content` receives the post content while it streams in and `on_comment`
+            receives each comment once it is ready, both on the calling thread.
+            """
+            return self.commit_instagram_post(self.draft_instagram_post(on_content=on_content, on_comment=on_comment))
+
+    def draft_instagram_post(self, on_content=None, on_comment=None):
+            """Generates an Instagram post and its comment threads without publishing it."""
+            post_data = self._generate_social_media_post("Instagram", on_content=on_content)
+            timestamp = self.clock.now().isoformat()
 
             post = {
+                'id': str(uuid.uuid4()),
                 'timestamp': timestamp,
                 'author': self.name,
                 'content': post_data['content'],
                 'likes': random.randint(50, 200),
                 'comments': [],
             }
+            if post_data.get('degraded'):
+                post['degraded'] = True
 
             print(f"DEBUG: Before refreshing in simulate_instagram_post, _available_characters length: {len(self._available_characters)}")
             self._refresh_available_characters()
@@ -206,140 +539,177 @@ class CharacterSimulator:
 
             if self._available_characters:
                 print(f"DEBUG: Available characters before generating comments: {self._available_characters}")
-                for _ in range(num_initial_comments):
-                    commenter_name = random.choice(self._available_characters)
-                    print(f"DEBUG: Attempting comment from: {commenter_name}")  # Added
-                    commenter_data = self.supporting_characters.get(commenter_name)
-
-                    if commenter_data:
-                        print(f"DEBUG: Commenter data found for {commenter_name}")  # Added
-                        relationship_strength = self.relationships.get(commenter_name, {}).get("interaction_frequency", 0.5) * 100
-                        should_interact = self._should_interact(commenter_name, self.name, relationship_strength)
-                        print(f"DEBUG: Should {commenter_name} interact? {should_interact}")  # Added
-                        if should_interact:
-                            comment_prompt = f"""
-                            You are {commenter_name}, with these traits:
-                            Personality: {commenter_data.get('Personality', {})}
-                            Current mood: {commenter_data.get('current_mood', 'Neutral')}
-
-                            Generate a natural comment for this Instagram post:
-                            {post_data['content']}
-                            """
-
-                            initial_comment = {
-                                'author': commenter_name,
-                                'text': generate_gemini_content(comment_prompt),
-                                'timestamp': timestamp,
-                                'id': str(uuid.uuid4())
-                            }
-
-                            thread = self._generate_comment_thread(post, initial_comment)
-                            post['comments'].extend(thread)
-                        else:
-                            print(f"DEBUG: {commenter_name} did not interact.")  # Added
-                    else:
-                        print(f"DEBUG: Commenter data NOT found for {commenter_name}")  # Added
+                commenters = self._choose_initial_commenters(num_initial_comments)
+
+                if BATCH_COMMENT_GENERATION:
+                    for comment in self._generate_batched_comments(post, commenters, timestamp):
+                        post['comments'].append(comment)
+                        if on_comment:
+                            on_comment(comment)
+                else:
+                    # Each commenter's thread is independent, so generate them concurrently and
+                    # assemble them in selection order to keep the post layout deterministic.
+                    futures = [
+                        self._generation_pool.submit(self._generate_initial_thread, post, commenter_name, commenter_data, post_data['content'], timestamp)
+                        for commenter_name, commenter_data in commenters
+                    ]
+                    for future in futures:
+                        for comment in future.result():
+                            post['comments'].append(comment)
+                            if on_comment:
+                                on_comment(comment)
 
             post['last_update'] = timestamp
-            self.instagram_history.append(post)
-            self._save_instagram_history()
+            return post
+
+    def commit_instagram_post(self, post):
+        """Publishes a drafted Instagram post, stamping it with the current time.
+
+        The draft's comments move by as much as the post does, so a pre-generated
+        thread keeps its spacing.
+        """
+        now = self.clock.now()
+        shift = now - parse_timestamp(post['timestamp'])
+        post['timestamp'] = now.isoformat()
+        post['last_update'] = now.isoformat()
+        for comment in post['comments']:
+            comment['timestamp'] = (parse_timestamp(comment['timestamp']) + shift).isoformat()
+        self.instagram_store.add(post)
+        self.comment_index.add(post, post['comments'])
+        self.post_queue.schedule(post, self.clock.now())
+        self._save_instagram_history()
+        return post
 
     def update_post_interactions(self):
-        """Updates post interactions periodically."""
-        current_time = datetime.now()
+        """Gives the posts that are due an interaction pass (see DuePostQueue).
 
-        for post in self.instagram_history:
-            last_update = post.get('last_update', None)  
-            if last_update:
-                last_update = datetime.fromisoformat(last_update)
-                if (current_time - last_update).total_seconds() < 5:
-                    continue  
+        Posts the store no longer holds (evicted from a paged store's memory window)
+        leave the queue, since changes to them would not be persisted.
+        """
+        current_time = self.clock.now()
+        self._refresh_available_characters()
 
-            self._refresh_available_characters()  
+        # Only posts whose next pass has come up; they are requeued straight away
+        due = [post for post in self.post_queue.pop_due(current_time) if self.instagram_store.holds(post)]
+        for post in due:
+            self.post_queue.schedule(post, current_time, last_pass=current_time)
 
+        # Pick a commenter for every due post, then decide all the interactions in one batch
+        candidates = []
+        for post in due:
             commenter_name = random.choice(self._available_characters)
-            commenter_data = self.supporting_characters.get(commenter_name)
-
-            if commenter_data and random.random() < 0.9 and self._should_interact(commenter_name, post['author'],
-                                    self.relationships.get(commenter_name, {}).get("interaction_frequency", 0.5) * 100):
-
+            if self.supporting_characters.get(commenter_name) and random.random() < 0.9:
+                candidates.append((post, commenter_name))
+        outcomes = self.interaction_engine.sample([(commenter_name, post['author']) for post, commenter_name in candidates])
+        commenters = {id(post): commenter_name for (post, commenter_name), interacts in zip(candidates, outcomes) if interacts}
+
+        for post in due:
+            commenter_name = commenters.get(id(post))
+            if commenter_name is not None:
+                commenter_data = self.supporting_characters.get(commenter_name)
                 comment_prompt = f"""
                     You are {commenter_name}, discovering this post:
                     {post['content']}
 
                     Generate a natural, initial comment.
                     """
-                initial_comment = {
-                    'author': commenter_name,
-                    'text': generate_gemini_content(comment_prompt),
-                    'timestamp': current_time.isoformat(),
-                    'id': str(uuid.uuid4())
-                }
-                thread = self._generate_comment_thread(post, initial_comment)
-                post.setdefault('comments', []).extend(thread)
-
-            post['last_update'] = current_time.isoformat()  
+                comment_text = self._try_generate(comment_prompt, commenter_data, task=TASK_COMMENT, use_cache=False)
+                if comment_text is not None:
+                    initial_comment = self._flag_degraded({
+                        'author': commenter_name,
+                        'text': comment_text,
+                        'timestamp': current_time.isoformat(),
+                        'id': str(uuid.uuid4())
+                    }, comment_text)
+                    thread = self._generate_comment_thread(post, initial_comment)
+                    self.instagram_store.add_comments(post, thread)
+                    self.comment_index.add(post, thread)
+
+            self.instagram_store.update(post, last_update=current_time.isoformat())
 
         self._save_instagram_history()
 
 
-    def simulate_twitter_post(self):
-        post_data = self._generate_social_media_post("Twitter")
+    def simulate_twitter_post(self, on_content=None):
+        return self.commit_twitter_post(self.draft_twitter_post(on_content=on_content))
+
+    def draft_twitter_post(self, on_content=None):
+        """Generates a tweet without publishing it."""
+        post_data = self._generate_social_media_post("Twitter", on_content=on_content)
         post_content = post_data.get('content', "Error generating tweet")
-        post = {"timestamp": datetime.now().isoformat(), "content": post_content}
-        self.twitter_history.append(post)
-        save_json(TWITTER_HISTORY_FILE, self.twitter_history)
+        return self._flag_degraded({"timestamp": self.clock.now().isoformat(), "author": self.name, "content": post_content}, post_content)
+
+    def commit_twitter_post(self, post):
+        """Publishes a drafted tweet, stamping it with the current time."""
+        post['timestamp'] = self.clock.now().isoformat()
+        self.twitter_store.add(post)
+        self.twitter_store.commit()
         return post
 
     def simulate_whatsapp_chat(self):
+        messages = self.draft_whatsapp_chat()
+        if not messages:
+            return None
+        return self.commit_whatsapp_chat(messages)
+
+    def draft_whatsapp_chat(self):
+        """Generates a WhatsApp message and its reply without publishing them."""
         recipient = self._get_random_supporting_character()
         if not recipient:
             return None
+        recipient_name = recipient.get('Basic Information', {}).get('Name', 'Unknown')
 
         message_to_recipient = self._generate_whatsapp_message(recipient)
-        self.whatsapp_history.append({
-            "timestamp": datetime.now().isoformat(),
+        messages = [self._flag_degraded({
+            "timestamp": self.clock.now().isoformat(),
             "sender": self.name,
-            "recipient": recipient['name'],
+            "recipient": recipient_name,
             "message": message_to_recipient
-        })
+        }, message_to_recipient)]
 
         sender_context = self._get_character_context(self.dna)
         reciever_context = self._get_character_context(recipient)
-        prompt = f"You are simulating a whatsapp message response. {sender_context} The main character message was '{message_to_recipient}'. {reciever_context} Simulate a short Whatsapp message from {recipient['name']} to {self.name} in response to the above message."
-        response_message = generate_gemini_content(prompt) if generate_gemini_content else "Okay."
-        self.whatsapp_history.append({
-            "timestamp": datetime.now().isoformat(),
-            "sender": recipient['name'],
+        prompt = f"You are simulating a whatsapp message response. {sender_context} The main character message was '{message_to_recipient}'. {reciever_context} Simulate a short Whatsapp message from {recipient_name} to {self.name} in response to the above message."
+        response_message = self._generate_text(prompt, recipient, task=TASK_WHATSAPP, use_cache=False)
+        messages.append(self._flag_degraded({
+            "timestamp": self.clock.now().isoformat(),
+            "sender": recipient_name,
             "recipient": self.name,
             "message": response_message
-        })
-
-        save_json(WHATSAPP_HISTORY_FILE, self.whatsapp_history)
+        }, response_message))
+        return messages
+
+    def commit_whatsapp_chat(self, messages):
+        """Publishes a drafted WhatsApp exchange, stamping it with the current time."""
+        timestamp = self.clock.now().isoformat()
+        for message in messages:
+            message['timestamp'] = timestamp
+        for message in messages:
+            self.whatsapp_store.add(message)
+        self.whatsapp_store.commit()
         return self.whatsapp_history[-2:]
 
     def simulate_daily_routine(self):
-        hour = datetime.now().hour
+        hour = self.clock.now().hour
         event = None
 
-        random_events_data = load_json(RANDOM_EVENTS_FILE)
-        if isinstance(random_events_data, dict) and "events" in random_events_data:
-          events = random_events_data["events"]
+        # Kept in memory; writes are flushed in the background, so the file may lag behind
+        random_events_data = self.random_events
+        # Without event definitions (or with an empty list) only the time-of-day routine runs
+        events = random_events_data.get("events")
+        if events:
           if random.random() < 0.2:
                 chosen_event = random.choices(events, weights=[event["probability"] for event in events])[0]
 
-                prompt = f"Simulate a daily event where {self.name} is {chosen_event['name']}. Include details of the event, such as the location, the involved people from the list: {', '.join([char['name'] for char in self._available_characters])}, and what happened. Limit to 3 sentences."
-                event_details = generate_gemini_content(prompt)
-                involved_chars = [char for char in self._available_characters if char["name"] in event_details]
-                if "log" not in random_events_data:
-                  random_events_data["log"] = []
-                random_events_data["log"].append({
-                    "timestamp": datetime.now().isoformat(),
+                prompt = f"Simulate a daily event where {self.name} is {chosen_event['name']}. Include details of the event, such as the location, the involved people from the list: {', '.join(self._available_characters)}, and what happened. Limit to 3 sentences."
+                event_details = self._generate_text(prompt, self.dna, task=TASK_EVENT, use_cache=False)
+                involved_chars = [name for name in self._available_characters if name in event_details]
+                self._log_event(random_events_data, self._flag_degraded({
+                    "timestamp": self.clock.now().isoformat(),
                     "name": chosen_event["name"],
                     "details": event_details,
-                    "involved_characters": [char["name"] for char in involved_chars],
-                })
-                save_json(RANDOM_EVENTS_FILE, random_events_data)
+                    "involved_characters": involved_chars,
+                }, event_details))
                 return chosen_event['name']
 
         if 6 <= hour < 10:
@@ -353,15 +723,31 @@ class CharacterSimulator:
             event = f"{self.name} is likely sleeping."
 
         if event:
-            if not isinstance(random_events_data, dict):
-                random_events_data = {"log": []}
-            elif "log" not in random_events_data:
-                random_events_data["log"] = []
-            random_events_data["log"].append({"timestamp": datetime.now().isoformat(), "event": event})
-            save_json(RANDOM_EVENTS_FILE, random_events_data)
+            self._log_event(random_events_data, {"timestamp": self.clock.now().isoformat(), "event": event})
             return event
         return None
 
+    def _log_event(self, random_events_data, entry):
+        """Appends an entry to the random events log (the events table in SQLite mode, the world log in WAL mode)."""
+        if self.world_log is not None:
+            with self.world_log.lock:
+                random_events_data.setdefault("log", []).append(entry)
+                self.world_log.append("random_events", {'op': 'append', 'field': 'log', 'item': entry})
+            self.world_log.commit()
+            return
+        random_events_data.setdefault("log", []).append(entry)
+        if HISTORY_STORAGE == "sqlite":
+            get_database(self._data_path(SQLITE_DB_FILE)).log_event(entry)
+        else:
+            writer.schedule(self.random_events_file, lambda: save_json(self.random_events_file, random_events_data))
+
+    def _save_dna(self):
+        if self.world_log is not None:
+            self.world_log.append("dna", {'op': 'replace', 'value': self.dna})
+            self.world_log.commit()
+        else:
+            writer.schedule(self.dna_file, lambda: save_character_dna(self.dna_file, self.dna))
+
     def simulate_supporting_character_post(self):
         """Simulates a random supporting character creating an Instagram post."""
 
@@ -384,8 +770,8 @@ class CharacterSimulator:
             Start the caption with "Caption:" and the visual description with "Visual Description:"
             """
 
-            post_content = generate_gemini_content(post_prompt)
-            timestamp = datetime.now().isoformat()
+            post_content = self._generate_text(post_prompt, poster_data, task=TASK_POST_CAPTION, use_cache=False)
+            timestamp = self.clock.now().isoformat()
 
             likes = random.randint(30, 150)
             comments = []
@@ -396,42 +782,92 @@ class CharacterSimulator:
                 Generate a short comment (1-2 sentences) for this Instagram post by {poster_name}:
                 {post_content}
                 """
-                main_char_comment = generate_gemini_content(comment_prompt)
-                comments.append({
-                    'author': self.name,
-                    'text': main_char_comment,
-                    'timestamp': timestamp
-                })
+                main_char_comment = self._try_generate(comment_prompt, self.dna, task=TASK_COMMENT, use_cache=False)
+                if main_char_comment is not None:
+                    comments.append(self._flag_degraded({
+                        'author': self.name,
+                        'text': main_char_comment,
+                        'timestamp': timestamp
+                    }, main_char_comment))
 
             post = {
+                'id': str(uuid.uuid4()),
                 'timestamp': timestamp,
                 'author': poster_name,
                 'content': post_content,
                 'likes': likes,
                 'comments': comments
             }
+            self._flag_degraded(post, post_content)
 
-            self.instagram_history.append(post)
+            self.instagram_store.add(post)
+            self.comment_index.add(post, comments)
+            self.post_queue.schedule(post, self.clock.now())
             self._save_instagram_history()
 
     def update_character_state(self):
 
+      previous_state = self.state_fingerprint()
       mood_choices = ["Happy", "Tired", "Hungry", "Stressed","Relaxed", "Neutral", f"Diseased: {random.choice(['Flu', 'Cold', 'Fever'])}"]
       self.dna["current_mood"]= random.choice(mood_choices)
       self.dna["energy_level"]= max(1,min(10,self.dna.get("energy_level", 5)+ random.randint(-1,1)))
       self.dna["social_battery"]= max(1,min(10,self.dna.get("social_battery", 5)+ random.randint(-1,1)))
       self.dna["stress_level"]= max(1,min(10,self.dna.get("stress_level", 5)+ random.randint(-1,1)))
-      save_character_dna(DNA_FILE,self.dna)
+      self._save_dna()
+      if self.state_fingerprint() != previous_state:
+          for listener in self.state_listeners:
+              listener()
+
+    def replace_dna(self, dna):
+        """Replaces the character DNA (e.g. after an admin edit), persisting it like any other state change."""
+        previous_state = self.state_fingerprint()
+        self.dna = dna
+        self.name = dna.get("Basic Information", {}).get("Name", "AI Character")
+        self._save_dna()
+        if self.world_log is not None:
+            # The world log only rewrites the DNA file on its next snapshot
+            writer.schedule(self.dna_file, lambda: save_character_dna(self.dna_file, self.dna))
+        if self.state_fingerprint() != previous_state:
+            for listener in self.state_listeners:
+                listener()
+
+    def state_fingerprint(self):
+        """The parts of the character state that generated content depends on."""
+        return (self.dna.get("current_mood"), self.dna.get("energy_level"))
 
     def run_daily_updates(self):
         self.update_character_state()
-        if random.random() < 0.3:
-            self.simulate_instagram_post()
-        if random.random() < 0.2:
-            self.simulate_twitter_post()
-        if random.random() < 0.1:
-            self.simulate_whatsapp_chat()
-        self.simulate_daily_routine()
+        try:
+            if random.random() < 0.3:
+                self.simulate_instagram_post()
+            if random.random() < 0.2:
+                self.simulate_twitter_post()
+            if random.random() < 0.1:
+                self.simulate_whatsapp_chat()
+            self.simulate_daily_routine()
+        except GenerationError as e:
+            print(f"Error during daily updates: {e}")
+
+    def like_post(self, post, count=1):
+        """Adds likes to an Instagram post."""
+        self.instagram_store.like(post, count)
+        self._save_instagram_history()
+
+    def add_comment(self, post, comment):
+        """Adds a single comment (e.g. from the user) to an Instagram post."""
+        self.instagram_store.add_comments(post, [comment])
+        self.comment_index.add(post, [comment])
+        self._save_instagram_history()
+
+    def reply_to_comment(self, parent_id, comment):
+        """Adds `comment` as a reply to the comment with id `parent_id`, wherever it lives."""
+        found = self.comment_index.get(parent_id)
+        if found is None:
+            raise KeyError(f"Unknown comment: {parent_id}")
+        post, _ = found
+        comment['parent_id'] = parent_id
+        self.add_comment(post, comment)
+        return post
 
     def _save_instagram_history(self):
-        save_json(INSTAGRAM_HISTORY_FILE, self.instagram_history)
\ No newline at end of file
+        self.instagram_store.commit()
\ No newline at end of file
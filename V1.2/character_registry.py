@@ -0,0 +1,104 @@
+# character_registry.py
+import os
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+from data_handler import load_character_dna, load_json
+from record_schemas import CharacterDNA, SchemaError, validate
+
+StatKey = Tuple[int, int]
+
+
+def _stat_key(path: str) -> Optional[StatKey]:
+    """Returns (mtime_ns, size) for `path`, or None if it does not exist."""
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+class CharacterRegistry:
+    """Caches supporting character DNA and relationships, reloading only files that changed.
+
+    Files are revalidated by mtime and size, and the directory is only re-listed
+    when its own mtime changes. Checks closer together than `min_check_interval`
+    seconds are skipped. `version` is bumped whenever anything is reloaded, so
+    dependents can key caches on it.
+    """
+
+    def __init__(self, directory: str, relationship_file: str, min_check_interval: float = 0.0,
+                 graph_file: Optional[str] = None):
+        self.directory = directory
+        self.relationship_file = relationship_file
+        self.graph_file = graph_file
+        self.min_check_interval = min_check_interval
+        self.characters: Dict[str, Dict[str, Any]] = {}
+        self.relationships: Dict[str, Dict[str, Any]] = {}
+        # Relationships between any two characters (source -> target -> relationship), from `graph_file`
+        self.graph_relationships: Dict[str, Dict[str, Dict[str, Any]]] = {}
+        self.version = 0
+        self._files: Dict[str, Tuple[StatKey, Optional[str], Dict[str, Any]]] = {}
+        self._filenames = []
+        self._directory_stat: Optional[StatKey] = None
+        self._relationships_stat: Optional[StatKey] = None
+        self._graph_stat: Optional[StatKey] = None
+        self._last_check = None
+        self._lock = threading.Lock()
+
+    def refresh(self, force: bool = False) -> bool:
+        """Reloads whatever changed on disk; returns True if anything did."""
+        with self._lock:
+            now = time.monotonic()
+            if not force and self._last_check is not None and now - self._last_check < self.min_check_interval:
+                return False
+            self._last_check = now
+
+            changed = self._refresh_characters()
+            relationships_stat = _stat_key(self.relationship_file)
+            if relationships_stat != self._relationships_stat:
+                self._relationships_stat = relationships_stat
+                relationships = load_json(self.relationship_file)
+                self.relationships = relationships if isinstance(relationships, dict) else {}
+                changed = True
+            if self.graph_file:
+                graph_stat = _stat_key(self.graph_file)
+                if graph_stat != self._graph_stat:
+                    self._graph_stat = graph_stat
+                    graph_relationships = load_json(self.graph_file)
+                    self.graph_relationships = graph_relationships if isinstance(graph_relationships, dict) else {}
+                    changed = True
+
+            if changed:
+                self.version += 1
+            return changed
+
+    def _refresh_characters(self) -> bool:
+        directory_stat = _stat_key(self.directory)
+        if directory_stat != self._directory_stat:
+            self._directory_stat = directory_stat
+            self._filenames = sorted(f for f in os.listdir(self.directory) if f.endswith(".json")) if directory_stat else []
+
+        changed = False
+        for filename in list(self._files):
+            if filename not in self._filenames:
+                del self._files[filename]
+                changed = True
+        for filename in self._filenames:
+            filepath = os.path.join(self.directory, filename)
+            stat = _stat_key(filepath)
+            cached = self._files.get(filename)
+            if cached is not None and cached[0] == stat:
+                continue
+            char_data = load_character_dna(filepath)
+            try:
+                name = validate(CharacterDNA, char_data, filename)['Basic Information']['Name']
+            except SchemaError as e:
+                name = None
+                print(f"DEBUG: Skipping invalid or incomplete character file: {e}")
+            self._files[filename] = (stat, name, char_data)
+            changed = True
+
+        if changed:
+            self.characters = {name: char_data for _, name, char_data in self._files.values() if name}
+        return changed
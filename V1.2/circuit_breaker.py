@@ -0,0 +1,86 @@
+# circuit_breaker.py
+import threading
+import time
+from typing import Dict
+from rate_limiter import GenerationError
+
+
+class CircuitOpenError(GenerationError):
+    """Raised instead of calling the backend while the circuit is open."""
+
+
+class CircuitBreaker:
+    """Stops calling a failing backend for a while so callers fail fast.
+
+    After `failure_threshold` consecutive failures the circuit opens and every
+    call is rejected for `reset_timeout` seconds. Then a single trial call is let
+    through (half-open): success closes the circuit, failure opens it again. A
+    trial that never reports back is given up after another `reset_timeout`, so a
+    lost outcome cannot keep the circuit half-open forever.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 60.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._trial_started_at = 0.0
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self) -> str:
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self._state = self.HALF_OPEN
+            self._trial_in_flight = False
+        elif self._state == self.HALF_OPEN and self._trial_in_flight and time.monotonic() - self._trial_started_at >= self.reset_timeout:
+            print("DEBUG: Half-open trial call never reported back; allowing another")
+            self._trial_in_flight = False
+        return self._state
+
+    def before_call(self):
+        """Raises CircuitOpenError if the backend should not be called right now."""
+        with self._lock:
+            state = self._current_state()
+            if state == self.CLOSED:
+                return
+            if state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                self._trial_started_at = time.monotonic()
+                return
+            self.rejected += 1
+        raise CircuitOpenError("Circuit open: the LLM backend is unavailable")
+
+    def record_success(self):
+        with self._lock:
+            self._state = self.CLOSED
+            self._failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    print(f"DEBUG: Opening circuit after {self._failures} failure(s)")
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._trial_in_flight = False
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            return {
+                "state": self._current_state(),
+                "consecutive_failures": self._failures,
+                "rejected": self.rejected,
+            }
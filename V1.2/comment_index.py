@@ -0,0 +1,124 @@
+# comment_index.py
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+from history_store import record_key
+
+
+class CommentIndex:
+    """In-memory index of Instagram comments: id -> (post, comment) and parent -> replies.
+
+    Built once from the loaded posts and kept current by `add()`, so locating a
+    comment, finding its replies or its depth, and walking a post's threads never
+    scan other posts' comments. With `max_posts`, only the most recently indexed
+    or viewed posts are kept, so paging through a long history does not grow it.
+    """
+
+    def __init__(self, max_posts: Optional[int] = None):
+        self.max_posts = max_posts
+        self._comments: Dict[str, Tuple[Dict[str, Any], Dict[str, Any]]] = {}
+        self._replies: Dict[str, List[str]] = {}
+        self._roots: "OrderedDict[str, List[str]]" = OrderedDict()  # post key -> ids of top-level comments, least recently used first
+        self._depth: Dict[str, int] = {}
+        self._lock = threading.RLock()
+
+    def build(self, posts: List[Dict[str, Any]]):
+        """Indexes every comment of `posts`, replacing the current contents."""
+        with self._lock:
+            self._comments.clear()
+            self._replies.clear()
+            self._roots.clear()
+            self._depth.clear()
+            for post in posts:
+                self.index_post(post)
+
+    def index_post(self, post: Dict[str, Any]):
+        """(Re)indexes one post's comments, e.g. a post paged in from disk."""
+        with self._lock:
+            self.remove_post(post)
+            self._roots[record_key(post)] = []
+            self.add(post, post.get('comments', []), start=0)
+
+    def remove_post(self, post: Dict[str, Any]):
+        with self._lock:
+            self._remove(record_key(post))
+
+    def _remove(self, post_key: str):
+        for comment_id in self._thread_ids(post_key):
+            self._comments.pop(comment_id, None)
+            self._replies.pop(comment_id, None)
+            self._depth.pop(comment_id, None)
+        self._roots.pop(post_key, None)
+
+    def _touch(self, post_key: str):
+        self._roots.move_to_end(post_key)
+        if self.max_posts is not None:
+            while len(self._roots) > self.max_posts:
+                self._remove(next(iter(self._roots)))
+
+    def __len__(self) -> int:
+        """Returns how many posts are indexed."""
+        return len(self._roots)
+
+    def add(self, post: Dict[str, Any], comments: List[Dict[str, Any]], start: Optional[int] = None):
+        """Indexes `comments` just appended to `post` (`start` is the position of the first one)."""
+        with self._lock:
+            post_key = record_key(post)
+            if post_key not in self._roots:
+                # First time this post is seen; index its earlier comments too
+                self._roots[post_key] = []
+                start = 0
+                comments = post.get('comments', [])
+            if start is None:
+                start = len(post.get('comments', [])) - len(comments)
+            for position, comment in enumerate(comments, start):
+                comment_id = self.comment_id(post_key, position, comment)
+                self._comments[comment_id] = (post, comment)
+                parent_id = comment.get('parent_id')
+                if parent_id in self._depth and self._comments[parent_id][0] is post:
+                    self._replies.setdefault(parent_id, []).append(comment_id)
+                    self._depth[comment_id] = self._depth[parent_id] + 1
+                else:
+                    self._roots[post_key].append(comment_id)
+                    self._depth[comment_id] = 0
+            self._touch(post_key)
+
+    @staticmethod
+    def comment_id(post_key: str, position: int, comment: Dict[str, Any]) -> str:
+        """A comment's id, or a positional stand-in for comments that predate ids."""
+        return comment.get('id') or f"{post_key}#{position}"
+
+    def get(self, comment_id: str) -> Optional[Tuple[Dict[str, Any], Dict[str, Any]]]:
+        """Returns (post, comment) for `comment_id`, or None."""
+        return self._comments.get(comment_id)
+
+    def replies(self, comment_id: str) -> List[Dict[str, Any]]:
+        """Returns the direct replies to a comment, oldest first."""
+        with self._lock:
+            return [self._comments[reply_id][1] for reply_id in self._replies.get(comment_id, [])]
+
+    def depth(self, comment_id: str) -> int:
+        """Returns how deep a comment is nested (0 for top-level comments)."""
+        return self._depth[comment_id]
+
+    def _thread_ids(self, post_key: str) -> List[str]:
+        ids = []
+        stack = list(reversed(self._roots.get(post_key, [])))
+        while stack:
+            comment_id = stack.pop()
+            ids.append(comment_id)
+            stack.extend(reversed(self._replies.get(comment_id, [])))
+        return ids
+
+    def thread(self, post: Dict[str, Any]) -> List[Tuple[Dict[str, Any], int]]:
+        """Returns a post's comments in threaded order (each followed by its replies) with their depth."""
+        with self._lock:
+            if record_key(post) not in self._roots or self._comments.get(self._first_id(post), (None,))[0] is not post:
+                self.index_post(post)
+            else:
+                self._touch(record_key(post))
+            return [(self._comments[comment_id][1], self._depth[comment_id]) for comment_id in self._thread_ids(record_key(post))]
+
+    def _first_id(self, post: Dict[str, Any]) -> Optional[str]:
+        comments = post.get('comments', [])
+        return self.comment_id(record_key(post), 0, comments[0]) if comments else None
@@ -11,8 +11,91 @@ WHATSAPP_HISTORY_FILE = os.path.join(DATA_DIR, "whatsapp_history.json")
 RANDOM_EVENTS_FILE = os.path.join(DATA_DIR, "random_events.json")
 SUPPORTING_CHARS_DIR = os.path.join(DATA_DIR, "supporting_characters")
 RELATIONSHIP_FILE = os.path.join(DATA_DIR, "relationships.json")
+# Relationships between any two characters: source name -> target name -> {"interaction_frequency": 0-1, ...}
+RELATIONSHIP_GRAPH_FILE = os.path.join(DATA_DIR, "relationship_graph.json")
 os.makedirs(SUPPORTING_CHARS_DIR, exist_ok=True)
 
+# How Instagram/Twitter/WhatsApp histories are stored: "json" rewrites the whole file on
+# every change, "jsonl" appends each change to an event log and compacts it periodically,
+# "sqlite" keeps them (and the random events log) in indexed tables in SQLITE_DB_FILE and
+# reads records older than the newest HISTORY_MEMORY_WINDOW from the tables on demand,
+# "paged" keeps only the newest HISTORY_MEMORY_WINDOW records in memory and reads older
+# ones on demand through an offset index, "wal" logs every change to the histories, the
+# DNA and the random events log to one write-ahead log with periodic world snapshots
+HISTORY_STORAGE = os.environ.get("HISTORY_STORAGE", "json")
+HISTORY_COMPACT_EVERY = int(os.environ.get("HISTORY_COMPACT_EVERY", 500))
+HISTORY_MEMORY_WINDOW = int(os.environ.get("HISTORY_MEMORY_WINDOW", 200))
+# Instagram posts and WhatsApp messages older than this many days are moved at startup
+# into compressed monthly archive segments (0, the default, disables archiving); codec is auto|zstd|gzip
+HISTORY_ARCHIVE_DIR = os.path.join(DATA_DIR, "archive")
+HISTORY_ARCHIVE_AFTER_DAYS = float(os.environ.get("HISTORY_ARCHIVE_AFTER_DAYS", 0))
+HISTORY_ARCHIVE_CODEC = os.environ.get("HISTORY_ARCHIVE_CODEC", "auto")
+# Number of posts/tweets rendered per page in the feed
+HISTORY_PAGE_SIZE = int(os.environ.get("HISTORY_PAGE_SIZE", 20))
+SQLITE_DB_FILE = os.path.join(DATA_DIR, "simulation.sqlite3")
+# Write-ahead log and snapshot used in "wal" mode; a snapshot is taken every WORLD_SNAPSHOT_EVERY log entries
+WORLD_WAL_FILE = os.path.join(DATA_DIR, "world.wal.jsonl")
+WORLD_SNAPSHOT_FILE = os.path.join(DATA_DIR, "world.snapshot.json")
+WORLD_SNAPSHOT_EVERY = int(os.environ.get("WORLD_SNAPSHOT_EVERY", 500))
+# Schema version each dataset has been migrated to (see migrations.py)
+SCHEMA_VERSIONS_FILE = os.path.join(DATA_DIR, "schema_versions.json")
+
+# JSON serializer for data files: "auto" (orjson if installed), "orjson" or "json" (stdlib)
+SERIALIZER = os.environ.get("SERIALIZER", "auto")
+
+# Persist changes from a background thread, coalescing changes made within the interval (seconds)
+WRITE_BEHIND_ENABLED = os.environ.get("WRITE_BEHIND_ENABLED", "1") == "1"
+WRITE_BEHIND_INTERVAL = float(os.environ.get("WRITE_BEHIND_INTERVAL", 1.0))
+
+# Time of the daily updates, and simulated seconds between post interaction passes, when the
+# simulation is driven by simulation_clock.EventScheduler (e.g. `python simulation_clock.py 30`)
+SIMULATION_DAILY_UPDATE_TIME = os.environ.get("SIMULATION_DAILY_UPDATE_TIME", "08:00")
+SIMULATION_INTERACTION_INTERVAL = float(os.environ.get("SIMULATION_INTERACTION_INTERVAL", 300))
+
+# Seconds between interaction passes over a post: POST_INTERACTION_BASE_INTERVAL for a new
+# post, growing by that much for every POST_INTERACTION_AGE_SCALE seconds of age, up to the max
+POST_INTERACTION_BASE_INTERVAL = float(os.environ.get("POST_INTERACTION_BASE_INTERVAL", 5))
+POST_INTERACTION_AGE_SCALE = float(os.environ.get("POST_INTERACTION_AGE_SCALE", 3600))
+POST_INTERACTION_MAX_INTERVAL = float(os.environ.get("POST_INTERACTION_MAX_INTERVAL", 24 * 60 * 60))
+
+# A multi-character World keeps each main character's DNA, histories and events in AGENTS_DIR/<agent id>
+AGENTS_DIR = os.path.join(DATA_DIR, "agents")
+
+# Minimum seconds between checks of the supporting character files and relationships for changes
+CHARACTER_REFRESH_INTERVAL = float(os.environ.get("CHARACTER_REFRESH_INTERVAL", 1.0))
+
+# Maximum number of comment threads generated concurrently for a single post
+MAX_CONCURRENT_GENERATIONS = int(os.environ.get("MAX_CONCURRENT_GENERATIONS", 4))
+
+# Generate all comments on a new post with one structured LLM call instead of one call per comment
+BATCH_COMMENT_GENERATION = os.environ.get("BATCH_COMMENT_GENERATION", "1") == "1"
+
+# Background pre-generation of drafts so sidebar actions publish instantly
+PREGENERATION_ENABLED = os.environ.get("PREGENERATION_ENABLED", "1") == "1"
+PREGENERATION_BUFFER_SIZE = int(os.environ.get("PREGENERATION_BUFFER_SIZE", 1))
+
+# LLM response cache (in-memory LRU backed by SQLite)
+LLM_CACHE_ENABLED = os.environ.get("LLM_CACHE_ENABLED", "1") == "1"
+LLM_CACHE_FILE = os.path.join(DATA_DIR, "llm_cache.sqlite3")
+LLM_CACHE_TTL_SECONDS = float(os.environ.get("LLM_CACHE_TTL_SECONDS", 24 * 60 * 60))
+LLM_CACHE_MEMORY_ENTRIES = int(os.environ.get("LLM_CACHE_MEMORY_ENTRIES", 256))
+LLM_CACHE_DISK_ENTRIES = int(os.environ.get("LLM_CACHE_DISK_ENTRIES", 5000))
+
+# Text generation backend: "gemini" (Google Gemini API) or "stub" (deterministic offline output)
+LLM_BACKEND = os.environ.get("LLM_BACKEND", "gemini")
+STUB_LATENCY_SECONDS = float(os.environ.get("STUB_LATENCY_SECONDS", 0))
+
+# Process-wide Gemini quota and retry settings
+GEMINI_REQUESTS_PER_MINUTE = float(os.environ.get("GEMINI_REQUESTS_PER_MINUTE", 10))
+GEMINI_TOKENS_PER_MINUTE = float(os.environ.get("GEMINI_TOKENS_PER_MINUTE", 4000000))
+GEMINI_MAX_RETRY_DELAY = float(os.environ.get("GEMINI_MAX_RETRY_DELAY", 60))
+GEMINI_REQUEST_TIMEOUT = float(os.environ.get("GEMINI_REQUEST_TIMEOUT", 30))
+
+# Circuit breaker around the LLM backend; while open, content comes from local templates
+CIRCUIT_FAILURE_THRESHOLD = int(os.environ.get("CIRCUIT_FAILURE_THRESHOLD", 5))
+CIRCUIT_RESET_TIMEOUT = float(os.environ.get("CIRCUIT_RESET_TIMEOUT", 60))
+DEGRADED_CONTENT_ENABLED = os.environ.get("DEGRADED_CONTENT_ENABLED", "1") == "1"
+
 CHARACTER_SYSTEM_INSTRUCTIONS = """You are simulating the online presence of a fictional character.
     Here's how to interpret the character's traits to generate realistic content:
 
@@ -0,0 +1,212 @@
+# content_extractors.py
+import re
+from typing import Callable, Dict, List, Optional
+
+# Task types passed to generate_gemini_content to pick how a response is post-processed
+TASK_POST_CAPTION = "post_caption"
+TASK_TWEET = "tweet"
+TASK_COMMENT = "comment"
+TASK_REPLY = "reply"
+TASK_WHATSAPP = "whatsapp"
+TASK_EVENT = "event"
+
+CAPTION_MARKER = "caption:"
+VISUAL_MARKER = "visual description:"
+TWEET_MARKER = "tweet:"
+
+
+def _is_marker_prefix(partial: str, markers) -> bool:
+    """True if an unfinished line could still turn into one of `markers`."""
+    partial = partial.strip().lower()
+    return bool(partial) and any(marker.startswith(partial) for marker in markers)
+
+
+class CaptionExtractor:
+    """Incrementally extracts the caption and visual description from a streamed post.
+
+    Feed chunks as they arrive; `caption`, `visual_description` and `text` always
+    reflect everything received so far, including an unfinished last line.
+    """
+
+    def __init__(self):
+        self._section = None  # None, "caption" or "visual"
+        self._caption: List[str] = []
+        self._visual: List[str] = []
+        self._preamble: List[str] = []
+        self._partial = ""
+
+    def _consume_line(self, line: str, parts: dict):
+        line = line.strip()
+        lowered = line.lower()
+        if lowered.startswith(CAPTION_MARKER):
+            parts["section"] = "caption"
+            parts["caption"].append(line[len(CAPTION_MARKER):].strip())
+        elif lowered.startswith(VISUAL_MARKER):
+            parts["section"] = "visual"
+            parts["visual"].append(line[len(VISUAL_MARKER):].strip())
+        elif parts["section"] == "caption":
+            parts["caption"].append(line)
+        elif parts["section"] == "visual":
+            parts["visual"].append(line)
+        else:
+            parts["preamble"].append(line)
+
+    def feed(self, chunk: str) -> str:
+        """Adds a chunk of streamed text and returns the content extracted so far."""
+        self._partial += chunk
+        *complete, self._partial = self._partial.split("\n")
+        parts = {"section": self._section, "caption": self._caption, "visual": self._visual, "preamble": self._preamble}
+        for line in complete:
+            self._consume_line(line, parts)
+        self._section = parts["section"]
+        return self.text
+
+    def _snapshot(self) -> dict:
+        parts = {
+            "section": self._section,
+            "caption": list(self._caption),
+            "visual": list(self._visual),
+            "preamble": list(self._preamble),
+        }
+        if self._partial and not _is_marker_prefix(self._partial, (CAPTION_MARKER, VISUAL_MARKER)):
+            self._consume_line(self._partial, parts)
+        return parts
+
+    @property
+    def caption(self) -> str:
+        return " ".join(part for part in self._snapshot()["caption"] if part)
+
+    @property
+    def visual_description(self) -> str:
+        return " ".join(part for part in self._snapshot()["visual"] if part)
+
+    @property
+    def text(self) -> str:
+        """Post content normalised to 'Caption: ...' / 'Visual Description: ...' form."""
+        parts = self._snapshot()
+        if parts["section"] is None:
+            return "\n".join(parts["preamble"]).strip()
+        caption = " ".join(part for part in parts["caption"] if part)
+        visual = " ".join(part for part in parts["visual"] if part)
+        text = f"Caption: {caption}"
+        if parts["section"] == "visual" or visual:
+            text += f"\nVisual Description: {visual}"
+        return text
+
+
+class TweetExtractor:
+    """Incrementally extracts the tweet text from a streamed 'Tweet:' response.
+
+    Until a 'Tweet:' line is seen the whole response so far is returned, which
+    matches the non-streaming fallback.
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._tweet = None
+
+    def feed(self, chunk: str) -> str:
+        """Adds a chunk of streamed text and returns the tweet extracted so far."""
+        self._buffer += chunk
+        return self.text
+
+    @property
+    def text(self) -> str:
+        if self._tweet is not None:
+            return self._tweet
+        lines = self._buffer.split("\n")
+        for index, line in enumerate(lines):
+            stripped = line.strip()
+            if stripped.lower().startswith(TWEET_MARKER):
+                tweet = stripped[len(TWEET_MARKER):].strip()
+                if index < len(lines) - 1:
+                    self._tweet = tweet  # the tweet line is complete
+                return tweet
+        if _is_marker_prefix(lines[-1], (TWEET_MARKER,)):
+            return "\n".join(lines[:-1]).strip()
+        return self._buffer.strip()
+
+
+_CAPTION_PATTERN = re.compile(
+    r"^[ \t]*caption:(?P<caption>.*?)(?:^[ \t]*visual description:(?P<visual>.*))?\Z",
+    re.IGNORECASE | re.MULTILINE | re.DOTALL,
+)
+_TWEET_PATTERN = re.compile(r"^[ \t]*tweet:[ \t]*(?P<tweet>.*?)[ \t]*$", re.IGNORECASE | re.MULTILINE)
+# First line that is neither blank, a "Plan:" line nor a bullet point
+_COMMENT_PATTERN = re.compile(r"^[ \t]*(?!plan:)(?P<comment>[^\s*].*?)[ \t]*$", re.IGNORECASE | re.MULTILINE)
+
+
+def _collapse(text: Optional[str]) -> str:
+    return " ".join(text.split()) if text else ""
+
+
+def extract_post_caption(text: str) -> str:
+    """Normalises a post response to 'Caption: ...' / 'Visual Description: ...' form."""
+    match = _CAPTION_PATTERN.search(text)
+    if not match:
+        return text.strip()
+    content = f"Caption: {_collapse(match.group('caption'))}"
+    if match.group("visual") is not None:
+        content += f"\nVisual Description: {_collapse(match.group('visual'))}"
+    return content
+
+
+def extract_tweet(text: str) -> str:
+    """Returns the text after 'Tweet:', or the whole response if there is none."""
+    match = _TWEET_PATTERN.search(text)
+    return match.group("tweet") if match else text.strip()
+
+
+def extract_comment(text: str) -> str:
+    """Returns the first real line of a comment or reply response."""
+    match = _COMMENT_PATTERN.search(text)
+    return match.group("comment") if match else text.strip()
+
+
+def extract_plain(text: str) -> str:
+    return text.strip()
+
+
+EXTRACTORS: Dict[Optional[str], Callable[[str], str]] = {
+    TASK_POST_CAPTION: extract_post_caption,
+    TASK_TWEET: extract_tweet,
+    TASK_COMMENT: extract_comment,
+    TASK_REPLY: extract_comment,
+    TASK_WHATSAPP: extract_plain,
+    TASK_EVENT: extract_plain,
+    None: extract_plain,
+}
+
+STREAM_EXTRACTORS = {
+    TASK_POST_CAPTION: CaptionExtractor,
+    TASK_TWEET: TweetExtractor,
+}
+
+
+def extract_content(task: Optional[str], text: str) -> str:
+    """Post-processes a complete response according to its task type."""
+    try:
+        extractor = EXTRACTORS[task]
+    except KeyError:
+        raise ValueError(f"Unknown generation task: {task}")
+    return extractor(text)
+
+
+class PlainExtractor:
+    """Streaming extractor for tasks without special formatting."""
+
+    def __init__(self):
+        self._buffer = ""
+
+    def feed(self, chunk: str) -> str:
+        self._buffer += chunk
+        return self.text
+
+    @property
+    def text(self) -> str:
+        return self._buffer.strip()
+
+
+def stream_extractor(task: Optional[str]):
+    """Returns a fresh incremental extractor for streaming a response of `task`."""
+    return STREAM_EXTRACTORS.get(task, PlainExtractor)()
@@ -2,6 +2,28 @@
 import json
 import os
 from typing import Dict, Any, List
+from config import SERIALIZER
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# "orjson" when available (and not disabled with SERIALIZER=json); both read and write plain JSON
+USE_ORJSON = orjson is not None and SERIALIZER in ("auto", "orjson")
+
+
+def dumps(data: Any, pretty: bool = False) -> str:
+    """Serializes data to JSON text with the configured serializer."""
+    if USE_ORJSON:
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if pretty else 0)
+        return orjson.dumps(data, default=str, option=option).decode('utf-8')
+    return json.dumps(data, indent=4 if pretty else None, default=str) # Added default=str for datetime
+
+
+def loads(text) -> Any:
+    """Parses JSON text (str or bytes) with the configured serializer."""
+    return orjson.loads(text) if USE_ORJSON else json.loads(text)
 
 
 def load_character_dna(filepath: str) -> Dict[str, Any]:
@@ -11,11 +33,11 @@ def load_character_dna(filepath: str) -> Dict[str, Any]:
            if filepath.endswith(".jsonl"):
                 with open(filepath, 'r') as f:
                   for line in f:
-                     return json.loads(line)
+                     return loads(line)
            else:
-              with open(filepath, 'r') as f:
-                  return json.load(f)
-        except json.JSONDecodeError:
+              with open(filepath, 'rb') as f:
+                  return loads(f.read())
+        except ValueError:
             print(f"Error decoding JSON from {filepath}. Ensure it's valid JSON/JSONL.")
             return {}
     return {}
@@ -38,38 +60,26 @@ def load_supporting_characters(directory: str) -> Dict[str, Dict[str, Any]]:
 def save_character_dna(filepath: str, data: Dict[str, Any]):
     """Saves character's DNA to a JSON or JSONL file."""
     if filepath.endswith(".jsonl"):
-        with open(filepath, 'w') as f:
-            json.dump(data, f, default=str) # Added default=str for datetime
-            f.write('\n')
+        write_atomic(filepath, dumps(data) + '\n')
     else:
-        with open(filepath, 'w') as f:
-            json.dump(data, f, indent=4, default=str) # Added default=str for datetime
+        write_atomic(filepath, dumps(data, pretty=True))
 
 def save_json(filepath: str, data: Any):
     """Saves data to a JSON file."""
-    with open(filepath, 'w') as f:
-        json.dump(data, f, indent=4, default=str) # Added default=str for datetime
+    write_atomic(filepath, dumps(data, pretty=True))
+
+def write_atomic(filepath: str, text: str):
+    """Writes `text` to a temporary file and renames it over `filepath`, so readers never see a partial file."""
+    tmp_path = f"{filepath}.tmp"
+    with open(tmp_path, 'w') as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, filepath)
 
 def load_json(filepath: str) -> Any:
     """Loads data from a JSON file."""
     if os.path.exists(filepath):
-        with open(filepath, 'r') as f:
-            return json.load(f)
+        with open(filepath, 'rb') as f:
+            return loads(f.read())
     return []
-
-def backfill_last_update(file_path: str):
-    """
-    Ensures all posts in the specified JSON file have the 'last_update' key.
-    Defaults 'last_update' to the 'timestamp' of the post if missing.
-    """
-    data = load_json(file_path)
-    modified = False  # Track if changes are made
-    for post in data:
-        if 'last_update' not in post:
-            post['last_update'] = post.get('timestamp', datetime.now().isoformat())  # Default to 'timestamp' or current time
-            modified = True
-    if modified:
-        save_json(file_path, data)
-        print(f"DEBUG: Backfilled 'last_update' for {len(data)} posts in {file_path}")
-    else:
-        print(f"DEBUG: No backfill needed for {file_path}")
@@ -0,0 +1,94 @@
+# fallback_content.py
+import random
+import threading
+from typing import Any, Dict, List, Optional
+from content_extractors import TASK_POST_CAPTION, TASK_TWEET, TASK_COMMENT, TASK_REPLY, TASK_WHATSAPP, TASK_EVENT
+
+
+class DegradedText(str):
+    """Text generated locally from character DNA while the LLM backend is unavailable."""
+    degraded = True
+
+
+def is_degraded(text: Any) -> bool:
+    return isinstance(text, DegradedText)
+
+
+TEMPLATES: Dict[Optional[str], List[str]] = {
+    TASK_POST_CAPTION: [
+        "Caption: Another day of {hobby}, feeling {mood_word}. Totally {word}! #{tag}\nVisual Description: {name} {hobby_scene}, looking {mood_word}.",
+        "Caption: {food} and {hobby}. That's the {word} life. #{tag}\nVisual Description: A plate of {food} next to {name}, who is {hobby_scene}.",
+        "Caption: Honestly {word} today. {hobby} fixes everything. #{tag}\nVisual Description: {name} mid-{hobby}, grinning at the camera.",
+    ],
+    TASK_TWEET: [
+        "Hot take: {hobby} is criminally underrated. {word} but true. #{tag}",
+        "Nobody talks about how {word} {food} is. Feeling {mood_word} about it.",
+        "Currently {mood_word}. Solution: {hobby}. Obviously.",
+    ],
+    TASK_COMMENT: [
+        "So {word}! Love this.",
+        "This is giving {hobby} energy, very {word}.",
+        "Ha, classic you! {word} as always.",
+    ],
+    TASK_REPLY: [
+        "Exactly, so {word}!",
+        "Haha, {word} indeed.",
+        "Couldn't agree more, very {word}.",
+    ],
+    TASK_WHATSAPP: [
+        "Hey! Feeling {mood_word} today, up for some {hobby} later?",
+        "Just had {food}, now I want to go {hobby}. You in?",
+        "Honestly such a {word} day. Call later?",
+    ],
+    TASK_EVENT: [
+        "{name} spent a {word} afternoon {hobby} and treated themselves to {food} afterwards.",
+        "{name} was feeling {mood_word} and went {hobby} to unwind.",
+    ],
+    None: [
+        "posted a picture of {food} while looking {mood_word}",
+        "posted a photo from a {word} session of {hobby}",
+    ],
+}
+
+MOOD_WORDS = {
+    "Happy": "happy", "Tired": "tired", "Hungry": "hungry", "Stressed": "stressed",
+    "Relaxed": "relaxed", "Neutral": "okay", "Excited": "excited", "Content": "content",
+}
+
+
+class FallbackContentGenerator:
+    """Builds plausible content from a character's DNA using simple templates.
+
+    Used in degraded mode so the simulation keeps running at full speed when the
+    LLM is down; every result is a DegradedText so entries can be flagged.
+    """
+
+    def __init__(self, seed: Optional[int] = None):
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _choice(self, options: List[str], default: str) -> str:
+        options = [option for option in options if option]
+        return self._random.choice(options) if options else default
+
+    def generate(self, task: Optional[str], dna: Optional[Dict[str, Any]]) -> DegradedText:
+        dna = dna or {}
+        personality = dna.get("Personality", {})
+        mood = str(dna.get("current_mood", "Neutral"))
+        with self._lock:
+            hobby = self._choice(dna.get("Hobbies", []), "relaxing")
+            word = self._choice(personality.get("Words often used", []) + personality.get("Other words that might be used", []), "wild")
+            template = self._choice(TEMPLATES.get(task, TEMPLATES[None]), "{word}")
+            food = self._choice(dna.get("Favourite foods", []), "snacks")
+        text = template.format(
+            name=dna.get("Basic Information", {}).get("Name", "Someone"),
+            hobby=hobby,
+            hobby_scene=f"busy {hobby}",
+            word=word,
+            food=food,
+            mood_word=MOOD_WORDS.get(mood.split(":")[0], mood.lower()),
+            tag="".join(part.capitalize() for part in hobby.split()),
+        )
+        if task is not None:
+            text = text[0].upper() + text[1:]
+        return DegradedText(text)
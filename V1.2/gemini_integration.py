@@ -1,70 +1,240 @@
 # gemini_integration.py
-import os
-try:
-    import google.generativeai as genai
-    from config import CHARACTER_SYSTEM_INSTRUCTIONS
-
-    genai.configure(api_key=os.environ.get("GEMINI_API_KEY"))
-    generation_config = {
-        "temperature": 0.7,
-        "top_p": 0.95,
-        "top_k": 40,
-        "max_output_tokens": 8192,
-    }
-    model = genai.GenerativeModel(model_name="gemini-2.0-flash-exp", generation_config=generation_config, system_instruction=CHARACTER_SYSTEM_INSTRUCTIONS)
-except ImportError:
-    print("Warning: google-generativeai library not found. Content generation will be limited.")
-    model = None
-
-def generate_gemini_content(prompt: str) -> str:
-    """Generates content using Google's Gemini AI and extracts the main content."""
-    if model:
+from typing import Dict, Iterator, Optional
+from config import CHARACTER_SYSTEM_INSTRUCTIONS, LLM_CACHE_ENABLED, LLM_CACHE_FILE, LLM_CACHE_TTL_SECONDS, LLM_CACHE_MEMORY_ENTRIES, LLM_CACHE_DISK_ENTRIES
+from config import GEMINI_REQUESTS_PER_MINUTE, GEMINI_TOKENS_PER_MINUTE, GEMINI_MAX_RETRY_DELAY, LLM_BACKEND, STUB_LATENCY_SECONDS
+from config import GEMINI_REQUEST_TIMEOUT, CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_RESET_TIMEOUT
+from circuit_breaker import CircuitBreaker
+from llm_backends import LLMBackend, LLMResponse, create_backend
+from content_extractors import extract_content
+from llm_cache import LLMCache, make_cache_key
+from rate_limiter import RateLimiter, RetryPolicy, GenerationError, EmptyResponseError, estimate_tokens
+from singleflight import SingleFlight
+
+MODEL_NAME = "gemini-2.0-flash-exp"
+generation_config = {
+    "temperature": 0.7,
+    "top_p": 0.95,
+    "top_k": 40,
+    "max_output_tokens": 8192,
+}
+
+backend: Optional[LLMBackend] = create_backend(LLM_BACKEND, MODEL_NAME, generation_config, CHARACTER_SYSTEM_INSTRUCTIONS, stub_latency=STUB_LATENCY_SECONDS)
+
+
+def set_backend(new_backend: Optional[LLMBackend]):
+    """Swaps the backend used for all generation (e.g. a StubBackend for offline runs)."""
+    global backend
+    backend = new_backend
+
+
+response_cache = LLMCache(
+    LLM_CACHE_FILE if LLM_CACHE_ENABLED else None,
+    max_memory_entries=LLM_CACHE_MEMORY_ENTRIES,
+    max_disk_entries=LLM_CACHE_DISK_ENTRIES,
+    ttl_seconds=LLM_CACHE_TTL_SECONDS,
+)
+
+# Shared by every thread in the process so Streamlit, the scheduler and live updates
+# all draw from the same quota.
+rate_limiter = RateLimiter(GEMINI_REQUESTS_PER_MINUTE, GEMINI_TOKENS_PER_MINUTE)
+retry_policy = RetryPolicy(max_delay=GEMINI_MAX_RETRY_DELAY)
+
+# Identical requests issued concurrently (live updates, the scheduler thread, several
+# browser tabs) share a single upstream call.
+in_flight = SingleFlight()
+
+# Fails calls fast while the backend is down so callers can switch to degraded content
+circuit_breaker = CircuitBreaker(CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_RESET_TIMEOUT)
+
+
+def _record_outcome(error: Optional[Exception]):
+    """Feeds the result of a backend call to the circuit breaker.
+
+    Only outage-like errors (quota, timeouts, server errors) count as failures;
+    a rejected prompt still proves the backend is reachable.
+    """
+    if error is not None and retry_policy.classify(error) is not None:
+        circuit_breaker.record_failure()
+    else:
+        circuit_breaker.record_success()
+
+
+def _backend_unavailable() -> GenerationError:
+    return GenerationError("Gemini API not available.")
+
+
+async def wait_for_capacity(prompt: str):
+    """Awaits until the shared rate limiter has room for `prompt`."""
+    await rate_limiter.acquire_async(estimate_tokens(prompt))
+
+
+def get_cache_stats() -> Dict[str, int]:
+    """Returns hit/miss counters for the LLM response cache."""
+    return response_cache.stats()
+
+
+def get_coalescing_stats() -> Dict[str, int]:
+    """Returns how many generations ran upstream and how many were coalesced into them."""
+    return in_flight.stats()
+
+
+def get_circuit_stats() -> Dict[str, object]:
+    """Returns the circuit breaker state and how many calls it rejected."""
+    return circuit_breaker.stats()
+
+
+def _cache_key(prompt: str, task: Optional[str]) -> str:
+    return make_cache_key(backend.model_name, backend.generation_config, backend.system_instruction, prompt, task)
+
+
+def generate_gemini_content(prompt: str, task: Optional[str] = None, use_cache: bool = True, coalesce: bool = True) -> str:
+    """Generates content using the configured backend (Gemini by default) and extracts the main content.
+
+    `task` is one of the TASK_* types in `content_extractors` and selects how the
+    response is post-processed; without one the response is returned stripped.
+
+    Responses are cached by model, generation config, system instruction and
+    prompt. Pass `use_cache=False` for prompts where variety matters. Concurrent
+    identical requests share one upstream call unless `coalesce=False`. Calls block
+    on the shared rate limiter and are retried with backoff; GenerationError is
+    raised if they still fail.
+    """
+    if backend:
+        use_cache = use_cache and LLM_CACHE_ENABLED
+        cache_key = _cache_key(prompt, task)
+        if use_cache:
+            cached = response_cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+        if coalesce:
+            content = in_flight.do(cache_key, lambda: _generate_uncached(prompt, task))
+        else:
+            content = _generate_uncached(prompt, task)
+        if use_cache and content:
+            response_cache.set(cache_key, content)
+        return content
+    else:
+        raise _backend_unavailable()
+
+
+async def generate_gemini_content_async(prompt: str, task: Optional[str] = None, use_cache: bool = True) -> str:
+    """Async variant of `generate_gemini_content`; awaits rate-limit capacity instead of blocking."""
+    if backend:
+        use_cache = use_cache and LLM_CACHE_ENABLED
+        cache_key = _cache_key(prompt, task)
+        if use_cache:
+            cached = response_cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+        estimated_tokens = estimate_tokens(prompt)
+
+        async def attempt() -> str:
+            circuit_breaker.before_call()
+            if backend.rate_limited:
+                await rate_limiter.acquire_async(estimated_tokens)
+            try:
+                text = _checked_text(await backend.generate_async(prompt, timeout=GEMINI_REQUEST_TIMEOUT), estimated_tokens)
+            except Exception as e:
+                _record_outcome(e)
+                raise
+            _record_outcome(None)
+            return text
+
+        content = extract_content(task, await retry_policy.call_async(attempt))
+        if use_cache and content:
+            response_cache.set(cache_key, content)
+        return content
+    else:
+        raise _backend_unavailable()
+
+
+
+def stream_gemini_content(prompt: str, task: Optional[str] = None, use_cache: bool = True) -> Iterator[str]:
+    """Streams the raw response for `prompt` as text chunks.
+
+    Feed the chunks to `content_extractors.stream_extractor(task)` to render partial
+    content. A cache hit is yielded as a single chunk, and the extracted result of
+    a completed stream is cached like `generate_gemini_content` would. Raises
+    GenerationError if the stream cannot be started or breaks off.
+    """
+    if not backend:
+        raise _backend_unavailable()
+
+    use_cache = use_cache and LLM_CACHE_ENABLED
+    cache_key = _cache_key(prompt, task)
+    if use_cache:
+        cached = response_cache.get(cache_key)
+        if cached is not None:
+            yield cached
+            return
+
+    estimated_tokens = estimate_tokens(prompt)
+
+    def start():
+        circuit_breaker.before_call()
+        if backend.rate_limited:
+            rate_limiter.acquire(estimated_tokens)
         try:
-            full_prompt = f"{prompt}"
-            response = model.generate_content(full_prompt)
-
-            if response.text:
-                lines = response.text.split('\n')
-
-                if "instagram" in prompt.lower():
-                    caption_started = False
-                    visual_description_started = False
-                    actual_text = ""
-                    for line in lines:
-                        line = line.strip()
-                        if line.lower().startswith("caption:"):
-                            caption_started = True
-                            actual_text += line[len("caption:").strip():]
-                        elif line.lower().startswith("visual description:"):
-                            visual_description_started = True
-                            actual_text += " " + line[len("visual description:").strip():]
-                        elif caption_started and not visual_description_started:
-                            actual_text += line + " "
-                        elif visual_description_started:
-                            actual_text += line + " "
-                    return actual_text.strip()
-
-                elif "twitter" in prompt.lower():
-                    for line in lines:
-                        line = line.strip()
-                        if line.lower().startswith("tweet:"):
-                            return line[len("tweet:").strip():]
-                    return response.text.strip()
-
-                # New logic to extract just the comment
-                elif "generate a natural comment" in prompt.lower() or "respond to this comment" in prompt.lower():
-                    for line in lines:
-                        line = line.strip()
-                        # Return the first line that isn't empty or a plan item
-                        if line and not line.lower().startswith("plan:") and not line.startswith("*"):
-                            return line
-                    return response.text.strip() # Fallback
-
-                else:
-                    return response.text.strip()
-            return ""
+            chunks = backend.stream(prompt, timeout=GEMINI_REQUEST_TIMEOUT)
+            # Pull the first chunk inside the retry so connection/quota errors are retried
+            first_chunk = next(chunks, None)
+            if not first_chunk:
+                raise EmptyResponseError("Gemini returned an empty response")
         except Exception as e:
-            print(f"Error generating content with Gemini: {e}")
-            return ""
-    else:
-        return "Gemini API not available."
\ No newline at end of file
+            _record_outcome(e)
+            raise
+        return first_chunk, chunks
+
+    first_chunk, chunks = retry_policy.call(start)
+    received = [first_chunk]
+    error = None
+    try:
+        yield first_chunk
+        for chunk in chunks:
+            received.append(chunk)
+            yield chunk
+    except Exception as e:
+        error = e
+        raise GenerationError(f"Stream interrupted: {e}") from e
+    finally:
+        # Also runs when the consumer closes the stream early (GeneratorExit),
+        # which would otherwise leave a half-open trial call unreported
+        _record_outcome(error)
+
+    if use_cache:
+        content = extract_content(task, "".join(received))
+        if content:
+            response_cache.set(cache_key, content)
+
+def _checked_text(response: LLMResponse, estimated_tokens: int) -> str:
+    if backend.rate_limited:
+        rate_limiter.record_usage(estimated_tokens, response.total_tokens)
+    if not response.text:
+        raise EmptyResponseError("Gemini returned an empty response")
+    return response.text
+
+
+def _generate_uncached(prompt: str, task: Optional[str]) -> str:
+    """Calls the backend, respecting the shared rate limits and retry policy, and extracts the main content.
+
+    Raises GenerationError if no content could be produced.
+    """
+    estimated_tokens = estimate_tokens(prompt)
+
+    def attempt() -> str:
+        circuit_breaker.before_call()
+        if backend.rate_limited:
+            rate_limiter.acquire(estimated_tokens)
+        try:
+            text = _checked_text(backend.generate(prompt, timeout=GEMINI_REQUEST_TIMEOUT), estimated_tokens)
+        except Exception as e:
+            _record_outcome(e)
+            raise
+        _record_outcome(None)
+        return text
+
+    text = retry_policy.call(attempt)
+    return extract_content(task, text)
+
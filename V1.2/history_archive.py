@@ -0,0 +1,188 @@
+# history_archive.py
+import gzip
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterator, List, Optional
+from data_handler import dumps, loads, load_json, save_json
+from history_store import record_key
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+def _compress(codec: str, data: bytes) -> bytes:
+    if codec == "zstd":
+        return zstandard.ZstdCompressor(level=10).compress(data)
+    return gzip.compress(data, compresslevel=6)
+
+
+def _decompress(codec: str, data: bytes) -> bytes:
+    if codec == "zstd":
+        # Appends add one frame each; read them all
+        reader = zstandard.ZstdDecompressor().stream_reader(data, read_across_frames=True)
+        return reader.read()
+    return gzip.decompress(data)
+
+
+class HistoryArchive:
+    """Cold storage for one history: one compressed JSONL segment per month.
+
+    `manifest.json` lists each segment's month, file, record count and time range,
+    so paging and range queries only decompress the segments they touch. New
+    records are appended to a segment as an extra gzip member / zstd frame, so
+    archiving never rewrites existing segments. The manifest is the commit point:
+    it records each segment's committed size, and bytes past it (from an append
+    that crashed before the manifest was saved) are ignored and overwritten.
+    """
+
+    def __init__(self, directory: str, codec: str = "auto", cache_segments: int = 2):
+        self.directory = directory
+        if codec == "auto":
+            codec = "zstd" if zstandard is not None else "gzip"
+        if codec == "zstd" and zstandard is None:
+            print("DEBUG: zstandard is not installed, archiving with gzip")
+            codec = "gzip"
+        self.codec = codec
+        self.manifest_path = os.path.join(directory, "manifest.json")
+        self._cache: "OrderedDict[str, List[Dict[str, Any]]]" = OrderedDict()
+        self._cache_segments = cache_segments
+        self._lock = threading.Lock()
+        manifest = load_json(self.manifest_path)
+        self.segments: List[Dict[str, Any]] = manifest.get("segments", []) if isinstance(manifest, dict) else []
+        # Key of the newest archived record, so a retry after a crash does not archive it twice
+        self.last_key: Optional[str] = manifest.get("last_key") if isinstance(manifest, dict) else None
+
+    def count(self) -> int:
+        return sum(segment['count'] for segment in self.segments)
+
+    def append(self, records: List[Dict[str, Any]]):
+        """Archives `records` (oldest first) into their monthly segments."""
+        by_month: "OrderedDict[str, List[Dict[str, Any]]]" = OrderedDict()
+        for record in records:
+            by_month.setdefault(record['timestamp'][:7], []).append(record)
+
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            for month, month_records in by_month.items():
+                segment = next((s for s in self.segments if s['month'] == month), None)
+                if segment is None:
+                    segment = {
+                        'month': month,
+                        'file': f"{month}.jsonl.{'zst' if self.codec == 'zstd' else 'gz'}",
+                        'codec': self.codec,
+                        'count': 0,
+                        'size': 0,
+                        'first_timestamp': month_records[0]['timestamp'],
+                        'last_timestamp': month_records[0]['timestamp'],
+                    }
+                    self.segments.append(segment)
+                    self.segments.sort(key=lambda s: s['month'])
+                data = "".join(dumps(record) + "\n" for record in month_records).encode("utf-8")
+                with open(os.path.join(self.directory, segment['file']), 'ab') as f:
+                    if 'size' in segment:
+                        f.truncate(segment['size'])
+                    f.write(_compress(segment['codec'], data))
+                    f.flush()
+                    os.fsync(f.fileno())
+                    segment['size'] = f.tell()
+                segment['count'] += len(month_records)
+                segment['first_timestamp'] = min(segment['first_timestamp'], month_records[0]['timestamp'])
+                segment['last_timestamp'] = max(segment['last_timestamp'], month_records[-1]['timestamp'])
+                self._cache.pop(month, None)
+            self.last_key = record_key(records[-1])
+            save_json(self.manifest_path, {'segments': self.segments, 'last_key': self.last_key})
+
+    def load_segment(self, month: str) -> List[Dict[str, Any]]:
+        """Returns the records of one month, decompressing the segment unless it is cached."""
+        with self._lock:
+            if month in self._cache:
+                self._cache.move_to_end(month)
+                return self._cache[month]
+            segment = next(s for s in self.segments if s['month'] == month)
+            with open(os.path.join(self.directory, segment['file']), 'rb') as f:
+                data = _decompress(segment['codec'], f.read(segment['size']) if 'size' in segment else f.read())
+            records = [loads(line) for line in data.splitlines() if line.strip()]
+            for record in records:
+                record['archived'] = True  # read-only: never written back
+            self._cache[month] = records
+            while len(self._cache) > self._cache_segments:
+                self._cache.popitem(last=False)
+            return records
+
+    def page(self, cursor: int = 0, limit: int = 20) -> List[Dict[str, Any]]:
+        """Returns up to `limit` archived records, newest first, skipping the `cursor` newest ones."""
+        page: List[Dict[str, Any]] = []
+        skip = cursor
+        for segment in reversed(self.segments):
+            if len(page) >= limit:
+                break
+            if skip >= segment['count']:
+                skip -= segment['count']
+                continue
+            records = self.load_segment(segment['month'])
+            end = len(records) - skip
+            page.extend(records[max(0, end - (limit - len(page))):end][::-1])
+            skip = 0
+        return page
+
+    def iter_records(self, start: Optional[str] = None, end: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """Yields archived records with start <= timestamp < end (ISO strings), oldest first."""
+        for segment in self.segments:
+            if (start and segment['last_timestamp'] < start) or (end and segment['first_timestamp'] >= end):
+                continue
+            for record in self.load_segment(segment['month']):
+                if (not start or record['timestamp'] >= start) and (not end or record['timestamp'] < end):
+                    yield record
+
+
+def archive_cold_records(store, archive: HistoryArchive, older_than_days: float, now: Optional[datetime] = None,
+                         batch_size: int = 500) -> int:
+    """Moves the leading run of records older than `older_than_days` (before `now`) from `store` into `archive`.
+
+    Returns how many records were archived. The oldest records are read through
+    `page()` a batch at a time, so paged and SQLite stores are never loaded whole.
+    Records are only dropped from the store once the archive has committed them.
+    """
+    cutoff = ((now or datetime.now()) - timedelta(days=older_than_days)).isoformat()
+    archived = 0
+    while True:
+        # The oldest `batch_size` records, oldest first
+        batch = store.page(max(0, store.size() - batch_size), batch_size)[::-1]
+        cold = 0
+        for record in batch:
+            if record.get('timestamp', '') >= cutoff:
+                break
+            cold += 1
+        keys = [record_key(record) for record in batch]
+        # Records up to the archive's newest one were archived by a run that crashed before dropping them
+        done = keys.index(archive.last_key) + 1 if archive.last_key in keys else 0
+        if not cold and not done:
+            break
+        if cold > done:
+            archive.append(batch[done:cold])
+            archived += cold - done
+        store.drop_oldest(max(cold, done))
+        store.flush()
+        if max(cold, done) < len(batch):
+            break
+    if archived:
+        print(f"DEBUG: Archived {archived} records to {archive.directory}")
+    return archived
+
+
+class ArchivedHistory:
+    """Pages through a store's records and then on into its archive, newest first."""
+
+    def __init__(self, store, archive: Optional[HistoryArchive]):
+        self.store = store
+        self.archive = archive
+
+    def page(self, cursor: int = 0, limit: int = 20) -> List[Dict[str, Any]]:
+        page = self.store.page(cursor, limit)
+        if self.archive is not None and len(page) < limit:
+            page += self.archive.page(max(0, cursor - self.store.size()), limit - len(page))
+        return page
@@ -0,0 +1,245 @@
+# history_store.py
+import os
+import threading
+from typing import Any, Dict, List, Optional
+from config import HISTORY_STORAGE, HISTORY_COMPACT_EVERY, HISTORY_MEMORY_WINDOW
+from data_handler import dumps, loads, load_json, write_atomic
+from write_behind import writer
+
+
+def page_records(records: List[Dict[str, Any]], cursor: int, limit: int) -> List[Dict[str, Any]]:
+    """Returns up to `limit` of `records`, newest first, skipping the `cursor` newest ones."""
+    end = max(0, len(records) - cursor)
+    return records[max(0, end - limit):end][::-1]
+
+
+def record_key(record: Dict[str, Any]) -> str:
+    """Identifies a history record: its id, or its timestamp for records that predate ids."""
+    return record.get('id') or record['timestamp']
+
+
+class JsonHistoryStore:
+    """Stores a history as one JSON list, rewritten in full on every flush (the original format).
+
+    Mutations only touch memory; `commit()` hands the write to the shared
+    write-behind writer, which flushes on its own thread.
+    """
+
+    def __init__(self, filepath: str):
+        self.filepath = filepath
+        self.records: List[Dict[str, Any]] = []
+        self._dirty = False
+        self._lock = threading.RLock()
+
+    def load(self) -> List[Dict[str, Any]]:
+        """Loads the history and returns the live list of records."""
+        self.records = load_json(self.filepath)
+        return self.records
+
+    def page(self, cursor: int = 0, limit: int = 20) -> List[Dict[str, Any]]:
+        """Returns up to `limit` records, newest first, skipping the `cursor` newest ones."""
+        with self._lock:
+            return page_records(self.records, cursor, limit)
+
+    def size(self) -> int:
+        """Returns how many records the store holds."""
+        return len(self.records)
+
+    def holds(self, record: Dict[str, Any]) -> bool:
+        """Returns whether changes to `record` (a record this store returned) are still persisted."""
+        return True  # every record stays in memory
+
+    def _changed(self, op: str, record: Dict[str, Any], **payload):
+        self._dirty = True
+
+    def add(self, record: Dict[str, Any]):
+        """Appends a new post, tweet or message."""
+        with self._lock:
+            self.records.append(record)
+            self._changed('add', record)
+
+    def add_comments(self, post: Dict[str, Any], comments: List[Dict[str, Any]]):
+        """Appends comments to a post."""
+        with self._lock:
+            post.setdefault('comments', []).extend(comments)
+            self._changed('add_comments', post, comments=comments)
+
+    def update(self, record: Dict[str, Any], **fields):
+        """Sets fields on an existing record (e.g. last_update)."""
+        with self._lock:
+            record.update(fields)
+            self._changed('update', record, fields=fields)
+
+    def like(self, post: Dict[str, Any], count: int = 1):
+        """Adds likes to a post."""
+        with self._lock:
+            post['likes'] = post.get('likes', 0) + count
+            self._changed('like', post, count=count)
+
+    def drop_oldest(self, count: int):
+        """Removes the `count` oldest records (e.g. after they were archived)."""
+        with self._lock:
+            del self.records[:count]
+            self._changed('drop_oldest', None, count=count)
+
+    def commit(self):
+        """Schedules everything changed since the last flush to be persisted."""
+        writer.schedule(self.filepath, self.flush)
+
+    def flush(self):
+        """Persists pending changes now."""
+        with self._lock:
+            if not self._dirty:
+                return
+            text = dumps(self.records, pretty=True)
+            self._dirty = False
+        write_atomic(self.filepath, text)
+
+
+class JsonlHistoryStore(JsonHistoryStore):
+    """Append-only storage: every change is one line in an event log.
+
+    The in-memory view is rebuilt on load from the latest snapshot plus the events
+    written after it. Every `compact_every` events the view is written to a new
+    snapshot and the log is truncated, so flushes stay O(1) appends and a crash
+    can at worst lose a partially written last line.
+    """
+
+    def __init__(self, filepath: str, compact_every: int = 500):
+        super().__init__(filepath)
+        base, _ = os.path.splitext(filepath)
+        self.snapshot_path = f"{base}.snapshot.jsonl"
+        self.events_path = f"{base}.events.jsonl"
+        self.compact_every = compact_every
+        self._index: Dict[str, Dict[str, Any]] = {}
+        self._seq = 0
+        self._events_since_snapshot = 0
+        self._pending: List[str] = []
+
+    def load(self) -> List[Dict[str, Any]]:
+        snapshot_seq = 0
+        self.records = []
+        if os.path.exists(self.snapshot_path):
+            with open(self.snapshot_path, 'r') as f:
+                header = f.readline()
+                if header:
+                    snapshot_seq = loads(header).get('seq', 0)
+                for line in f:
+                    if line.strip():
+                        self.records.append(loads(line))
+        elif os.path.exists(self.filepath):
+            # First run in this mode: start from the existing JSON history
+            self.records = load_json(self.filepath)
+        self._index = {record_key(record): record for record in self.records}
+        self._seq = snapshot_seq
+
+        self._events_since_snapshot = 0
+        if os.path.exists(self.events_path):
+            with open(self.events_path, 'r') as f:
+                for line in f:
+                    try:
+                        event = loads(line)
+                    except ValueError:
+                        print(f"DEBUG: Ignoring truncated event in {self.events_path}")
+                        break
+                    if event['seq'] <= snapshot_seq:
+                        continue  # already part of the snapshot
+                    self._apply(event)
+                    self._seq = event['seq']
+                    self._events_since_snapshot += 1
+        return self.records
+
+    def _apply(self, event: Dict[str, Any]):
+        op = event['op']
+        if op == 'drop_oldest':
+            self._drop_from_index(event['count'])
+            del self.records[:event['count']]
+            return
+        if op == 'add':
+            record = event['record']
+            self.records.append(record)
+            self._index[record_key(record)] = record
+            return
+        record = self._index.get(event['key'])
+        if record is None:
+            print(f"DEBUG: Event {event['seq']} refers to unknown record {event['key']}")
+        elif op == 'add_comments':
+            record.setdefault('comments', []).extend(event['comments'])
+        elif op == 'update':
+            record.update(event['fields'])
+        elif op == 'like':
+            record['likes'] = record.get('likes', 0) + event['count']
+
+    def _drop_from_index(self, count: int):
+        for record in self.records[:count]:
+            self._index.pop(record_key(record), None)
+
+    def _event(self, op: str, record: Dict[str, Any], payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Describes a change as an event that `_apply` can replay."""
+        event = {'op': op}
+        if op == 'add':
+            self._index[record_key(record)] = record
+            event['record'] = record
+        elif record is not None:
+            event['key'] = record_key(record)
+        event.update(payload)
+        return event
+
+    def _changed(self, op: str, record: Dict[str, Any], **payload):
+        self._seq += 1
+        event = {'seq': self._seq, **self._event(op, record, payload)}
+        self._pending.append(dumps(event))
+
+    def drop_oldest(self, count: int):
+        with self._lock:
+            self._drop_from_index(count)
+            super().drop_oldest(count)
+
+    def commit(self):
+        writer.schedule(self.events_path, self.flush)
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, []
+            if pending:
+                with open(self.events_path, 'a') as f:
+                    f.write('\n'.join(pending) + '\n')
+                    f.flush()
+                    os.fsync(f.fileno())
+                self._events_since_snapshot += len(pending)
+            if self._events_since_snapshot >= self.compact_every:
+                self.compact()
+
+    def compact(self):
+        """Writes the current view to a fresh snapshot and truncates the event log."""
+        with self._lock:
+            tmp_path = f"{self.snapshot_path}.tmp"
+            with open(tmp_path, 'w') as f:
+                f.write(dumps({'seq': self._seq}) + '\n')
+                for record in self.records:
+                    f.write(dumps(record) + '\n')
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.snapshot_path)
+            # Events up to self._seq are now in the snapshot; any left in the log are skipped on load
+            open(self.events_path, 'w').close()
+            self._events_since_snapshot = 0
+
+
+def open_history_store(filepath: str, mode: Optional[str] = None) -> JsonHistoryStore:
+    """Returns the history store for `filepath` in the configured storage mode."""
+    mode = mode or HISTORY_STORAGE
+    if mode == "json":
+        return JsonHistoryStore(filepath)
+    if mode == "jsonl":
+        return JsonlHistoryStore(filepath, compact_every=HISTORY_COMPACT_EVERY)
+    if mode == "paged":
+        from paged_history import PagedHistoryStore
+        return PagedHistoryStore(filepath, window=HISTORY_MEMORY_WINDOW, compact_every=HISTORY_COMPACT_EVERY)
+    if mode == "sqlite":
+        from sqlite_store import open_sqlite_store
+        return open_sqlite_store(filepath)
+    if mode == "wal":
+        from world_log import open_wal_store
+        return open_wal_store(filepath)
+    raise ValueError(f"Unknown history storage mode: {mode}")
@@ -0,0 +1,133 @@
+# interaction_engine.py
+import random
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+from relationship_graph import RelationshipGraph
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# How much a character's current mood scales their chance of interacting
+MOOD_MODIFIERS = {
+    'Happy': 1.2,
+    'Excited': 1.3,
+    'Content': 1.0,
+    'Neutral': 0.8,
+    'Tired': 0.6,
+    'Irritated': 0.4,
+    'Angry': 0.2,
+}
+DEFAULT_MOOD_MODIFIER = 0.8
+DEFAULT_SOCIAL_BATTERY = 5
+
+
+class InteractionEngine:
+    """Interaction probabilities for pairs of characters, kept as arrays.
+
+    Characters are identified by their id in the relationship graph. Social
+    battery (/10) and mood modifier are vectors indexed by id, and relationship
+    strengths (/100) come from the graph's batch lookup. The chance that an actor
+    interacts with a target is strength * social * mood. With NumPy,
+    `probabilities()` and `sample()` look up the strengths of all their pairs in
+    one call, scale them with one array expression and (for `sample()`) draw
+    every outcome with one `random(n) < p`; only mapping names to ids is done
+    per pair. Setters only touch the affected entries. Without NumPy the vectors
+    are plain lists and the maths runs per pair.
+    """
+
+    def __init__(self, graph: Optional[RelationshipGraph] = None, capacity: int = 64, seed: Optional[int] = None):
+        self.graph = graph if graph is not None else RelationshipGraph()
+        self.version = None  # registry version last synced
+        self._capacity = 0
+        self._social = self._mood = None
+        self._rng = np.random.default_rng(seed) if np is not None else random.Random(seed)
+        self._lock = threading.RLock()
+        self._grow(capacity)
+
+    def _grow(self, capacity: int):
+        n = self._capacity
+        if np is not None:
+            social = np.full(capacity, DEFAULT_SOCIAL_BATTERY / 10)
+            mood = np.full(capacity, DEFAULT_MOOD_MODIFIER)
+            if n:
+                social[:n] = self._social
+                mood[:n] = self._mood
+        else:
+            social = (self._social or []) + [DEFAULT_SOCIAL_BATTERY / 10] * (capacity - n)
+            mood = (self._mood or []) + [DEFAULT_MOOD_MODIFIER] * (capacity - n)
+        self._social, self._mood = social, mood
+        self._capacity = capacity
+
+    def id_of(self, name: str) -> int:
+        """Returns the graph id of a character, making room for its state if it is new."""
+        index = self.graph.id_of(name)
+        if index >= self._capacity:
+            with self._lock:
+                if index >= self._capacity:
+                    self._grow(max(self._capacity * 2, index + 1))
+        return index
+
+    def set_state(self, name: str, social_battery: Optional[float] = None, mood: Optional[str] = None):
+        """Updates a character's social battery (1-10) and/or mood."""
+        with self._lock:
+            index = self.id_of(name)
+            if social_battery is not None:
+                self._social[index] = social_battery / 10
+            if mood is not None:
+                self._mood[index] = MOOD_MODIFIERS.get(mood, DEFAULT_MOOD_MODIFIER)
+
+    def sync(self, characters: Dict[str, Dict], version=None):
+        """Loads supporting characters' social battery and mood, unless `version` was already synced."""
+        if version is not None and version == self.version:
+            return
+        with self._lock:
+            for name, data in characters.items():
+                self.set_state(name, data.get('social_battery', DEFAULT_SOCIAL_BATTERY), data.get('current_mood', 'Neutral'))
+            self.version = version
+
+    def probability(self, actor: str, target: str, strength: Optional[float] = None) -> float:
+        """Chance that `actor` interacts with `target`; `strength` (0-100) overrides the graph's."""
+        a = self.id_of(actor)
+        if strength is None:
+            strength = self.graph.strengths([a], [self.id_of(target)])[0]
+        return float(strength / 100 * self._social[a] * self._mood[a])
+
+    def _ids(self, names: Optional[Sequence[str]]):
+        """Graph ids of `names` (of every character if None), as an array with NumPy."""
+        if names is None:
+            n = len(self.graph.names)
+            if n > self._capacity:
+                self._grow(max(self._capacity * 2, n))
+            return np.arange(n) if np is not None else list(range(n))
+        ids = [self.id_of(name) for name in names]
+        return np.asarray(ids, dtype=np.int64) if np is not None else ids
+
+    def probabilities(self, actors: Optional[Sequence[str]] = None, targets: Optional[Sequence[str]] = None):
+        """Matrix of interaction chances, actors x targets (all characters by default)."""
+        with self._lock:
+            a, t = self._ids(actors), self._ids(targets)
+            if np is None:
+                return [[strength / 100 * self._social[i] * self._mood[i] for strength in self.graph.strengths([i] * len(t), t)] for i in a]
+            # Every (actor, target) pair in one batch lookup, then one broadcast multiply
+            strengths = np.asarray(self.graph.strengths(np.repeat(a, len(t)), np.tile(t, len(a))), dtype=float).reshape(len(a), len(t))
+            return strengths / 100 * (self._social[a] * self._mood[a])[:, None]
+
+    def sample(self, pairs: Sequence[Tuple[str, str]]) -> List[bool]:
+        """Decides for each (actor, target) pair whether they interact, in one batch."""
+        if not pairs:
+            return []
+        with self._lock:
+            a = self._ids([actor for actor, _ in pairs])
+            strengths = self.graph.strengths(a, self._ids([target for _, target in pairs]))
+            if np is None:
+                return [self._rng.random() < strength / 100 * self._social[i] * self._mood[i] for i, strength in zip(a, strengths)]
+            chances = np.asarray(strengths, dtype=float) / 100 * self._social[a] * self._mood[a]
+            return (self._rng.random(len(chances)) < chances).tolist()
+
+    def should_interact(self, actor: str, target: str, strength: Optional[float] = None) -> bool:
+        """Decides a single pair; `strength` (0-100) overrides the graph's."""
+        chance = self.probability(actor, target, strength)
+        with self._lock:
+            return self._rng.random() < chance
@@ -0,0 +1,163 @@
+# llm_backends.py
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, Optional
+
+try:
+    from typing import Protocol
+except ImportError:  # Python 3.7
+    Protocol = object
+
+
+@dataclass
+class LLMResponse:
+    """Raw text returned by a backend, plus token usage when the backend reports it."""
+    text: str
+    total_tokens: Optional[int] = None
+
+
+class LLMBackend(Protocol):
+    """Interface every text generation backend implements.
+
+    `rate_limited` tells the caller whether requests count against the shared
+    Gemini quota; local backends set it to False.
+    """
+    model_name: str
+    generation_config: Dict[str, Any]
+    system_instruction: str
+    rate_limited: bool
+
+    def generate(self, prompt: str, timeout: Optional[float] = None) -> LLMResponse:
+        ...
+
+    async def generate_async(self, prompt: str, timeout: Optional[float] = None) -> LLMResponse:
+        ...
+
+    def stream(self, prompt: str, timeout: Optional[float] = None) -> Iterator[str]:
+        ...
+
+
+class GeminiBackend:
+    """Backend backed by Google's Gemini API via `google.generativeai`."""
+
+    rate_limited = True
+
+    def __init__(self, model_name: str, generation_config: Dict[str, Any], system_instruction: str, api_key: Optional[str] = None):
+        import google.generativeai as genai
+
+        genai.configure(api_key=api_key or os.environ.get("GEMINI_API_KEY"))
+        self.model_name = model_name
+        self.generation_config = generation_config
+        self.system_instruction = system_instruction
+        self._model = genai.GenerativeModel(model_name=model_name, generation_config=generation_config, system_instruction=system_instruction)
+
+    @staticmethod
+    def _to_response(response) -> LLMResponse:
+        usage = getattr(response, "usage_metadata", None)
+        return LLMResponse(text=response.text, total_tokens=getattr(usage, "total_token_count", None))
+
+    @staticmethod
+    def _request_options(timeout: Optional[float]) -> Dict[str, Any]:
+        return {"timeout": timeout} if timeout else {}
+
+    def generate(self, prompt: str, timeout: Optional[float] = None) -> LLMResponse:
+        return self._to_response(self._model.generate_content(prompt, request_options=self._request_options(timeout)))
+
+    async def generate_async(self, prompt: str, timeout: Optional[float] = None) -> LLMResponse:
+        return self._to_response(await self._model.generate_content_async(prompt, request_options=self._request_options(timeout)))
+
+    def stream(self, prompt: str, timeout: Optional[float] = None) -> Iterator[str]:
+        for chunk in self._model.generate_content(prompt, stream=True, request_options=self._request_options(timeout)):
+            if chunk.text:
+                yield chunk.text
+
+
+class StubBackend:
+    """Offline backend returning deterministic, correctly formatted text.
+
+    Output is seeded from the prompt, so the same prompt always gives the same
+    answer, and `latency` seconds of synthetic delay are added to every call.
+    """
+
+    rate_limited = False
+
+    WORDS = [
+        "chaotic", "creative", "sunny", "cozy", "wild", "quiet", "bright", "lazy", "epic", "strange",
+        "garden", "coffee", "puzzle", "sunset", "pizza", "notebook", "tree", "city", "music", "weekend",
+        "loving", "trying", "building", "planning", "missing", "finding", "baking", "reading", "painting", "walking",
+    ]
+    ENDINGS = ["!", ".", " :)", "?!", " haha.", "..."]
+    NUMBERED_ENTRY = re.compile(r"^\s*(\d+)\.\s", re.MULTILINE)
+
+    def __init__(self, latency: float = 0.0, model_name: str = "stub"):
+        self.latency = latency
+        self.model_name = model_name
+        self.generation_config: Dict[str, Any] = {}
+        self.system_instruction = ""
+
+    def _rng(self, prompt: str) -> random.Random:
+        seed = int.from_bytes(hashlib.sha256(prompt.encode("utf-8")).digest()[:8], "big")
+        return random.Random(seed)
+
+    def _sentence(self, rng: random.Random, min_words: int = 4, max_words: int = 10) -> str:
+        words = rng.sample(self.WORDS, rng.randint(min_words, max_words))
+        return " ".join(words).capitalize() + rng.choice(self.ENDINGS)
+
+    def _render(self, prompt: str) -> str:
+        rng = self._rng(prompt)
+        if "JSON array" in prompt:
+            indices = [int(match) for match in self.NUMBERED_ENTRY.findall(prompt)]
+            return json.dumps([{"index": index, "text": self._sentence(rng)} for index in indices])
+        if "'Caption:'" in prompt or '"Caption:"' in prompt:
+            return f"Caption: {self._sentence(rng)}\nVisual Description: {self._sentence(rng, 8, 14)}"
+        if "'Tweet:'" in prompt:
+            return f"Tweet: {self._sentence(rng, 6, 14)}"
+        return self._sentence(rng)
+
+    def _check_timeout(self, timeout: Optional[float]):
+        if timeout is not None and self.latency > timeout:
+            raise TimeoutError(f"Stub latency {self.latency}s exceeds timeout {timeout}s")
+
+    def generate(self, prompt: str, timeout: Optional[float] = None) -> LLMResponse:
+        if self.latency:
+            time.sleep(min(self.latency, timeout or self.latency))
+        self._check_timeout(timeout)
+        text = self._render(prompt)
+        return LLMResponse(text=text, total_tokens=(len(prompt) + len(text)) // 4)
+
+    async def generate_async(self, prompt: str, timeout: Optional[float] = None) -> LLMResponse:
+        if self.latency:
+            await asyncio.sleep(min(self.latency, timeout or self.latency))
+        self._check_timeout(timeout)
+        text = self._render(prompt)
+        return LLMResponse(text=text, total_tokens=(len(prompt) + len(text)) // 4)
+
+    def stream(self, prompt: str, timeout: Optional[float] = None) -> Iterator[str]:
+        self._check_timeout(timeout)
+        chunks = re.findall(r"\S+\s*", self._render(prompt))
+        for chunk in chunks:
+            if self.latency:
+                time.sleep(self.latency / len(chunks))
+            yield chunk
+
+
+def create_backend(name: str, model_name: str, generation_config: Dict[str, Any], system_instruction: str, stub_latency: float = 0.0) -> Optional[LLMBackend]:
+    """Creates the backend called `name` ("gemini" or "stub").
+
+    Returns None if the Gemini backend is requested but its library is not installed.
+    """
+    if name == "stub":
+        return StubBackend(latency=stub_latency)
+    if name == "gemini":
+        try:
+            return GeminiBackend(model_name, generation_config, system_instruction)
+        except ImportError:
+            print("Warning: google-generativeai library not found. Content generation will be limited.")
+            return None
+    raise ValueError(f"Unknown LLM backend: {name}")
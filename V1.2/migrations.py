@@ -0,0 +1,76 @@
+# migrations.py
+import uuid
+from typing import Any, Callable, Dict, Iterator, List
+from config import SCHEMA_VERSIONS_FILE
+from data_handler import load_json, save_json
+
+# Dataset name -> ordered migration steps; a dataset's schema version is the number of steps applied
+MIGRATIONS: Dict[str, List[Callable]] = {}
+
+
+def migration(dataset: str):
+    """Registers a migration step for `dataset`; steps run in registration order, once each."""
+    def register(step: Callable):
+        MIGRATIONS.setdefault(dataset, []).append(step)
+        return step
+    return register
+
+
+def _iter_records(store, batch_size: int = 500) -> Iterator[Dict[str, Any]]:
+    """Yields every record in a store, including ones a paged store keeps on disk."""
+    cursor = 0
+    while True:
+        batch = store.page(cursor, batch_size)
+        yield from batch
+        if len(batch) < batch_size:
+            return
+        cursor += batch_size
+
+
+@migration("instagram_history")
+def backfill_last_update(store, context):
+    """Posts without 'last_update' default to their timestamp."""
+    for post in _iter_records(store):
+        if 'last_update' not in post:
+            store.update(post, last_update=post.get('timestamp', context['now']))
+
+
+@migration("instagram_history")
+def add_comment_ids(store, context):
+    """Older comments get an id so replies can point at them."""
+    for post in _iter_records(store):
+        comments = post.get('comments', [])
+        if any('id' not in comment for comment in comments):
+            store.update(post, comments=[comment if 'id' in comment else dict(comment, id=str(uuid.uuid4())) for comment in comments])
+
+
+@migration("twitter_history")
+def add_tweet_author(store, context):
+    """Older tweets were always by the main character but did not record an author."""
+    for tweet in _iter_records(store):
+        if 'author' not in tweet:
+            store.update(tweet, author=context['main_character'])
+
+
+def schema_versions(versions_file: str = SCHEMA_VERSIONS_FILE) -> Dict[str, int]:
+    """Returns the schema version recorded for each dataset."""
+    versions = load_json(versions_file)
+    return versions if isinstance(versions, dict) else {}
+
+
+def run_migrations(dataset: str, store, context: Dict[str, Any], versions_file: str = SCHEMA_VERSIONS_FILE) -> int:
+    """Applies the steps `dataset` has not had yet, recording each one once its changes are persisted.
+
+    Returns the number of steps applied. When the data is already current only the
+    small schema versions file is read.
+    """
+    steps = MIGRATIONS.get(dataset, [])
+    versions = schema_versions(versions_file)
+    current = versions.get(dataset, 0)
+    for version, step in enumerate(steps[current:], current + 1):
+        print(f"DEBUG: Migrating {dataset} to schema version {version} ({step.__name__})")
+        step(store, context)
+        store.flush()
+        versions[dataset] = version
+        save_json(versions_file, versions)
+    return max(0, len(steps) - current)
@@ -0,0 +1,249 @@
+# paged_history.py
+import os
+import struct
+from collections import OrderedDict
+from typing import Any, Dict, List, Tuple
+from data_handler import dumps, loads, load_json
+from history_store import JsonHistoryStore, record_key
+
+# Index sidecar layout: an 8-byte header holding the size of the records file it
+# covers, then one 8-byte offset per record (slot), pointing at its latest version.
+_OFFSET = struct.Struct("<Q")
+
+
+class PagedHistoryStore(JsonHistoryStore):
+    """History store that keeps only the newest `window` records in memory.
+
+    Every version of a record is appended to `<base>.records.jsonl` as a
+    `[slot, record]` line, and `<base>.records.idx` maps each slot to the offset
+    of its latest version. `page()` serves the newest records from any cursor by
+    seeking through the index, so neither startup nor paging parses the rest of
+    the history. Records older than the window are no longer updated by the
+    simulator unless they are paged back in and changed explicitly.
+    """
+
+    def __init__(self, filepath: str, window: int = 200, compact_every: int = 500):
+        super().__init__(filepath)
+        base, _ = os.path.splitext(filepath)
+        self.records_path = f"{base}.records.jsonl"
+        self.index_path = f"{base}.records.idx"
+        self.window = window
+        self.compact_every = compact_every
+        self.count = 0
+        self._slots: Dict[str, int] = {}  # record key -> slot, for the records in the window
+        self._paged_slots: "OrderedDict[str, int]" = OrderedDict()  # the same for the last `window` paged-in records
+        self._dirty_slots: Dict[int, Dict[str, Any]] = {}
+        self._stale_versions = 0
+
+    # Index file helpers
+
+    def _read_offsets(self, first_slot: int, n: int) -> List[int]:
+        if n <= 0:
+            return []
+        with open(self.index_path, 'rb') as f:
+            f.seek(_OFFSET.size * (1 + first_slot))
+            data = f.read(_OFFSET.size * n)
+        return [offset for (offset,) in _OFFSET.iter_unpack(data)]
+
+    def _read_versions(self, offsets: List[int]) -> List[Dict[str, Any]]:
+        records = []
+        with open(self.records_path, 'rb') as f:
+            for offset in offsets:
+                f.seek(offset)
+                _, record = loads(f.readline())
+                records.append(record)
+        return records
+
+    def _index_is_current(self) -> bool:
+        if not os.path.exists(self.index_path):
+            return False
+        with open(self.index_path, 'rb') as f:
+            header = f.read(_OFFSET.size)
+        return len(header) == _OFFSET.size and _OFFSET.unpack(header)[0] == os.path.getsize(self.records_path)
+
+    def _rebuild_index(self):
+        """Rebuilds the index by scanning the records file (after a crash or a first import)."""
+        offsets: List[int] = []
+        offset = 0
+        with open(self.records_path, 'rb') as f:
+            for line in f:
+                try:
+                    slot, _ = loads(line)
+                except ValueError:
+                    print(f"DEBUG: Dropping truncated record in {self.records_path}")
+                    break
+                if slot >= len(offsets):
+                    offsets.extend([0] * (slot + 1 - len(offsets)))
+                offsets[slot] = offset
+                offset += len(line)
+        with open(self.records_path, 'ab') as f:
+            f.truncate(offset)
+        self._write_index(offsets, offset)
+        print(f"DEBUG: Rebuilt index for {self.records_path} ({len(offsets)} records)")
+
+    def _write_index(self, offsets: List[int], records_size: int):
+        tmp_path = f"{self.index_path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(_OFFSET.pack(records_size))
+            for offset in offsets:
+                f.write(_OFFSET.pack(offset))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.index_path)
+
+    # Store API
+
+    def load(self) -> List[Dict[str, Any]]:
+        """Loads the newest `window` records and returns them as the live list."""
+        if not os.path.exists(self.records_path):
+            # First run in this mode: import the existing JSON history once
+            legacy = load_json(self.filepath) if os.path.exists(self.filepath) else []
+            with open(self.records_path, 'w') as f:
+                for slot, record in enumerate(legacy):
+                    f.write(dumps([slot, record]) + '\n')
+            self._rebuild_index()
+        elif not self._index_is_current():
+            self._rebuild_index()
+
+        self.count = (os.path.getsize(self.index_path) - _OFFSET.size) // _OFFSET.size
+        first = max(0, self.count - self.window)
+        self.records = self._read_versions(self._read_offsets(first, self.count - first))
+        self._slots = {record_key(record): first + i for i, record in enumerate(self.records)}
+        self._paged_slots = OrderedDict()
+        self._dirty_slots = {}
+        return self.records
+
+    def page(self, cursor: int = 0, limit: int = 20) -> List[Dict[str, Any]]:
+        """Returns up to `limit` records, newest first, skipping the `cursor` newest ones."""
+        with self._lock:
+            newest = self.count - 1 - cursor
+            oldest = max(0, newest - limit + 1)
+            if newest < 0:
+                return []
+            window_start = self.count - len(self.records)
+            on_disk = [slot for slot in range(oldest, min(newest + 1, window_start)) if slot not in self._dirty_slots]
+            from_disk = {}
+            if on_disk:
+                offsets = self._read_offsets(on_disk[0], on_disk[-1] - on_disk[0] + 1)
+                versions = self._read_versions([offsets[slot - on_disk[0]] for slot in on_disk])
+                from_disk = dict(zip(on_disk, versions))
+            page = []
+            for slot in range(newest, oldest - 1, -1):
+                if slot >= window_start:
+                    record = self.records[slot - window_start]
+                elif slot in self._dirty_slots:
+                    record = self._dirty_slots[slot]
+                else:
+                    record = from_disk[slot]
+                    # Remember the slot so paged-in records can still be liked or commented on
+                    self._paged_slots[record_key(record)] = slot
+                    while len(self._paged_slots) > self.window:
+                        self._paged_slots.popitem(last=False)
+                page.append(record)
+            return page
+
+    def size(self) -> int:
+        return self.count
+
+    def holds(self, record: Dict[str, Any]) -> bool:
+        # Only the records in the memory window; evicted ones are stale copies
+        return record_key(record) in self._slots
+
+    def drop_oldest(self, count: int):
+        """Removes the `count` oldest records by rewriting the records file with renumbered slots."""
+        with self._lock:
+            self.flush()
+            count = min(count, self.count)
+            if not count:
+                return
+            tmp_path = f"{self.records_path}.tmp"
+            offsets = []
+            offset = 0
+            with open(self.records_path, 'rb') as f, open(tmp_path, 'wb') as out:
+                for first in range(count, self.count, 1000):
+                    for slot, version_offset in enumerate(self._read_offsets(first, min(1000, self.count - first)), first):
+                        f.seek(version_offset)
+                        _, record = loads(f.readline())
+                        line = (dumps([slot - count, record]) + '\n').encode('utf-8')
+                        out.write(line)
+                        offsets.append(offset)
+                        offset += len(line)
+                out.flush()
+                os.fsync(out.fileno())
+            # A crash before the index is rewritten leaves a stale header, which triggers a rebuild on load
+            os.replace(tmp_path, self.records_path)
+            self._write_index(offsets, offset)
+            self._stale_versions = 0
+            self.count -= count
+            self._slots = {key: slot - count for key, slot in self._slots.items() if slot >= count}
+            self._paged_slots = OrderedDict((key, slot - count) for key, slot in self._paged_slots.items() if slot >= count)
+            overflow = len(self.records) - self.count
+            if overflow > 0:
+                del self.records[:overflow]
+
+    def _changed(self, op: str, record: Dict[str, Any], **payload):
+        if op == 'add':
+            slot = self.count
+            self.count += 1
+            self._slots[record_key(record)] = slot
+            if len(self.records) > self.window:
+                self._slots.pop(record_key(self.records.pop(0)), None)
+        else:
+            slot = self._slots.get(record_key(record), self._paged_slots.get(record_key(record)))
+            if slot is None:
+                print(f"DEBUG: Change to unknown record {record_key(record)} in {self.records_path}")
+                return
+        self._dirty_slots[slot] = record
+
+    def flush(self):
+        # Holds the lock throughout so page() never sees an index slot before its record is written
+        with self._lock:
+            if not self._dirty_slots:
+                return
+            dirty, self._dirty_slots = self._dirty_slots, {}
+            indexed = (os.path.getsize(self.index_path) - _OFFSET.size) // _OFFSET.size
+            new_offsets: List[Tuple[int, int]] = []
+            with open(self.records_path, 'ab') as f:
+                offset = f.tell()
+                for slot, record in sorted(dirty.items()):
+                    data = (dumps([slot, record]) + '\n').encode('utf-8')
+                    f.write(data)
+                    new_offsets.append((slot, offset))
+                    offset += len(data)
+                f.flush()
+                os.fsync(f.fileno())
+            with open(self.index_path, 'r+b') as f:
+                for slot, record_offset in new_offsets:
+                    f.seek(_OFFSET.size * (1 + slot))
+                    f.write(_OFFSET.pack(record_offset))
+                # Written last: a crash before this point leaves a stale header, which triggers a rebuild on load
+                f.seek(0)
+                f.write(_OFFSET.pack(offset))
+                f.flush()
+                os.fsync(f.fileno())
+            # Rewritten records leave their previous version behind in the records file
+            self._stale_versions += sum(1 for slot, _ in new_offsets if slot < indexed)
+            if self._stale_versions >= self.compact_every:
+                self.compact()
+
+    def compact(self):
+        """Rewrites the records file keeping only the latest version of each record."""
+        with self._lock:
+            # Only flushed records are in the index; unflushed ones are appended by the next flush
+            count = (os.path.getsize(self.index_path) - _OFFSET.size) // _OFFSET.size
+            tmp_path = f"{self.records_path}.tmp"
+            offsets = []
+            offset = 0
+            with open(self.records_path, 'rb') as f, open(tmp_path, 'wb') as out:
+                for first in range(0, count, 1000):
+                    for version_offset in self._read_offsets(first, min(1000, count - first)):
+                        f.seek(version_offset)
+                        line = f.readline()
+                        out.write(line)
+                        offsets.append(offset)
+                        offset += len(line)
+                out.flush()
+                os.fsync(out.fileno())
+            os.replace(tmp_path, self.records_path)
+            self._write_index(offsets, offset)
+            self._stale_versions = 0
@@ -0,0 +1,50 @@
+# post_queue.py
+import heapq
+import itertools
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+from utils import parse_timestamp
+
+
+class DuePostQueue:
+    """Min-heap of posts keyed by when they are next due for an interaction pass.
+
+    A post is due `interval_for(age)` after its last pass. The interval starts at
+    `base_interval` seconds and grows linearly with the post's age (by one base
+    interval per `age_scale` seconds, capped at `max_interval`), so new posts are
+    visited often and old ones rarely. `pop_due()` only touches posts whose time
+    has come, so a pass costs O(due posts * log n) however long the history is.
+    """
+
+    def __init__(self, base_interval: float = 5.0, age_scale: float = 3600.0, max_interval: float = 86400.0):
+        self.base_interval = base_interval
+        self.age_scale = age_scale
+        self.max_interval = max_interval
+        self._heap: List[Tuple[datetime, int, Dict[str, Any]]] = []
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def interval_for(self, age_seconds: float) -> float:
+        """Seconds between passes for a post that is `age_seconds` old."""
+        return min(self.max_interval, self.base_interval * (1 + max(0.0, age_seconds) / self.age_scale))
+
+    def schedule(self, post: Dict[str, Any], now: datetime, last_pass: Optional[datetime] = None):
+        """Queues `post` one interval after its last pass (`last_update` unless given)."""
+        if last_pass is None:
+            last_pass = parse_timestamp(post.get('last_update') or post['timestamp'])
+        age = (now - parse_timestamp(post['timestamp'])).total_seconds()
+        due_at = last_pass + timedelta(seconds=self.interval_for(age))
+        with self._lock:
+            heapq.heappush(self._heap, (due_at, next(self._seq), post))
+
+    def pop_due(self, now: datetime) -> List[Dict[str, Any]]:
+        """Removes and returns the posts due at `now`, earliest first."""
+        due = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                due.append(heapq.heappop(self._heap)[2])
+        return due
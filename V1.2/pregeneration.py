@@ -0,0 +1,107 @@
+# pregeneration.py
+import threading
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Optional, Tuple
+from rate_limiter import GenerationError
+
+ACTION_INSTAGRAM = "instagram"
+ACTION_TWITTER = "twitter"
+ACTION_WHATSAPP = "whatsapp"
+
+
+class DraftPool:
+    """Keeps a small buffer of ready-to-publish drafts per action, filled by a background worker.
+
+    Each draft is tagged with the simulator's state fingerprint (mood and energy)
+    at the time it was generated; drafts that no longer match the current state
+    are discarded instead of being published.
+    """
+
+    def __init__(self, simulator, buffer_size: int = 1, retry_delay: float = 30.0):
+        self.simulator = simulator
+        self.buffer_size = buffer_size
+        self.retry_delay = retry_delay
+        self._producers: Dict[str, Callable[[], Any]] = {
+            ACTION_INSTAGRAM: simulator.draft_instagram_post,
+            ACTION_TWITTER: simulator.draft_twitter_post,
+            ACTION_WHATSAPP: simulator.draft_whatsapp_chat,
+        }
+        self._buffers: Dict[str, Deque[Tuple[Any, Any]]] = {action: deque() for action in self._producers}
+        self._condition = threading.Condition()
+        self._stopped = False
+        self._thread: Optional[threading.Thread] = None
+        self.hits = 0
+        self.misses = 0
+        simulator.state_listeners.append(self.invalidate)
+
+    def start(self):
+        """Starts the background worker (once)."""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+
+    def invalidate(self):
+        """Drops every buffered draft, e.g. after the character's mood or energy changed."""
+        with self._condition:
+            for buffer in self._buffers.values():
+                buffer.clear()
+            self._condition.notify_all()
+
+    def take(self, action: str) -> Optional[Any]:
+        """Returns a ready draft for `action`, or None if none is buffered for the current state."""
+        fingerprint = self.simulator.state_fingerprint()
+        with self._condition:
+            buffer = self._buffers[action]
+            while buffer:
+                draft_fingerprint, draft = buffer.popleft()
+                if draft_fingerprint == fingerprint:
+                    self.hits += 1
+                    self._condition.notify_all()  # wake the worker to refill
+                    return draft
+            self.misses += 1
+            self._condition.notify_all()
+            return None
+
+    def _next_action(self) -> Optional[str]:
+        for action, buffer in self._buffers.items():
+            if len(buffer) < self.buffer_size:
+                return action
+        return None
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._stopped and self._next_action() is None:
+                    self._condition.wait()
+                if self._stopped:
+                    return
+                action = self._next_action()
+
+            fingerprint = self.simulator.state_fingerprint()
+            try:
+                draft = self._producers[action]()
+            except GenerationError as e:
+                print(f"DEBUG: Pre-generation of {action} draft failed: {e}")
+                with self._condition:
+                    self._condition.wait(self.retry_delay)
+                continue
+
+            with self._condition:
+                if not draft:
+                    self._condition.wait(self.retry_delay)  # e.g. no supporting characters yet
+                # Discard drafts generated against a state that changed meanwhile
+                elif fingerprint == self.simulator.state_fingerprint():
+                    self._buffers[action].append((fingerprint, draft))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._condition:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "buffered": {action: len(buffer) for action, buffer in self._buffers.items()},
+            }
@@ -0,0 +1,191 @@
+# rate_limiter.py
+import asyncio
+import random
+import threading
+import time
+from typing import Awaitable, Callable, Dict, Optional, Tuple, TypeVar
+
+try:
+    from google.api_core import exceptions as google_exceptions
+except ImportError:
+    google_exceptions = None
+
+T = TypeVar("T")
+
+
+class GenerationError(Exception):
+    """Raised when content could not be generated after all retries."""
+
+
+class EmptyResponseError(Exception):
+    """Raised when the model returns a response without any text."""
+
+
+def estimate_tokens(text: str) -> int:
+    """Roughly estimates the token count of a piece of text (~4 characters per token)."""
+    return max(1, len(text) // 4)
+
+
+class TokenBucket:
+    """Classic token bucket that refills continuously up to `capacity`."""
+
+    def __init__(self, capacity: float, refill_per_second: float):
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.refill_per_second)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Returns the seconds until `amount` tokens are available (0 if they are now)."""
+        self._refill(time.monotonic())
+        # Requests larger than the bucket are let through once the bucket is full
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.refill_per_second
+
+    def take(self, amount: float):
+        """Removes `amount` tokens; call after `wait_time` returned 0."""
+        self.tokens -= min(amount, self.capacity)
+
+    def adjust(self, amount: float):
+        """Debits (positive) or credits (negative) tokens after the fact."""
+        self._refill(time.monotonic())
+        self.tokens = min(self.capacity, self.tokens - amount)
+
+
+class RateLimiter:
+    """Process-wide limiter on requests per minute and tokens per minute.
+
+    Every thread (Streamlit, the scheduler, live updates) shares one instance,
+    and callers either block with `acquire` or await `acquire_async`.
+    """
+
+    def __init__(self, requests_per_minute: float, tokens_per_minute: float):
+        self._requests = TokenBucket(requests_per_minute, requests_per_minute / 60)
+        self._tokens = TokenBucket(tokens_per_minute, tokens_per_minute / 60)
+        self._lock = threading.Lock()
+        self.waited_seconds = 0.0
+
+    def _try_acquire(self, estimated_tokens: int) -> float:
+        with self._lock:
+            wait = max(self._requests.wait_time(1), self._tokens.wait_time(estimated_tokens))
+            if wait <= 0:
+                self._requests.take(1)
+                self._tokens.take(estimated_tokens)
+            return wait
+
+    def acquire(self, estimated_tokens: int = 1):
+        """Blocks until a request of `estimated_tokens` fits within both limits."""
+        while True:
+            wait = self._try_acquire(estimated_tokens)
+            if wait <= 0:
+                return
+            self.waited_seconds += wait
+            time.sleep(wait)
+
+    async def acquire_async(self, estimated_tokens: int = 1):
+        """Awaits until a request of `estimated_tokens` fits within both limits."""
+        while True:
+            wait = self._try_acquire(estimated_tokens)
+            if wait <= 0:
+                return
+            self.waited_seconds += wait
+            await asyncio.sleep(wait)
+
+    def record_usage(self, estimated_tokens: int, actual_tokens: Optional[int]):
+        """Corrects the token bucket once the real usage of a request is known."""
+        if actual_tokens is None:
+            return
+        with self._lock:
+            self._tokens.adjust(actual_tokens - estimated_tokens)
+
+
+def _error_names(error: Exception):
+    return {cls.__name__ for cls in type(error).__mro__}
+
+
+class RetryPolicy:
+    """Exponential backoff with full jitter, with limits chosen per error class.
+
+    Quota errors back off longer than transient server errors; anything not
+    classified (bad requests, blocked prompts, auth errors) is not retried.
+    """
+
+    # error class -> (max attempts, base delay in seconds)
+    DEFAULT_RULES: Dict[str, Tuple[int, float]] = {
+        "quota": (5, 4.0),
+        "transient": (4, 1.0),
+        "empty": (2, 0.5),
+    }
+
+    QUOTA_ERRORS = {"ResourceExhausted", "TooManyRequests"}
+    TRANSIENT_ERRORS = {
+        "ServiceUnavailable", "InternalServerError", "DeadlineExceeded", "GatewayTimeout",
+        "BadGateway", "Aborted", "TimeoutError", "ConnectionError",
+    }
+
+    def __init__(self, rules: Optional[Dict[str, Tuple[int, float]]] = None, max_delay: float = 60.0):
+        self.rules = dict(self.DEFAULT_RULES)
+        if rules:
+            self.rules.update(rules)
+        self.max_delay = max_delay
+        self.retries = 0
+
+    def classify(self, error: Exception) -> Optional[str]:
+        """Maps an exception to an error class name, or None if it should not be retried."""
+        if isinstance(error, EmptyResponseError):
+            return "empty"
+        names = _error_names(error)
+        if names & self.QUOTA_ERRORS:
+            return "quota"
+        if names & self.TRANSIENT_ERRORS:
+            return "transient"
+        return None
+
+    def delay(self, error_class: str, attempt: int) -> float:
+        """Returns the jittered backoff before retry number `attempt` (starting at 1)."""
+        _, base_delay = self.rules[error_class]
+        return random.uniform(0, min(self.max_delay, base_delay * (2 ** (attempt - 1))))
+
+    def call(self, func: Callable[[], T]) -> T:
+        """Calls `func`, retrying retryable failures; raises GenerationError when it gives up."""
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                return func()
+            except GenerationError:
+                raise
+            except Exception as e:
+                error_class = self.classify(e)
+                max_attempts = self.rules[error_class][0] if error_class else 1
+                if attempt >= max_attempts:
+                    raise GenerationError(f"Generation failed after {attempt} attempt(s): {e}") from e
+                delay = self.delay(error_class, attempt)
+                print(f"DEBUG: {error_class} error from Gemini ({e}), retrying in {delay:.1f}s")
+                self.retries += 1
+                time.sleep(delay)
+
+    async def call_async(self, func: Callable[[], Awaitable[T]]) -> T:
+        """Async variant of `call` that awaits the backoff instead of sleeping."""
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                return await func()
+            except GenerationError:
+                raise
+            except Exception as e:
+                error_class = self.classify(e)
+                max_attempts = self.rules[error_class][0] if error_class else 1
+                if attempt >= max_attempts:
+                    raise GenerationError(f"Generation failed after {attempt} attempt(s): {e}") from e
+                delay = self.delay(error_class, attempt)
+                print(f"DEBUG: {error_class} error from Gemini ({e}), retrying in {delay:.1f}s")
+                self.retries += 1
+                await asyncio.sleep(delay)
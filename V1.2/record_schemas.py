@@ -0,0 +1,158 @@
+# record_schemas.py
+from typing import Any, Dict, List, Optional, TypedDict, get_args, get_origin, get_type_hints
+from utils import parse_timestamp
+
+
+class SchemaError(ValueError):
+    """Raised when a stored record does not match its schema."""
+
+
+class Comment(TypedDict, total=False):
+    id: str
+    author: str
+    text: str
+    timestamp: str
+    parent_id: Optional[str]
+    degraded: bool
+
+
+class Post(TypedDict, total=False):
+    id: str
+    author: str
+    content: str
+    timestamp: str
+    last_update: str
+    likes: int
+    comments: List[Comment]
+    degraded: bool
+
+
+class Tweet(TypedDict, total=False):
+    author: str
+    content: str
+    timestamp: str
+    degraded: bool
+
+
+class WhatsAppMessage(TypedDict, total=False):
+    sender: str
+    recipient: str
+    message: str
+    timestamp: str
+    degraded: bool
+
+
+class EventLogEntry(TypedDict, total=False):
+    timestamp: str
+    event: str
+    name: str
+    details: str
+    involved_characters: List[str]
+    degraded: bool
+
+
+class BasicInformation(TypedDict, total=False):
+    Name: str
+
+
+class CharacterDNA(TypedDict, total=False):
+    current_mood: str
+    energy_level: int
+    social_battery: int
+    stress_level: int
+
+
+# Keys every record of a schema must have (everything else is optional)
+REQUIRED_KEYS = {
+    Comment: {'author', 'text', 'timestamp'},
+    Post: {'author', 'content', 'timestamp'},
+    Tweet: {'author', 'content', 'timestamp'},  # 'author' backfilled by migrations.add_tweet_author
+    WhatsAppMessage: {'sender', 'recipient', 'message', 'timestamp'},
+    EventLogEntry: {'timestamp'},
+    BasicInformation: {'Name'},
+    CharacterDNA: {'Basic Information'},
+}
+
+# Fields whose names are not valid identifiers
+_EXTRA_HINTS = {
+    CharacterDNA: {'Basic Information': BasicInformation},
+}
+
+# History file base name -> schema of its records
+HISTORY_SCHEMAS = {
+    "instagram_history": Post,
+    "twitter_history": Tweet,
+    "whatsapp_history": WhatsAppMessage,
+}
+
+_hints_cache: Dict[type, Dict[str, Any]] = {}
+
+
+def _hints(schema) -> Dict[str, Any]:
+    if schema not in _hints_cache:
+        hints = get_type_hints(schema)
+        hints.update(_EXTRA_HINTS.get(schema, {}))
+        _hints_cache[schema] = hints
+    return _hints_cache[schema]
+
+
+def _check(value: Any, hint: Any, path: str):
+    origin = get_origin(hint)
+    if hint is Any:
+        return
+    if hint in REQUIRED_KEYS:
+        validate(hint, value, path)
+    elif origin is list:
+        if not isinstance(value, list):
+            raise SchemaError(f"{path}: expected a list, got {type(value).__name__}")
+        (item_hint,) = get_args(hint)
+        for i, item in enumerate(value):
+            _check(item, item_hint, f"{path}[{i}]")
+    elif get_args(hint) and type(None) in get_args(hint):  # Optional[...]
+        if value is not None:
+            _check(value, next(arg for arg in get_args(hint) if arg is not type(None)), path)
+    elif hint is int:
+        if not isinstance(value, int) or isinstance(value, bool):
+            raise SchemaError(f"{path}: expected an int, got {type(value).__name__}")
+    elif not isinstance(value, hint):
+        raise SchemaError(f"{path}: expected {hint.__name__}, got {type(value).__name__}")
+
+
+def validate(schema, record: Any, path: str = "record") -> Any:
+    """Checks `record` against a schema above and returns it; raises SchemaError if it does not match.
+
+    Timestamps must be ISO 8601 strings; they are parsed (and memoized) here, so
+    rendering them later needs no parsing of its own.
+    """
+    if not isinstance(record, dict):
+        raise SchemaError(f"{path}: expected an object, got {type(record).__name__}")
+    missing = REQUIRED_KEYS[schema] - record.keys()
+    if missing:
+        raise SchemaError(f"{path}: missing {', '.join(sorted(missing))}")
+    for key, hint in _hints(schema).items():
+        if key in record:
+            _check(record[key], hint, f"{path}.{key}")
+    for key in ('timestamp', 'last_update'):
+        if isinstance(record.get(key), str):
+            try:
+                parse_timestamp(record[key])
+            except ValueError:
+                raise SchemaError(f"{path}.{key}: not an ISO 8601 timestamp: {record[key]!r}")
+    return record
+
+
+def validate_records(schema, records: List[Dict[str, Any]], source: str):
+    """Validates loaded records, logging each invalid one; raises SchemaError if any were invalid.
+
+    A malformed record is rejected rather than loaded, so the simulator never
+    renders or writes back data that does not match its schema.
+    """
+    invalid = 0
+    for i, record in enumerate(records):
+        try:
+            validate(schema, record, f"{source}[{i}]")
+        except SchemaError as e:
+            invalid += 1
+            print(f"DEBUG: Invalid record: {e}")
+    if invalid:
+        raise SchemaError(f"{source}: {invalid} invalid record(s); fix or remove them and restart")
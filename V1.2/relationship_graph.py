@@ -0,0 +1,217 @@
+# relationship_graph.py
+import threading
+from array import array
+from bisect import bisect_left
+from typing import Dict, List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Strength (0-100) assumed between characters with no recorded relationship
+DEFAULT_RELATIONSHIP_STRENGTH = 50
+
+
+def _edge_keys(sources, targets):
+    # (source, target) packed into one sortable int64; ids stay well below 2**32
+    return (np.asarray(sources, dtype=np.int64) << 32) | np.asarray(targets, dtype=np.int64)
+
+
+def _search(keys, queries):
+    """Positions of `queries` in the sorted `keys`, and a mask of the ones that are present."""
+    positions = np.searchsorted(keys, queries)
+    if not len(keys):
+        return positions, np.zeros(len(queries), dtype=bool)
+    found = keys[np.minimum(positions, len(keys) - 1)] == queries
+    return positions, found
+
+
+class RelationshipGraph:
+    """Directed, weighted relationships between any two characters.
+
+    Characters get integer ids. Edges are kept in CSR arrays: for source `i`,
+    `indices[indptr[i]:indptr[i + 1]]` are its targets (sorted) and `weights` the
+    matching strengths (0-100). A single strength lookup is one binary search in
+    a row, and a row is the neighbour list. Because rows are stored in source
+    order with sorted targets, the packed (source, target) keys of all edges are
+    sorted too. With NumPy, `strengths()` looks up a whole batch of pairs with one
+    `searchsorted` over those keys. Without NumPy the arrays are `array`s and
+    batches are looked up pair by pair.
+
+    Edge updates go into a small per-source overlay that lookups check first. It
+    is merged into the arrays once it holds `merge_threshold` edges, so updates
+    never rebuild the arrays one at a time.
+    """
+
+    def __init__(self, merge_threshold: int = 1024):
+        self.ids: Dict[str, int] = {}
+        self.names: List[str] = []
+        self.merge_threshold = merge_threshold
+        if np is not None:
+            self._indptr = np.zeros(1, dtype=np.int64)
+            self._indices = np.zeros(0, dtype=np.int64)
+            self._weights = np.zeros(0)
+            self._keys = np.zeros(0, dtype=np.int64)  # packed (source, target) of every edge, sorted
+        else:
+            self._indptr = array('q', [0])
+            self._indices = array('q')
+            self._weights = array('d')
+        self._overlay: Dict[int, Dict[int, Optional[float]]] = {}  # None marks a removed edge
+        self._overlay_size = 0
+        self._overlay_arrays = None  # sorted (keys, weights) of the overlay for batch lookups, NaN = removed
+        self._lock = threading.RLock()
+
+    def id_of(self, name: str) -> int:
+        """Returns the id of a character, registering it if it is new."""
+        index = self.ids.get(name)
+        if index is None:
+            with self._lock:
+                index = self.ids.get(name)
+                if index is None:
+                    index = len(self.names)
+                    self.names.append(name)
+                    self.ids[name] = index
+        return index
+
+    def _row(self, source: int) -> Tuple[int, int]:
+        if source + 1 < len(self._indptr):
+            return int(self._indptr[source]), int(self._indptr[source + 1])
+        return 0, 0  # registered after the last merge
+
+    def _set(self, source: int, target: int, strength: Optional[float]):
+        with self._lock:
+            row = self._overlay.setdefault(source, {})
+            if target not in row:
+                self._overlay_size += 1
+            row[target] = strength
+            self._overlay_arrays = None
+            if self._overlay_size >= self.merge_threshold:
+                self.merge()
+
+    def set_edge(self, source: str, target: str, strength: float):
+        """Records how strongly `source` relates to `target` (0-100)."""
+        self._set(self.id_of(source), self.id_of(target), float(strength))
+
+    def remove_edge(self, source: str, target: str):
+        if source in self.ids and target in self.ids:
+            self._set(self.ids[source], self.ids[target], None)
+
+    def add_relationships(self, source: str, relationships: Dict[str, Dict], symmetric: bool = False):
+        """Adds edges from `source` for a relationships.json-style mapping (target -> {"interaction_frequency": 0-1})."""
+        with self._lock:
+            for target, relationship in relationships.items():
+                strength = relationship.get("interaction_frequency", DEFAULT_RELATIONSHIP_STRENGTH / 100) * 100
+                self.set_edge(source, target, strength)
+                if symmetric:
+                    self.set_edge(target, source, strength)
+
+    def strength_by_id(self, source: int, target: int, default: Optional[float] = DEFAULT_RELATIONSHIP_STRENGTH) -> Optional[float]:
+        row = self._overlay.get(source)
+        if row is not None and target in row:
+            strength = row[target]
+            return default if strength is None else strength
+        lo, hi = self._row(source)
+        if np is not None:
+            position = lo + int(np.searchsorted(self._indices[lo:hi], target))
+        else:
+            position = bisect_left(self._indices, target, lo, hi)
+        if position < hi and self._indices[position] == target:
+            return float(self._weights[position])
+        return default
+
+    def strength(self, source: str, target: str, default: Optional[float] = DEFAULT_RELATIONSHIP_STRENGTH) -> Optional[float]:
+        """Returns how strongly `source` relates to `target`, or `default` if there is no edge."""
+        if source not in self.ids or target not in self.ids:
+            return default
+        with self._lock:
+            return self.strength_by_id(self.ids[source], self.ids[target], default)
+
+    def _overlay_keys(self):
+        if self._overlay_arrays is None:
+            edges = sorted(((source << 32) | target, np.nan if strength is None else strength)
+                           for source, row in self._overlay.items() for target, strength in row.items())
+            self._overlay_arrays = (np.array([key for key, _ in edges], dtype=np.int64),
+                                    np.array([strength for _, strength in edges], dtype=float))
+        return self._overlay_arrays
+
+    def strengths(self, sources: Sequence[int], targets: Sequence[int]):
+        """Strengths for many (source id, target id) pairs, with the default for missing edges.
+
+        Returns a float array with NumPy, a list without.
+        """
+        with self._lock:
+            if np is None:
+                return [self.strength_by_id(source, target) for source, target in zip(sources, targets)]
+            queries = _edge_keys(sources, targets)
+            positions, found = _search(self._keys, queries)
+            result = np.full(len(queries), float(DEFAULT_RELATIONSHIP_STRENGTH))
+            result[found] = self._weights[positions[found]]
+            if self._overlay:
+                keys, weights = self._overlay_keys()
+                positions, found = _search(keys, queries)
+                overlaid = weights[positions[found]]
+                # Removed edges fall back to the default
+                result[found] = np.where(np.isnan(overlaid), DEFAULT_RELATIONSHIP_STRENGTH, overlaid)
+            return result
+
+    def neighbours(self, source: str) -> Dict[str, float]:
+        """Returns every character `source` has a relationship with, and its strength."""
+        if source not in self.ids:
+            return {}
+        with self._lock:
+            index = self.ids[source]
+            lo, hi = self._row(index)
+            row = {int(self._indices[i]): float(self._weights[i]) for i in range(lo, hi)}
+            row.update(self._overlay.get(index, {}))
+            return {self.names[target]: strength for target, strength in row.items() if strength is not None}
+
+    def merge(self):
+        """Folds the overlay into the CSR arrays."""
+        with self._lock:
+            if np is not None:
+                self._merge_arrays()
+            else:
+                self._merge_lists()
+            self._overlay = {}
+            self._overlay_size = 0
+            self._overlay_arrays = None
+
+    def _merge_arrays(self):
+        keys, weights = self._keys, self._weights
+        if self._overlay:
+            overlay_keys, overlay_weights = self._overlay_keys()
+            kept = ~np.isin(keys, overlay_keys)
+            added = ~np.isnan(overlay_weights)
+            keys = np.concatenate([keys[kept], overlay_keys[added]])
+            weights = np.concatenate([weights[kept], overlay_weights[added]])
+            order = np.argsort(keys, kind='stable')
+            keys, weights = keys[order], weights[order]
+        # Row i starts at the first edge whose source is >= i
+        self._indptr = np.searchsorted(keys >> 32, np.arange(len(self.names) + 1)).astype(np.int64)
+        self._indices = keys & 0xFFFFFFFF
+        self._weights = weights
+        self._keys = keys
+
+    def _merge_lists(self):
+        indptr, indices, weights = array('q', [0]), array('q'), array('d')
+        for source in range(len(self.names)):
+            lo, hi = self._row(source)
+            overlay = self._overlay.get(source)
+            if overlay:
+                row = dict(zip(self._indices[lo:hi], self._weights[lo:hi]))
+                row.update(overlay)
+                for target in sorted(row):
+                    if row[target] is not None:
+                        indices.append(target)
+                        weights.append(row[target])
+            else:
+                indices.extend(self._indices[lo:hi])
+                weights.extend(self._weights[lo:hi])
+            indptr.append(len(indices))
+        self._indptr, self._indices, self._weights = indptr, indices, weights
+
+    def edge_count(self) -> int:
+        with self._lock:
+            self.merge()
+            return len(self._indices)
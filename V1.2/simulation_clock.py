@@ -0,0 +1,185 @@
+# simulation_clock.py
+import heapq
+import itertools
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Callable, List, Optional, Tuple
+from config import SIMULATION_DAILY_UPDATE_TIME, SIMULATION_INTERACTION_INTERVAL
+
+
+class WallClock:
+    """Real time: what the simulator reads unless it is given a virtual clock."""
+
+    def now(self) -> datetime:
+        return datetime.now()
+
+    def sleep_until(self, when: datetime):
+        delay = (when - datetime.now()).total_seconds()
+        if delay > 0:
+            time.sleep(delay)
+
+
+class VirtualClock:
+    """Simulated time that only moves when told to; `sleep_until` jumps straight to the target."""
+
+    def __init__(self, start: Optional[datetime] = None):
+        self._now = start or datetime.now()
+        self._lock = threading.Lock()
+
+    def now(self) -> datetime:
+        return self._now
+
+    def sleep_until(self, when: datetime):
+        with self._lock:
+            self._now = max(self._now, when)
+
+    def advance(self, delta: timedelta):
+        self.sleep_until(self._now + delta)
+
+
+# Shared by every simulator that is not given a clock of its own
+wall_clock = WallClock()
+
+
+class ScheduledEvent:
+    """An action due at `when`; repeating events are rescheduled `interval` after each run."""
+
+    def __init__(self, when: datetime, action: Callable[[], object], name: str, interval: Optional[timedelta] = None):
+        self.when = when
+        self.action = action
+        self.name = name
+        self.interval = interval
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class EventScheduler:
+    """Discrete-event scheduler: a priority queue of timestamped actions run in time order.
+
+    The scheduler reads and moves time through its clock. With the wall clock it
+    sleeps until each event is due; with a VirtualClock it jumps from one event to
+    the next, so `run_for(timedelta(days=30))` takes only as long as the actions.
+    """
+
+    def __init__(self, clock=None):
+        self.clock = clock or wall_clock
+        self._queue: List[Tuple[datetime, int, ScheduledEvent]] = []
+        self._seq = itertools.count()
+        self._condition = threading.Condition()
+        self.executed = 0
+
+    def _push(self, event: ScheduledEvent) -> ScheduledEvent:
+        with self._condition:
+            heapq.heappush(self._queue, (event.when, next(self._seq), event))
+            self._condition.notify_all()
+        return event
+
+    def schedule_at(self, when: datetime, action: Callable[[], object], name: Optional[str] = None) -> ScheduledEvent:
+        """Runs `action` once at `when`."""
+        return self._push(ScheduledEvent(when, action, name or action.__name__))
+
+    def schedule_every(self, interval: timedelta, action: Callable[[], object], start: Optional[datetime] = None,
+                       name: Optional[str] = None) -> ScheduledEvent:
+        """Runs `action` every `interval`, first at `start` (one interval from now by default)."""
+        return self._push(ScheduledEvent(start or self.clock.now() + interval, action, name or action.__name__, interval))
+
+    def schedule_daily(self, at: str, action: Callable[[], object], name: Optional[str] = None) -> ScheduledEvent:
+        """Runs `action` every day at `at` ("HH:MM")."""
+        hour, minute = (int(part) for part in at.split(":"))
+        now = self.clock.now()
+        first = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        if first <= now:
+            first += timedelta(days=1)
+        return self.schedule_every(timedelta(days=1), action, first, name)
+
+    def _next_event(self) -> Optional[ScheduledEvent]:
+        while self._queue and self._queue[0][2].cancelled:
+            heapq.heappop(self._queue)
+        return self._queue[0][2] if self._queue else None
+
+    def _pop_due(self, until: datetime) -> Optional[ScheduledEvent]:
+        with self._condition:
+            event = self._next_event()
+            if event is None or event.when > until:
+                return None
+            return heapq.heappop(self._queue)[2]
+
+    def _run(self, event: ScheduledEvent):
+        self.clock.sleep_until(event.when)
+        try:
+            event.action()
+        except Exception as e:
+            print(f"DEBUG: Scheduled event {event.name} failed: {e}")
+        self.executed += 1
+        if event.interval is not None and not event.cancelled:
+            # Runs missed while the action was busy are skipped, not replayed
+            now = self.clock.now()
+            event.when += event.interval
+            while event.when <= now - event.interval:
+                event.when += event.interval
+            self._push(event)
+
+    def run_until(self, end: datetime) -> int:
+        """Runs every event due up to `end` in time order, then moves the clock to `end`; returns how many ran."""
+        executed = 0
+        event = self._pop_due(end)
+        while event is not None:
+            self._run(event)
+            executed += 1
+            event = self._pop_due(end)
+        self.clock.sleep_until(end)
+        return executed
+
+    def run_for(self, duration: timedelta) -> int:
+        """Runs the events due in the next `duration` of clock time."""
+        return self.run_until(self.clock.now() + duration)
+
+    def run_pending(self) -> int:
+        """Runs the events that are already due, without waiting."""
+        return self.run_until(self.clock.now())
+
+    def run_forever(self):
+        """Runs events as they fall due (for the wall clock, e.g. on a background thread)."""
+        while True:
+            with self._condition:
+                event = self._next_event()
+                delay = None if event is None else (event.when - self.clock.now()).total_seconds()
+                if delay is None or delay > 0:
+                    # Woken early when an earlier event is scheduled
+                    self._condition.wait(delay)
+                    continue
+            self.run_pending()
+
+
+def schedule_simulation(scheduler: EventScheduler, simulator):
+    """Schedules a simulator's recurring work: the daily updates and the post interaction passes."""
+    scheduler.schedule_daily(SIMULATION_DAILY_UPDATE_TIME, simulator.run_daily_updates)
+    scheduler.schedule_every(timedelta(seconds=SIMULATION_INTERACTION_INTERVAL), simulator.update_post_interactions)
+
+
+def fast_forward(simulator, days: float) -> int:
+    """Simulates `days` of virtual time as fast as possible; `simulator` must run on a VirtualClock.
+
+    Returns how many scheduled events ran.
+    """
+    if not isinstance(simulator.clock, VirtualClock):
+        raise ValueError("fast_forward needs a simulator running on a VirtualClock")
+    scheduler = EventScheduler(simulator.clock)
+    schedule_simulation(scheduler, simulator)
+    return scheduler.run_for(timedelta(days=days))
+
+
+if __name__ == "__main__":
+    import sys
+    from character import CharacterSimulator
+    from write_behind import writer
+
+    days = float(sys.argv[1]) if len(sys.argv) > 1 else 30
+    simulator = CharacterSimulator(clock=VirtualClock())
+    started = time.perf_counter()
+    executed = fast_forward(simulator, days)
+    writer.flush()
+    print(f"Simulated {days:g} days ({executed} events) in {time.perf_counter() - started:.1f}s")
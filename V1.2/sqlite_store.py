@@ -0,0 +1,524 @@
+# sqlite_store.py
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+from data_handler import dumps, loads, load_json, load_character_dna, load_supporting_characters
+from history_store import page_records, record_key
+from write_behind import writer
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS posts (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    id TEXT NOT NULL UNIQUE,
+    author TEXT,
+    timestamp TEXT,
+    last_update TEXT,
+    likes INTEGER NOT NULL DEFAULT 0,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_posts_author ON posts(author);
+CREATE INDEX IF NOT EXISTS idx_posts_timestamp ON posts(timestamp);
+
+CREATE TABLE IF NOT EXISTS comments (
+    id TEXT PRIMARY KEY,
+    post_id TEXT NOT NULL,
+    parent_id TEXT,
+    position INTEGER NOT NULL,
+    author TEXT,
+    timestamp TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_comments_post_id ON comments(post_id, position);
+CREATE INDEX IF NOT EXISTS idx_comments_author ON comments(author);
+CREATE INDEX IF NOT EXISTS idx_comments_timestamp ON comments(timestamp);
+
+CREATE TABLE IF NOT EXISTS tweets (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    author TEXT,
+    timestamp TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_tweets_author ON tweets(author);
+CREATE INDEX IF NOT EXISTS idx_tweets_timestamp ON tweets(timestamp);
+
+CREATE TABLE IF NOT EXISTS whatsapp_messages (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    author TEXT,
+    recipient TEXT,
+    timestamp TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_whatsapp_author ON whatsapp_messages(author);
+CREATE INDEX IF NOT EXISTS idx_whatsapp_recipient ON whatsapp_messages(recipient);
+CREATE INDEX IF NOT EXISTS idx_whatsapp_timestamp ON whatsapp_messages(timestamp);
+
+CREATE TABLE IF NOT EXISTS events (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_events_timestamp ON events(timestamp);
+
+CREATE TABLE IF NOT EXISTS characters (
+    name TEXT PRIMARY KEY,
+    is_main INTEGER NOT NULL DEFAULT 0,
+    dna TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS relationships (
+    name TEXT PRIMARY KEY,
+    relationship_type TEXT,
+    interaction_frequency REAL,
+    data TEXT NOT NULL
+);
+"""
+
+# History file (by base name) -> table holding its records
+HISTORY_TABLES = {
+    "instagram_history": "posts",
+    "twitter_history": "tweets",
+    "whatsapp_history": "whatsapp_messages",
+}
+
+
+class SimulationDatabase:
+    """SQLite database (WAL mode) holding posts, comments, tweets, messages, events, characters and relationships."""
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.lock = threading.RLock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self.conn.commit()
+
+    def execute(self, sql: str, params=()):
+        with self.lock:
+            self.conn.execute(sql, params)
+
+    def query(self, sql: str, params=()) -> List[tuple]:
+        with self.lock:
+            return self.conn.execute(sql, params).fetchall()
+
+    def commit(self):
+        with self.lock:
+            self.conn.commit()
+
+    def is_empty(self, table: str) -> bool:
+        return not self.query(f"SELECT 1 FROM {table} LIMIT 1")
+
+    # Posts and comments
+
+    def insert_post(self, post: Dict[str, Any]):
+        key = record_key(post)
+        data = {k: v for k, v in post.items() if k != 'comments'}
+        self.execute(
+            "INSERT OR IGNORE INTO posts (id, author, timestamp, last_update, likes, data) VALUES (?, ?, ?, ?, ?, ?)",
+            (key, post.get('author'), post.get('timestamp'), post.get('last_update'), post.get('likes', 0), dumps(data)),
+        )
+        self.insert_comments(key, post.get('comments', []), start=0)
+
+    def update_post(self, post: Dict[str, Any]):
+        data = {k: v for k, v in post.items() if k != 'comments'}
+        self.execute(
+            "UPDATE posts SET last_update = ?, likes = ?, data = ? WHERE id = ?",
+            (post.get('last_update'), post.get('likes', 0), dumps(data), record_key(post)),
+        )
+
+    def replace_comments(self, post_id: str, comments: List[Dict[str, Any]]):
+        with self.lock:
+            self.conn.execute("DELETE FROM comments WHERE post_id = ?", (post_id,))
+            self.insert_comments(post_id, comments, start=0)
+
+    def insert_comments(self, post_id: str, comments: List[Dict[str, Any]], start: int):
+        with self.lock:
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO comments (id, post_id, parent_id, position, author, timestamp, data) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (comment.get('id') or f"{post_id}:{position}", post_id, comment.get('parent_id'), position,
+                     comment.get('author'), comment.get('timestamp'), dumps(comment))
+                    for position, comment in enumerate(comments, start)
+                ],
+            )
+
+    def latest_posts(self, limit: int = 20, offset: int = 0, author: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Returns up to `limit` posts (with comments), newest first, skipping the `offset` newest, optionally by one author."""
+        if author is None:
+            rows = self.query("SELECT id, data FROM posts ORDER BY seq DESC LIMIT ? OFFSET ?", (limit, offset))
+        else:
+            rows = self.query("SELECT id, data FROM posts WHERE author = ? ORDER BY seq DESC LIMIT ? OFFSET ?",
+                              (author, limit, offset))
+        return self._with_comments(rows)
+
+    def _with_comments(self, rows) -> List[Dict[str, Any]]:
+        posts = []
+        by_id = {}
+        for post_id, data in rows:
+            post = loads(data)
+            post['comments'] = []
+            posts.append(post)
+            by_id[post_id] = post
+        if by_id:
+            placeholders = ",".join("?" * len(by_id))
+            for post_id, data in self.query(
+                f"SELECT post_id, data FROM comments WHERE post_id IN ({placeholders}) ORDER BY post_id, position",
+                list(by_id),
+            ):
+                by_id[post_id]['comments'].append(loads(data))
+        return posts
+
+    def comments_by_author(self, author: str) -> List[Dict[str, Any]]:
+        """Returns all comments written by `author`, oldest first, each tagged with its post_id."""
+        comments = []
+        for post_id, data in self.query("SELECT post_id, data FROM comments WHERE author = ? ORDER BY timestamp", (author,)):
+            comment = loads(data)
+            comment['post_id'] = post_id
+            comments.append(comment)
+        return comments
+
+    # Tweets and WhatsApp messages
+
+    def insert_record(self, table: str, record: Dict[str, Any]) -> int:
+        """Inserts a tweet or message and returns its row seq."""
+        with self.lock:
+            if table == "whatsapp_messages":
+                cursor = self.conn.execute(
+                    "INSERT INTO whatsapp_messages (author, recipient, timestamp, data) VALUES (?, ?, ?, ?)",
+                    (record.get('sender'), record.get('recipient'), record.get('timestamp'), dumps(record)),
+                )
+            else:
+                cursor = self.conn.execute(
+                    f"INSERT INTO {table} (author, timestamp, data) VALUES (?, ?, ?)",
+                    (record.get('author'), record.get('timestamp'), dumps(record)),
+                )
+            return cursor.lastrowid
+
+    def update_record(self, table: str, seq: int, record: Dict[str, Any]):
+        author = record.get('sender') if table == "whatsapp_messages" else record.get('author')
+        self.execute(f"UPDATE {table} SET author = ?, timestamp = ?, data = ? WHERE seq = ?",
+                     (author, record.get('timestamp'), dumps(record), seq))
+
+    def all_records(self, table: str) -> List[tuple]:
+        """Returns (seq, record) for every tweet, message or event, oldest first."""
+        return [(seq, loads(data)) for seq, data in self.query(f"SELECT seq, data FROM {table} ORDER BY seq")]
+
+    def latest_records(self, table: str, limit: int = 20, offset: int = 0) -> List[tuple]:
+        """Returns (seq, record) for up to `limit` tweets/messages/events, newest first, skipping the `offset` newest."""
+        rows = self.query(f"SELECT seq, data FROM {table} ORDER BY seq DESC LIMIT ? OFFSET ?", (limit, offset))
+        return [(seq, loads(data)) for seq, data in rows]
+
+    def messages_with(self, name: str) -> List[Dict[str, Any]]:
+        """Returns every WhatsApp message sent or received by `name`, oldest first."""
+        rows = self.query(
+            "SELECT seq, data FROM whatsapp_messages WHERE author = ? "
+            "UNION ALL SELECT seq, data FROM whatsapp_messages WHERE recipient = ? AND author IS NOT ? ORDER BY seq",
+            (name, name, name),
+        )
+        return [loads(data) for _, data in rows]
+
+    def delete_oldest(self, table: str, count: int):
+        """Deletes the `count` oldest rows of a history table (and, for posts, their comments)."""
+        with self.lock:
+            if table == "posts":
+                self.conn.execute("DELETE FROM comments WHERE post_id IN (SELECT id FROM posts ORDER BY seq LIMIT ?)", (count,))
+            self.conn.execute(f"DELETE FROM {table} WHERE seq IN (SELECT seq FROM {table} ORDER BY seq LIMIT ?)", (count,))
+
+    def count(self, table: str) -> int:
+        return self.query(f"SELECT COUNT(*) FROM {table}")[0][0]
+
+    # Event log, characters and relationships
+
+    def log_event(self, entry: Dict[str, Any]):
+        """Appends an entry to the random events log."""
+        self.execute("INSERT INTO events (timestamp, data) VALUES (?, ?)", (entry.get('timestamp'), dumps(entry)))
+        writer.schedule(self.path, self.commit)
+
+    def import_events(self, log: List[Dict[str, Any]]):
+        with self.lock:
+            self.conn.executemany("INSERT INTO events (timestamp, data) VALUES (?, ?)",
+                                  [(entry.get('timestamp'), dumps(entry)) for entry in log])
+            self.conn.commit()
+        print(f"DEBUG: Imported {len(log)} events")
+
+    def event_log(self) -> List[Dict[str, Any]]:
+        """Returns the random events log, oldest first."""
+        return [entry for _, entry in self.all_records("events")]
+
+    def save_character(self, dna: Dict[str, Any], is_main: bool = False):
+        name = dna.get('Basic Information', {}).get('Name')
+        if name:
+            self.execute(
+                "INSERT OR REPLACE INTO characters (name, is_main, dna) VALUES (?, ?, ?)",
+                (name, int(is_main), dumps(dna)),
+            )
+
+    def load_characters(self, include_main: bool = False) -> Dict[str, Dict[str, Any]]:
+        """Returns character DNA by name (supporting characters only unless `include_main`)."""
+        sql = "SELECT name, dna FROM characters" if include_main else "SELECT name, dna FROM characters WHERE is_main = 0"
+        return {name: loads(dna) for name, dna in self.query(sql)}
+
+    def save_relationships(self, relationships: Dict[str, Dict[str, Any]]):
+        with self.lock:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO relationships (name, relationship_type, interaction_frequency, data) VALUES (?, ?, ?, ?)",
+                [
+                    (name, rel.get('relationship_type'), rel.get('interaction_frequency'), dumps(rel))
+                    for name, rel in relationships.items()
+                ],
+            )
+
+    def load_relationships(self) -> Dict[str, Dict[str, Any]]:
+        return {name: loads(data) for name, data in self.query("SELECT name, data FROM relationships")}
+
+
+class SqliteHistoryStore:
+    """History store for tweets and WhatsApp messages, one row per record.
+
+    Only the newest `window` records are loaded into memory. `page()` serves older
+    ones with a query on the table's primary key, so neither startup nor scrolling
+    the feed reads the whole table. The row seqs of the last `window` paged-in
+    records are kept too, so they can still be liked or updated from the feed.
+    """
+
+    def __init__(self, db: SimulationDatabase, table: str, filepath: Optional[str] = None, window: int = 200):
+        self.db = db
+        self.table = table
+        self.filepath = filepath
+        self.window = window
+        self.count = 0
+        self.records: List[Dict[str, Any]] = []
+        self._seqs: Dict[int, Tuple[Optional[int], Dict[str, Any]]] = {}  # id() of a record in the window -> (row seq or None, record)
+        self._paged: "OrderedDict[int, Tuple[Optional[int], Dict[str, Any]]]" = OrderedDict()  # the same for recently paged-in records
+        self._lock = db.lock
+
+    def load(self) -> List[Dict[str, Any]]:
+        """Loads the newest `window` records and returns them as the live list.
+
+        On first use the table is filled from the existing JSON history, if any.
+        """
+        if self.filepath and self.db.is_empty(self.table) and os.path.exists(self.filepath):
+            self.import_records(load_json(self.filepath))
+        with self._lock:
+            self.count = self.db.count(self.table)
+            self._seqs = {}
+            self._paged = OrderedDict()
+            self.records = []
+            for seq, record in reversed(self._fetch(self.window)):
+                self._seqs[id(record)] = (seq, record)
+                self.records.append(record)
+        return self.records
+
+    def _fetch(self, limit: int, offset: int = 0) -> List[Tuple[Optional[int], Dict[str, Any]]]:
+        """Reads (row seq, record) for up to `limit` records, newest first, skipping the `offset` newest."""
+        return self.db.latest_records(self.table, limit, offset)
+
+    def _page_in(self, rows: List[Tuple[Optional[int], Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        # Holding the record keeps its id() from being reused while it is mapped
+        for seq, record in rows:
+            self._paged[id(record)] = (seq, record)
+        while len(self._paged) > self.window:
+            self._paged.popitem(last=False)
+        return [record for _, record in rows]
+
+    def _seq_of(self, record: Dict[str, Any]):
+        entry = self._seqs.get(id(record)) or self._paged.get(id(record))
+        return None if entry is None else entry[0]
+
+    def _insert(self, record: Dict[str, Any]) -> Optional[int]:
+        return self.db.insert_record(self.table, record)
+
+    def _write(self, record: Dict[str, Any]):
+        seq = self._seq_of(record)
+        if seq is None:
+            print(f"DEBUG: Change to unknown record {record_key(record)} in {self.table}")
+            return
+        self.db.update_record(self.table, seq, record)
+
+    def import_records(self, records: List[Dict[str, Any]]):
+        for record in records:
+            self._insert(record)
+        self.db.commit()
+        print(f"DEBUG: Imported {len(records)} records into {self.table}")
+
+    def latest(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """Returns the newest records, newest first, without loading the whole history."""
+        return self.page(0, limit)
+
+    def page(self, cursor: int = 0, limit: int = 20) -> List[Dict[str, Any]]:
+        """Returns up to `limit` records, newest first, skipping the `cursor` newest ones."""
+        with self._lock:
+            page = page_records(self.records, cursor, limit)
+            if len(page) < limit:
+                # Past the records in memory, which are always the newest ones
+                page += self._page_in(self._fetch(limit - len(page), max(cursor, len(self.records))))
+            return page
+
+    def size(self) -> int:
+        return self.count
+
+    def holds(self, record: Dict[str, Any]) -> bool:
+        # Records evicted from the window may be stale; writing them back could undo newer changes
+        return id(record) in self._seqs
+
+    def drop_oldest(self, count: int):
+        """Deletes the `count` oldest records (e.g. after they were archived)."""
+        with self._lock:
+            count = min(count, self.count)
+            self.db.delete_oldest(self.table, count)
+            self.count -= count
+            # The window only loses records when fewer than `window` are left
+            overflow = len(self.records) - self.count
+            if overflow > 0:
+                for record in self.records[:overflow]:
+                    self._seqs.pop(id(record), None)
+                del self.records[:overflow]
+            self._paged.clear()
+
+    def add(self, record: Dict[str, Any]):
+        with self._lock:
+            self.records.append(record)
+            self._seqs[id(record)] = (self._insert(record), record)
+            self.count += 1
+            if len(self.records) > self.window:
+                self._seqs.pop(id(self.records.pop(0)), None)
+
+    def add_comments(self, post: Dict[str, Any], comments: List[Dict[str, Any]]):
+        with self._lock:
+            post.setdefault('comments', []).extend(comments)
+            self._write(post)
+
+    def update(self, record: Dict[str, Any], **fields):
+        with self._lock:
+            record.update(fields)
+            self._write(record)
+
+    def like(self, post: Dict[str, Any], count: int = 1):
+        with self._lock:
+            post['likes'] = post.get('likes', 0) + count
+            self._write(post)
+
+    def commit(self):
+        writer.schedule(self.db.path, self.db.commit)
+
+    def flush(self):
+        self.db.commit()
+
+
+class SqlitePostStore(SqliteHistoryStore):
+    """History store for Instagram posts; comments live in their own indexed table."""
+
+    def _fetch(self, limit: int, offset: int = 0) -> List[Tuple[Optional[int], Dict[str, Any]]]:
+        return [(None, post) for post in self.db.latest_posts(limit, offset)]
+
+    def _page_in(self, rows: List[Tuple[Optional[int], Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        # Posts are written back by id, so paged-in posts need no seq
+        return [post for _, post in rows]
+
+    def latest(self, limit: int = 20, author: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Returns the newest posts, newest first, optionally only those by `author` (an indexed query)."""
+        if author is None:
+            return self.page(0, limit)
+        with self._lock:
+            in_memory = {record_key(post): post for post in self.records}
+            # Posts still in the window are returned as the live objects
+            return [in_memory.get(record_key(post), post) for post in self.db.latest_posts(limit, author=author)]
+
+    def comments_by_author(self, author: str) -> List[Dict[str, Any]]:
+        """Returns every comment by `author`, oldest first, each tagged with its post_id."""
+        return self.db.comments_by_author(author)
+
+    def _insert(self, record: Dict[str, Any]) -> Optional[int]:
+        self.db.insert_post(record)
+        return None
+
+    def _write(self, record: Dict[str, Any]):
+        self.db.update_post(record)
+
+    def add_comments(self, post: Dict[str, Any], comments: List[Dict[str, Any]]):
+        with self._lock:
+            existing = post.setdefault('comments', [])
+            start = len(existing)
+            existing.extend(comments)
+            self.db.insert_comments(record_key(post), comments, start)
+
+    def update(self, record: Dict[str, Any], **fields):
+        with self._lock:
+            record.update(fields)
+            self.db.update_post(record)
+            if 'comments' in fields:
+                self.db.replace_comments(record_key(record), record['comments'])
+
+
+_databases: Dict[str, SimulationDatabase] = {}
+_databases_lock = threading.Lock()
+
+
+def get_database(path: Optional[str] = None) -> SimulationDatabase:
+    """Returns the shared database connection for `path` (SQLITE_DB_FILE by default)."""
+    if path is None:
+        from config import SQLITE_DB_FILE
+        path = SQLITE_DB_FILE
+    with _databases_lock:
+        if path not in _databases:
+            _databases[path] = SimulationDatabase(path)
+        return _databases[path]
+
+
+def open_sqlite_store(filepath: str, db: Optional[SimulationDatabase] = None) -> SqliteHistoryStore:
+    """Returns the SQLite-backed store for a history file path from config.
+
+    By default the database is the one in the same directory as `filepath`.
+    """
+    base = os.path.splitext(os.path.basename(filepath))[0]
+    table = HISTORY_TABLES.get(base)
+    if table is None:
+        raise ValueError(f"No SQLite table for history file: {filepath}")
+    from config import SQLITE_DB_FILE, HISTORY_MEMORY_WINDOW
+    if db is None:
+        db = get_database(os.path.join(os.path.dirname(filepath), os.path.basename(SQLITE_DB_FILE)))
+    store_class = SqlitePostStore if table == "posts" else SqliteHistoryStore
+    return store_class(db, table, filepath, HISTORY_MEMORY_WINDOW)
+
+
+def migrate_json_to_sqlite(db_path: Optional[str] = None):
+    """Copies the JSON histories, event log, characters and relationships into the SQLite database.
+
+    Tables that already contain data are left alone, so running it twice is harmless.
+    """
+    from config import (DNA_FILE, INSTAGRAM_HISTORY_FILE, TWITTER_HISTORY_FILE, WHATSAPP_HISTORY_FILE,
+                        RANDOM_EVENTS_FILE, SUPPORTING_CHARS_DIR, RELATIONSHIP_FILE)
+    db = get_database(db_path)
+
+    for filepath in (INSTAGRAM_HISTORY_FILE, TWITTER_HISTORY_FILE, WHATSAPP_HISTORY_FILE):
+        store = open_sqlite_store(filepath, db)
+        if db.is_empty(store.table):
+            store.import_records(load_json(filepath))
+        else:
+            print(f"DEBUG: Skipping {filepath}, {store.table} already has data")
+
+    if db.is_empty("events"):
+        events_data = load_json(RANDOM_EVENTS_FILE)
+        db.import_events(events_data.get("log", []) if isinstance(events_data, dict) else [])
+
+    if db.is_empty("characters"):
+        db.save_character(load_character_dna(DNA_FILE), is_main=True)
+        for dna in load_supporting_characters(SUPPORTING_CHARS_DIR).values():
+            db.save_character(dna)
+
+    if db.is_empty("relationships"):
+        relationships = load_json(RELATIONSHIP_FILE)
+        if isinstance(relationships, dict):
+            db.save_relationships(relationships)
+
+    db.commit()
+    print(f"DEBUG: Migration to {db.path} complete")
+
+
+if __name__ == "__main__":
+    migrate_json_to_sqlite()
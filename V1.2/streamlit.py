@@ -2,14 +2,15 @@ import streamlit as st
 import json
 import os
 import random
-import schedule
 import time
 import threading
-from datetime import datetime
 from character import CharacterSimulator
-from data_handler import load_character_dna, save_character_dna, load_json, load_supporting_characters
-from utils import format_datetime
-from config import DNA_FILE, SUPPORTING_CHARS_DIR, RANDOM_EVENTS_FILE
+from rate_limiter import GenerationError
+from data_handler import save_character_dna
+from utils import format_datetime, parse_timestamp
+from config import SUPPORTING_CHARS_DIR, PREGENERATION_ENABLED, PREGENERATION_BUFFER_SIZE, HISTORY_PAGE_SIZE, SIMULATION_DAILY_UPDATE_TIME
+from simulation_clock import EventScheduler
+from pregeneration import DraftPool, ACTION_INSTAGRAM, ACTION_TWITTER, ACTION_WHATSAPP
 import uuid  # Import the uuid library
 
 st.title("AI Character Simulation")
@@ -19,26 +20,90 @@ if 'simulator' not in st.session_state:
 
 simulator = st.session_state['simulator']
 
+if PREGENERATION_ENABLED and 'draft_pool' not in st.session_state:
+    st.session_state['draft_pool'] = DraftPool(simulator, buffer_size=PREGENERATION_BUFFER_SIZE)
+    st.session_state['draft_pool'].start()
+
+draft_pool = st.session_state.get('draft_pool')
+
+def take_draft(action):
+    """Returns a pre-generated draft for `action`, if one is ready."""
+    return draft_pool.take(action) if draft_pool else None
+
+def show_more_button(key, shown):
+    """Renders a button that shows another page of older entries."""
+    if shown >= st.session_state.get(key, HISTORY_PAGE_SIZE) and st.button("Load older", key=f"{key}_button"):
+        st.session_state[key] = st.session_state.get(key, HISTORY_PAGE_SIZE) + HISTORY_PAGE_SIZE
+        st.rerun()
+
+def run_action(action):
+    """Runs a simulator action, reporting generation failures instead of crashing the app."""
+    try:
+        action()
+    except GenerationError as e:
+        st.sidebar.error(f"Content generation failed: {e}")
+        return
+    st.rerun()
+
+def stream_instagram_post():
+    """Publishes a pre-generated Instagram post, or generates one while rendering the caption and comments as they arrive."""
+    draft = take_draft(ACTION_INSTAGRAM)
+    if draft:
+        simulator.commit_instagram_post(draft)
+        return
+
+    with st.container():
+        st.write(f"**{simulator.name}** is posting...")
+        content_placeholder = st.empty()
+        comments_container = st.container()
+
+        def show_content(content):
+            content_placeholder.markdown(content)
+
+        def show_comment(comment):
+            comments_container.markdown(f"""
+            <div class='comment-container'>
+                <strong>{comment['author']}</strong>: {comment['text']}
+            </div>
+            """, unsafe_allow_html=True)
+
+        simulator.simulate_instagram_post(on_content=show_content, on_comment=show_comment)
+
+def stream_twitter_post():
+    """Publishes a pre-generated tweet, or generates one while rendering it as it arrives."""
+    draft = take_draft(ACTION_TWITTER)
+    if draft:
+        simulator.commit_twitter_post(draft)
+        return
+
+    with st.container():
+        st.write(f"**{simulator.name}** is tweeting...")
+        tweet_placeholder = st.empty()
+        simulator.simulate_twitter_post(on_content=tweet_placeholder.write)
+
 st.sidebar.title("Character Actions")
 if st.sidebar.button("Simulate Instagram Post"):
-    simulator.simulate_instagram_post()
-    st.rerun() #Add this
+    run_action(stream_instagram_post)
 
 if st.sidebar.button("Simulate Twitter Post"):
-    simulator.simulate_twitter_post()
-    st.rerun()
+    run_action(stream_twitter_post)
+
+def whatsapp_chat():
+    """Publishes a pre-generated WhatsApp exchange, or generates one."""
+    draft = take_draft(ACTION_WHATSAPP)
+    if draft:
+        simulator.commit_whatsapp_chat(draft)
+    else:
+        simulator.simulate_whatsapp_chat()
 
 if st.sidebar.button("Simulate WhatsApp Chat"):
-    simulator.simulate_whatsapp_chat()
-    st.rerun()
+    run_action(whatsapp_chat)
 
 if st.sidebar.button("Simulate Daily Routine Event"):
-    simulator.simulate_daily_routine()
-    st.rerun()
+    run_action(simulator.simulate_daily_routine)
 
 if st.sidebar.button("Simulate Supporting Character Post"):
-    simulator.simulate_supporting_character_post()
-    st.rerun()
+    run_action(simulator.simulate_supporting_character_post)
 
 st.sidebar.title("Admin Mode")
 if st.sidebar.checkbox("Enable Edit DNA"):
@@ -48,8 +113,7 @@ if st.sidebar.checkbox("Enable Edit DNA"):
         if st.sidebar.button("Save DNA Changes"):
             try:
                 updated_dna = json.loads(updated_dna_json)
-                save_character_dna(DNA_FILE, updated_dna)
-                simulator.dna = updated_dna
+                simulator.replace_dna(updated_dna)
                 st.success("DNA updated successfully. Please refresh the app.")
             except json.JSONDecodeError as e:
                 st.error(f"Invalid JSON format: {e}")
@@ -64,7 +128,7 @@ if st.sidebar.checkbox("Enable Edit DNA"):
                                   "energy_level": 5, "social_battery": 5, "stress_level": 5}
                 filepath = os.path.join(SUPPORTING_CHARS_DIR, f"{new_char_name.lower().replace(' ', '_')}.json")
                 save_character_dna(filepath, default_char)
-                simulator.supporting_characters = load_supporting_characters(SUPPORTING_CHARS_DIR)
+                simulator._refresh_available_characters(force=True)
                 st.success(f"Supporting character '{new_char_name}' created.")
                 st.rerun()
 
@@ -77,7 +141,8 @@ if platform == "Instagram":
     # Add the live updates checkbox in the sidebar
     auto_update = st.sidebar.checkbox("Enable Live Updates", value=True)
 
-    for post in reversed(simulator.instagram_history):
+    posts = simulator.instagram_feed.page(0, st.session_state.get('instagram_feed_size', HISTORY_PAGE_SIZE))
+    for post in posts:
         with st.container():
             # Create a clean card-like container
             st.markdown("""
@@ -107,7 +172,7 @@ if platform == "Instagram":
                 with col1:
                     st.image("https://placekitten.com/50/50", width=50)
                 with col2:
-                    timestamp_obj = datetime.fromisoformat(post['timestamp'])
+                    timestamp_obj = parse_timestamp(post['timestamp'])
                     st.write(f"**{post.get('author', simulator.name)}**")
                     st.write(f"*{format_datetime(timestamp_obj)}*")
 
@@ -133,78 +198,86 @@ if platform == "Instagram":
                 with col1:
                     st.write(f"❤️ {post['likes']} Likes")
                 with col2:
-                    if st.button("Like 👍", key=f"like_{post['timestamp']}"):
-                        post['likes'] += 1
-                        simulator._save_instagram_history()
+                    # Archived posts are read-only
+                    if st.button("Like 👍", key=f"like_{post['timestamp']}", disabled=post.get('archived', False)):
+                        simulator.like_post(post)
                         st.experimental_rerun()
 
                 # Comments section
                 st.write("**Comments**")
-                if 'comments' in post:
-                    for comment in post.get('comments', []):
-                        st.markdown(f"""
-                        <div class='comment-container'>
-                            <strong>{comment['author']}</strong>: {comment['text']}
-                        </div>
-                        """, unsafe_allow_html=True)
+                # Replies are shown under the comment they answer, indented by depth
+                thread = simulator.comment_index.thread(post)
+                for comment, depth in thread:
+                    st.markdown(f"""
+                    <div class='comment-container' style='margin-left: {20 + 24 * depth}px'>
+                        <strong>{comment['author']}</strong>: {comment['text']}
+                    </div>
+                    """, unsafe_allow_html=True)
 
                 # Add comment form
                 with st.form(key=f"comment_form_{post['timestamp']}"):
                     new_comment = st.text_input("Add a comment...", key=f"comment_input_{post['timestamp']}")
-                    if st.form_submit_button("Post Comment"):
+                    reply_options = [None] + [comment for comment, _ in thread if comment.get('id')]
+                    reply_to = st.selectbox("Reply to", reply_options, key=f"reply_to_{post['timestamp']}",
+                                            format_func=lambda c: "Nobody (new comment)" if c is None else f"{c['author']}: {c['text'][:40]}")
+                    if st.form_submit_button("Post Comment", disabled=post.get('archived', False)):
                         if new_comment:
-                            if 'comments' not in post:
-                                post['comments'] = []
-
                             # Create new comment
                             comment = {
                                 'author': simulator.name,
                                 'text': new_comment,
-                                'timestamp': datetime.now().isoformat(),
+                                'timestamp': simulator.clock.now().isoformat(),
                                 'id': str(uuid.uuid4())
                             }
 
-                            # If this is a reply to another comment
-                            last_comment = post['comments'][-1] if post['comments'] else None
-                            if last_comment:
-                                comment['parent_id'] = last_comment.get('id')
-
-                            post['comments'].append(comment)
-                            simulator._save_instagram_history()
+                            if reply_to is None:
+                                simulator.add_comment(post, comment)
+                            else:
+                                simulator.reply_to_comment(reply_to['id'], comment)
                             st.experimental_rerun()
 
                 st.markdown("---")
 
+    show_more_button('instagram_feed_size', len(posts))
+
     # Auto-update functionality
     if auto_update:
-        simulator.update_post_interactions()
+        try:
+            simulator.update_post_interactions()
+        except GenerationError as e:
+            st.sidebar.error(f"Content generation failed: {e}")
         time.sleep(5)
         st.rerun()
 
 elif platform == "Twitter":
     st.subheader("Twitter")
-    for tweet in reversed(simulator.twitter_history):
-        timestamp_obj = datetime.fromisoformat(tweet['timestamp'])
-        st.write(f"**{simulator.name}** - {format_datetime(timestamp_obj)}")
+    tweets = simulator.twitter_store.page(0, st.session_state.get('twitter_feed_size', HISTORY_PAGE_SIZE))
+    for tweet in tweets:
+        timestamp_obj = parse_timestamp(tweet['timestamp'])
+        st.write(f"**{tweet.get('author', simulator.name)}** - {format_datetime(timestamp_obj)}")
         st.write(tweet['content'])
         st.markdown("---")
+    show_more_button('twitter_feed_size', len(tweets))
 
 elif platform == "WhatsApp":
     st.subheader("WhatsApp")
-    for message in simulator.whatsapp_history:
+    messages = simulator.whatsapp_feed.page(0, st.session_state.get('whatsapp_feed_size', HISTORY_PAGE_SIZE))
+    show_more_button('whatsapp_feed_size', len(messages))
+    for message in reversed(messages):
         sender = message['sender']
         text = message['message']
-        timestamp_obj = datetime.fromisoformat(message['timestamp'])
+        timestamp_obj = parse_timestamp(message['timestamp'])
         st.write(f"**{sender}**: {text}  *({format_datetime(timestamp_obj)} )*")
 
 elif platform == "Daily Events":
     st.subheader("Daily Events")
-    events_data = load_json(RANDOM_EVENTS_FILE)
+    # The simulator's copy is current even while writes to the events file are pending
+    events_data = simulator.random_events
     if isinstance(events_data, dict) and "log" in events_data:
         for event in reversed(events_data["log"]):
             timestamp_str = event.get('timestamp')
             if timestamp_str:
-                timestamp_obj = datetime.fromisoformat(timestamp_str)
+                timestamp_obj = parse_timestamp(timestamp_str)
                 st.write(f"{format_datetime(timestamp_obj)} - {event.get('name', event.get('event','No Name'))}")
             else:
                 st.write(f"No Timestamp - {event.get('name', event.get('event','No Name'))}")
@@ -214,17 +287,11 @@ elif platform == "Daily Events":
                 st.write(f"Involved Characters: {', '.join(event['involved_characters'])}")
             st.markdown("---")
 
-def daily_scheduled_tasks():
-    simulator.run_daily_updates()
-
-schedule.every().day.at("08:00").do(daily_scheduled_tasks)
-
-def run_scheduler():
-    while True:
-        schedule.run_pending()
-        time.sleep(60)
-
-scheduler_thread = threading.Thread(target=run_scheduler, daemon=True)
-scheduler_thread.start()
+if 'scheduler' not in st.session_state:
+    # Daily updates at SIMULATION_DAILY_UPDATE_TIME, on the simulator's clock
+    scheduler = EventScheduler(simulator.clock)
+    scheduler.schedule_daily(SIMULATION_DAILY_UPDATE_TIME, simulator.run_daily_updates)
+    threading.Thread(target=scheduler.run_forever, daemon=True).start()
+    st.session_state['scheduler'] = scheduler
 
 st.sidebar.text("Daily updates scheduled...")
\ No newline at end of file
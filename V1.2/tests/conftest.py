@@ -0,0 +1,59 @@
+# conftest.py
+import json
+import os
+import shutil
+import subprocess
+import sys
+import textwrap
+import pytest
+
+PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Modules with no config or data dependencies (the graph, engine, clocks, queues) are tested in-process
+sys.path.insert(0, PACKAGE_DIR)
+RESULT_PREFIX = "RESULT "
+
+
+class Simulation:
+    """A scratch copy of data/ that simulator code runs against, one process per `run()`.
+
+    config.py reads the environment and resolves DATA_DIR when it is imported, and
+    the writer, caches and world logs are per process, so every run starts fresh
+    and a second run is a restart. Runs use the offline stub backend.
+    """
+
+    def __init__(self, root):
+        self.root = str(root)
+        self.data_dir = os.path.join(self.root, "data")
+
+    def path(self, *parts):
+        return os.path.join(self.data_dir, *parts)
+
+    def run(self, code, **env):
+        """Runs `code` with `env` overrides; returns what it passed to `result()`, if anything."""
+        prelude = f"import json\ndef result(value):\n    print({RESULT_PREFIX!r} + json.dumps(value, default=str), flush=True)\n"
+        environment = dict(os.environ, PYTHONPATH=PACKAGE_DIR, LLM_BACKEND="stub", PREGENERATION_ENABLED="0")
+        environment.update({key: str(value) for key, value in env.items()})
+        completed = subprocess.run([sys.executable, "-c", prelude + textwrap.dedent(code)], cwd=self.root,
+                                   env=environment, capture_output=True, text=True, timeout=120)
+        assert completed.returncode == 0, completed.stdout[-2000:] + completed.stderr[-4000:]
+        for line in completed.stdout.splitlines():
+            if line.startswith(RESULT_PREFIX):
+                return json.loads(line[len(RESULT_PREFIX):])
+        return None
+
+
+@pytest.fixture
+def simulation(tmp_path):
+    """A Simulation over a copy of the shipped sample data."""
+    shutil.copytree(os.path.join(PACKAGE_DIR, "data"), tmp_path / "data",
+                    ignore=shutil.ignore_patterns("llm_cache.sqlite3*", "simulation.sqlite3*", "world.*", "agents", "archive"))
+    return Simulation(tmp_path)
+
+
+@pytest.fixture
+def empty_simulation(tmp_path):
+    """A Simulation with only the supporting characters: no DNA, histories or events files."""
+    shutil.copytree(os.path.join(PACKAGE_DIR, "data", "supporting_characters"), tmp_path / "data" / "supporting_characters")
+    for name in ("relationships.json", "relationship_graph.json"):
+        shutil.copy(os.path.join(PACKAGE_DIR, "data", name), tmp_path / "data" / name)
+    return Simulation(tmp_path)
@@ -0,0 +1,34 @@
+# test_circuit_breaker.py
+import time
+import pytest
+from circuit_breaker import CircuitBreaker, CircuitOpenError
+
+
+def test_a_lost_half_open_trial_expires():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+    breaker.before_call()  # the trial, which never reports back
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    time.sleep(0.06)
+    breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_closing_a_half_open_stream_early_reports_the_trial(simulation):
+    states = simulation.run("""
+        import time
+        from gemini_integration import circuit_breaker, generate_gemini_content, stream_gemini_content
+        circuit_breaker.record_failure()
+        opened = circuit_breaker.state
+        time.sleep(0.15)
+        stream = stream_gemini_content("Say hi", use_cache=False)
+        next(stream)
+        stream.close()
+        closed = circuit_breaker.state
+        generate_gemini_content("Say hello", use_cache=False)
+        result([opened, closed])
+    """, CIRCUIT_FAILURE_THRESHOLD=1, CIRCUIT_RESET_TIMEOUT=0.1)
+    assert states == ["open", "closed"]
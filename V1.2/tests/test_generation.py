@@ -0,0 +1,51 @@
+# test_generation.py
+
+POSTS = """
+    from character import CharacterSimulator
+    from gemini_integration import response_cache
+    simulator = CharacterSimulator()
+    simulator._generate_social_media_post("Instagram")
+    simulator._generate_social_media_post("Instagram", on_content=lambda text: None)
+    simulator._generate_social_media_post("Twitter")
+    result([response_cache.hits, response_cache.disk_hits, response_cache.misses])
+"""
+
+
+def test_descriptions_for_an_unchanged_state_come_from_the_cache(simulation):
+    # Only the description prompt is cached; captions and tweets are always generated
+    assert simulation.run(POSTS) == [1, 0, 1]
+    # After a restart both descriptions are served from the SQLite file
+    assert simulation.run(POSTS) == [2, 1, 0]
+
+
+def test_a_changed_state_misses_the_cache(simulation):
+    counts = simulation.run("""
+        from character import CharacterSimulator
+        from gemini_integration import response_cache
+        simulator = CharacterSimulator()
+        simulator._generate_social_media_post("Instagram")
+        simulator.replace_dna(dict(simulator.dna, current_mood="Ecstatic"))
+        simulator._generate_social_media_post("Instagram")
+        result([response_cache.hits, response_cache.misses])
+    """)
+    assert counts == [0, 2]
+
+
+def test_committing_a_draft_keeps_the_comment_timing(simulation):
+    offsets = simulation.run("""
+        from datetime import timedelta
+        from character import CharacterSimulator
+        from simulation_clock import VirtualClock
+        from utils import parse_timestamp
+        simulator = CharacterSimulator(clock=VirtualClock())
+        draft = simulator.draft_instagram_post()
+        drafted_at = parse_timestamp(draft["timestamp"])
+        draft["comments"] = [{"author": "Reader", "text": str(minutes), "id": str(minutes),
+                              "timestamp": (drafted_at + timedelta(minutes=minutes)).isoformat()} for minutes in (0, 3, 10)]
+        simulator.clock.advance(timedelta(hours=2))
+        post = simulator.commit_instagram_post(draft)
+        posted_at = parse_timestamp(post["timestamp"])
+        result([posted_at == simulator.clock.now()] +
+               [(parse_timestamp(comment["timestamp"]) - posted_at).total_seconds() / 60 for comment in post["comments"]])
+    """)
+    assert offsets == [True, 0, 3, 10]
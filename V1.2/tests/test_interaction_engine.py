@@ -0,0 +1,46 @@
+# test_interaction_engine.py
+import pytest
+import interaction_engine
+import relationship_graph
+from interaction_engine import InteractionEngine
+from relationship_graph import RelationshipGraph
+
+
+@pytest.fixture(params=["numpy", "lists"])
+def engine(request, monkeypatch):
+    if request.param == "numpy":
+        pytest.importorskip("numpy")
+    else:
+        monkeypatch.setattr(interaction_engine, "np", None)
+        monkeypatch.setattr(relationship_graph, "np", None, raising=False)
+    graph = RelationshipGraph(merge_threshold=4)
+    graph.add_relationships("Main", {"Ann": {"interaction_frequency": 0.9}, "Bob": {"interaction_frequency": 0.2}}, symmetric=True)
+    graph.set_edge("Ann", "Bob", 70)
+    engine = InteractionEngine(graph, capacity=2, seed=1)
+    engine.sync({"Ann": {"social_battery": 8, "current_mood": "Happy"}, "Bob": {"social_battery": 3, "current_mood": "Angry"}})
+    return engine
+
+
+def test_probabilities_match_the_per_pair_formula(engine):
+    names = ["Main", "Ann", "Bob"]
+    matrix = engine.probabilities(names, names)
+    for i, actor in enumerate(names):
+        for j, target in enumerate(names):
+            assert matrix[i][j] == pytest.approx(engine.probability(actor, target))
+    assert engine.probability("Ann", "Main") == pytest.approx(90 / 100 * 0.8 * 1.2)
+    assert engine.probability("Bob", "Ann") == pytest.approx(50 / 100 * 0.3 * 0.2)
+    assert len(engine.probabilities()) == len(engine.graph.names)
+
+
+def test_sample_follows_the_probabilities(engine):
+    pairs = [("Ann", "Main"), ("Bob", "Ann")] * 5000
+    outcomes = engine.sample(pairs)
+    assert len(outcomes) == len(pairs)
+    assert sum(outcomes[0::2]) / 5000 == pytest.approx(0.864, abs=0.03)
+    assert sum(outcomes[1::2]) / 5000 == pytest.approx(0.03, abs=0.01)
+    assert engine.sample([]) == []
+
+
+def test_new_characters_get_default_state(engine):
+    assert engine.probability("Zed", "Main") == pytest.approx(50 / 100 * 0.5 * 0.8)
+    assert engine.sample([("Zed", "Main")]) in ([True], [False])
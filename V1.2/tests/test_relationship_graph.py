@@ -0,0 +1,56 @@
+# test_relationship_graph.py
+import random
+import pytest
+import relationship_graph
+from relationship_graph import DEFAULT_RELATIONSHIP_STRENGTH, RelationshipGraph
+
+
+@pytest.fixture(params=["numpy", "lists"])
+def backend(request, monkeypatch):
+    if request.param == "numpy":
+        pytest.importorskip("numpy")
+    else:
+        monkeypatch.setattr(relationship_graph, "np", None)
+    return request.param
+
+
+@pytest.mark.parametrize("merge_threshold", [1, 7, 10 ** 6])
+def test_graph_matches_a_dict_of_edges(backend, merge_threshold):
+    rng = random.Random(merge_threshold)
+    graph = RelationshipGraph(merge_threshold=merge_threshold)
+    names = [f"c{i}" for i in range(40)]
+    reference = {}
+    for step in range(600):
+        source, target = rng.choice(names), rng.choice(names)
+        if rng.random() < 0.2:
+            graph.remove_edge(source, target)
+            reference.pop((source, target), None)
+        else:
+            strength = rng.uniform(0, 100)
+            graph.set_edge(source, target, strength)
+            reference[(source, target)] = strength
+        if step % 150 == 0:
+            graph.merge()
+
+    pairs = [(rng.choice(names), rng.choice(names)) for _ in range(2000)] + list(reference)
+    known = [(source, target) for source, target in pairs if source in graph.ids and target in graph.ids]
+    sources = [graph.ids[source] for source, _ in known]
+    targets = [graph.ids[target] for _, target in known]
+    expected = [reference.get(pair, DEFAULT_RELATIONSHIP_STRENGTH) for pair in known]
+    assert list(graph.strengths(sources, targets)) == pytest.approx(expected)
+    assert [graph.strength(source, target) for source, target in known] == pytest.approx(expected)
+    for name in names:
+        assert graph.neighbours(name) == pytest.approx({target: strength for (source, target), strength in reference.items() if source == name})
+    assert graph.edge_count() == len(reference)
+    # After the merge the arrays alone must give the same answers
+    assert list(graph.strengths(sources, targets)) == pytest.approx(expected)
+
+
+def test_characters_added_after_a_merge(backend):
+    graph = RelationshipGraph()
+    graph.set_edge("a", "b", 10)
+    graph.merge()
+    graph.set_edge("c", "a", 30)
+    ids = graph.ids
+    assert list(graph.strengths([ids["c"], ids["a"], ids["b"]], [ids["a"], ids["b"], ids["c"]])) == [30, 10, DEFAULT_RELATIONSHIP_STRENGTH]
+    assert list(graph.strengths([], [])) == []
@@ -0,0 +1,80 @@
+# test_scheduler.py
+from datetime import datetime, timedelta
+import pytest
+from post_queue import DuePostQueue
+
+START = datetime(2025, 1, 1, 12, 0)
+
+
+def _post(name, age_hours):
+    return {"name": name, "timestamp": (START - timedelta(hours=age_hours)).isoformat(), "comments": []}
+
+
+def test_due_posts_come_out_earliest_first():
+    queue = DuePostQueue(base_interval=10, age_scale=3600)
+    for name, age in (("old", 5), ("new", 0), ("older", 23)):
+        queue.schedule(_post(name, age), START, last_pass=START)
+    # Intervals grow with age: 10s, 60s and 240s after the last pass
+    assert queue.pop_due(START + timedelta(seconds=9)) == []
+    assert [post["name"] for post in queue.pop_due(START + timedelta(seconds=60))] == ["new", "old"]
+    assert [post["name"] for post in queue.pop_due(START + timedelta(days=1))] == ["older"]
+    assert len(queue) == 0
+
+
+def test_intervals_are_capped():
+    queue = DuePostQueue(base_interval=5, age_scale=60, max_interval=30)
+    assert queue.interval_for(0) == 5
+    assert queue.interval_for(-100) == 5
+    assert queue.interval_for(10 ** 6) == 30
+
+
+def test_scheduler_runs_events_in_time_order(simulation):
+    ran = simulation.run("""
+        from datetime import datetime, timedelta
+        from simulation_clock import EventScheduler, VirtualClock
+        clock = VirtualClock(datetime(2025, 1, 1, 8, 0))
+        scheduler = EventScheduler(clock)
+        ran = []
+        record = lambda name: lambda: ran.append([name, clock.now().isoformat()])
+        scheduler.schedule_daily("09:30", record("daily"))
+        scheduler.schedule_every(timedelta(hours=10), record("every"))
+        scheduler.schedule_at(clock.now() + timedelta(hours=1), record("once"))
+        scheduler.schedule_at(clock.now() + timedelta(hours=2), record("cancelled")).cancel()
+        executed = scheduler.run_for(timedelta(days=1))
+        result({"ran": ran, "executed": executed, "now": clock.now().isoformat()})
+    """)
+    assert ran["ran"] == [
+        ["once", "2025-01-01T09:00:00"],
+        ["daily", "2025-01-01T09:30:00"],
+        ["every", "2025-01-01T18:00:00"],
+        ["every", "2025-01-02T04:00:00"],
+    ]
+    assert ran["executed"] == 4
+    assert ran["now"] == "2025-01-02T08:00:00"
+
+
+@pytest.mark.parametrize("mode", ["json", "jsonl", "paged", "sqlite", "wal"])
+def test_fast_forward_survives_restart(simulation, mode):
+    forwarded = simulation.run("""
+        from character import CharacterSimulator
+        from simulation_clock import VirtualClock, fast_forward
+        simulator = CharacterSimulator(clock=VirtualClock())
+        simulator.simulate_supporting_character_post()
+        executed = fast_forward(simulator, 2)
+        simulator.instagram_store.flush()
+        simulator.twitter_store.flush()
+        result({"executed": executed,
+                "sizes": [simulator.instagram_store.size(), simulator.twitter_store.size()],
+                "comments": sum(len(post["comments"]) for post in simulator.instagram_store.page(0, 1000))})
+    """, HISTORY_STORAGE=mode, SIMULATION_INTERACTION_INTERVAL=600)
+    reloaded = simulation.run("""
+        from character import CharacterSimulator
+        simulator = CharacterSimulator()
+        result({"sizes": [simulator.instagram_store.size(), simulator.twitter_store.size()],
+                "comments": sum(len(post["comments"]) for post in simulator.instagram_store.page(0, 1000))})
+    """, HISTORY_STORAGE=mode)
+    # Two daily updates plus one interaction pass every ten minutes
+    assert forwarded.pop("executed") == 2 + 2 * 24 * 6
+    assert forwarded["sizes"][0] > 3
+    assert forwarded["comments"] > 0
+    assert reloaded == forwarded
@@ -0,0 +1,270 @@
+# test_storage.py
+import json
+import os
+import pytest
+
+STORAGE_MODES = ["json", "jsonl", "paged", "sqlite", "wal"]
+
+
+@pytest.mark.parametrize("mode", STORAGE_MODES)
+def test_event_log_survives_restart(simulation, mode):
+    logged = simulation.run("""
+        from character import CharacterSimulator
+        simulator = CharacterSimulator()
+        for _ in range(3):
+            simulator.simulate_daily_routine()
+        result(len(simulator.random_events["log"]))
+    """, HISTORY_STORAGE=mode)
+    reloaded = simulation.run("""
+        from character import CharacterSimulator
+        result(len(CharacterSimulator().random_events["log"]))
+    """, HISTORY_STORAGE=mode)
+    assert logged == 4
+    assert reloaded == logged
+
+
+@pytest.mark.parametrize("mode", STORAGE_MODES)
+def test_histories_survive_restart(simulation, mode):
+    sizes = """
+        result([simulator.instagram_store.size(), simulator.twitter_store.size(), simulator.whatsapp_store.size(),
+                simulator.instagram_store.page(0, 1)[0]["likes"]])
+    """
+    written = simulation.run("""
+        from character import CharacterSimulator
+        simulator = CharacterSimulator()
+        for _ in range(2):
+            simulator.simulate_supporting_character_post()
+            simulator.simulate_twitter_post()
+            simulator.simulate_whatsapp_chat()
+        simulator.like_post(simulator.instagram_history[-1], 3)
+    """ + sizes, HISTORY_STORAGE=mode)
+    reloaded = simulation.run("""
+        from character import CharacterSimulator
+        simulator = CharacterSimulator()
+    """ + sizes, HISTORY_STORAGE=mode)
+    assert written[:2] == [5, 3] and written[2] >= 2 and written[3] >= 3
+    assert reloaded == written
+
+
+def test_sqlite_loads_a_window_and_pages_the_rest(simulation):
+    simulation.run("""
+        from character import CharacterSimulator
+        simulator = CharacterSimulator()
+        for _ in range(6):
+            simulator.simulate_twitter_post()
+            simulator.simulate_supporting_character_post()
+    """, HISTORY_STORAGE="sqlite")
+    loaded = simulation.run("""
+        from character import CharacterSimulator
+        simulator = CharacterSimulator()
+        posts = simulator.instagram_feed.page(0, 100)
+        tweets = simulator.twitter_store.page(0, 100)
+        # Older than the window: only reachable through the table
+        simulator.like_post(posts[-1], 5)
+        simulator.instagram_store.add_comments(posts[-1], [{"author": "Reader", "text": "Late to this", "timestamp": posts[-1]["timestamp"], "id": "late"}])
+        simulator.twitter_store.like(tweets[-1], 2)
+        simulator.instagram_store.flush()
+        result({"in_memory": [len(simulator.instagram_history), len(simulator.twitter_history)],
+                "sizes": [simulator.instagram_store.size(), simulator.twitter_store.size()],
+                "pages": [len(posts), len(tweets)],
+                "likes": posts[-1]["likes"],
+                "newest_first": [post["timestamp"] for post in posts] == sorted((post["timestamp"] for post in posts), reverse=True)})
+    """, HISTORY_STORAGE="sqlite", HISTORY_MEMORY_WINDOW=4)
+    likes = loaded.pop("likes")
+    assert loaded == {"in_memory": [4, 4], "sizes": [9, 7], "pages": [9, 7], "newest_first": True}
+    oldest = simulation.run("""
+        from character import CharacterSimulator
+        simulator = CharacterSimulator()
+        post = simulator.instagram_store.page(0, 100)[-1]
+        tweet = simulator.twitter_store.page(0, 100)[-1]
+        result([post["likes"], post["comments"][-1]["id"], tweet.get("likes")])
+    """, HISTORY_STORAGE="sqlite", HISTORY_MEMORY_WINDOW=4)
+    assert oldest == [likes, "late", 2]
+
+
+def test_new_tweets_match_the_migrated_schema(simulation):
+    authors = simulation.run("""
+        from character import CharacterSimulator
+        from record_schemas import Tweet, validate
+        simulator = CharacterSimulator()
+        simulator.simulate_twitter_post()
+        for tweet in simulator.twitter_history:
+            validate(Tweet, tweet)
+        result(sorted({tweet["author"] for tweet in simulator.twitter_history}) == [simulator.name])
+    """)
+    assert authors is True
+
+
+def test_sample_history_is_not_archived_by_default(simulation):
+    counts = simulation.run("""
+        from character import CharacterSimulator
+        simulator = CharacterSimulator()
+        result([len(simulator.instagram_history), simulator.instagram_archive is None])
+    """)
+    assert counts == [3, True]
+    assert not os.path.exists(simulation.path("archive"))
+
+
+@pytest.mark.parametrize("mode", ["paged", "sqlite"])
+def test_interaction_passes_skip_posts_evicted_from_memory(simulation, mode):
+    in_memory = simulation.run("""
+        from datetime import timedelta
+        from character import CharacterSimulator
+        from simulation_clock import VirtualClock
+        simulator = CharacterSimulator(clock=VirtualClock())
+        for _ in range(5):
+            simulator.simulate_supporting_character_post()
+            simulator.clock.advance(timedelta(minutes=1))
+        for _ in range(200):
+            simulator.clock.advance(timedelta(minutes=5))
+            simulator.update_post_interactions()
+            simulator.instagram_store.flush()  # as the write-behind writer would, between passes
+        # Every post object the simulator still references, evicted or not
+        posts = {post["timestamp"]: post for _, _, post in simulator.post_queue._heap}
+        posts.update((post["timestamp"], post) for post in simulator.instagram_history)
+        result({timestamp: len(post["comments"]) for timestamp, post in posts.items()})
+    """, HISTORY_STORAGE=mode, HISTORY_MEMORY_WINDOW=2)
+    on_disk = simulation.run("""
+        from character import CharacterSimulator
+        simulator = CharacterSimulator()
+        result({post["timestamp"]: len(post["comments"]) for post in simulator.instagram_store.page(0, 100)})
+    """, HISTORY_STORAGE=mode, HISTORY_MEMORY_WINDOW=2)
+    assert sum(in_memory.values()) > 0
+    assert {timestamp: count for timestamp, count in on_disk.items() if timestamp in in_memory} == in_memory
+
+
+def test_sqlite_paging_keeps_a_bounded_map_of_paged_in_records(simulation):
+    sizes = simulation.run("""
+        from character import CharacterSimulator
+        simulator = CharacterSimulator()
+        for _ in range(6):
+            simulator.simulate_twitter_post()
+        store = simulator.twitter_store
+        for _ in range(100):
+            tweets = store.page(0, 20)
+        store.like(tweets[-1])  # paged in, so still writable
+        result([len(store._seqs), len(store._paged), store.holds(tweets[0]), store.holds(tweets[-1])])
+    """, HISTORY_STORAGE="sqlite", HISTORY_MEMORY_WINDOW=2)
+    assert sizes == [2, 2, True, False]
+
+
+def test_sqlite_author_queries_use_their_indexes(simulation):
+    found = simulation.run("""
+        from character import CharacterSimulator
+        simulator = CharacterSimulator()
+        for _ in range(3):
+            simulator.simulate_supporting_character_post()
+            simulator.simulate_whatsapp_chat()
+        store, db = simulator.instagram_store, simulator.instagram_store.db
+        author = simulator.instagram_history[-1]["author"]
+        posts = store.latest(50, author=author)
+        comments = store.comments_by_author(simulator.name)
+        partner = simulator.whatsapp_history[-1]["recipient"]
+        messages = db.messages_with(partner)
+        plans = [" ".join(str(row[-1]) for row in db.query("EXPLAIN QUERY PLAN " + sql, params)) for sql, params in (
+            ("SELECT id, data FROM posts WHERE author = ? ORDER BY seq DESC LIMIT 1", ("x",)),
+            ("SELECT post_id, data FROM comments WHERE author = ? ORDER BY timestamp", ("x",)),
+            ("SELECT seq FROM whatsapp_messages WHERE author = ? UNION ALL SELECT seq FROM whatsapp_messages WHERE recipient = ?", ("x", "x")),
+        )]
+        result({"posts": all(post["author"] == author for post in posts) and len(posts) > 0,
+                "live": posts[0] is simulator.instagram_history[-1],
+                "comments": all(comment["author"] == simulator.name and comment["post_id"] for comment in comments),
+                "expected_comments": sum(comment["author"] == simulator.name for post in store.page(0, 100) for comment in post["comments"]) == len(comments),
+                "messages": len(messages) > 0 and all(partner in (m.get("sender"), m.get("recipient")) for m in messages),
+                "plans": plans})
+    """, HISTORY_STORAGE="sqlite")
+    plans = found.pop("plans")
+    assert found == {"posts": True, "live": True, "comments": True, "expected_comments": True, "messages": True}
+    assert "idx_posts_author" in plans[0]
+    assert "idx_comments_author" in plans[1]
+    assert "idx_whatsapp_author" in plans[2] and "idx_whatsapp_recipient" in plans[2]
+
+
+@pytest.mark.parametrize("mode", STORAGE_MODES)
+def test_cold_records_are_archived_in_every_mode(simulation, mode):
+    simulation.run("""
+        from character import CharacterSimulator
+        simulator = CharacterSimulator()
+        for _ in range(2):
+            simulator.simulate_supporting_character_post()
+    """, HISTORY_STORAGE=mode)
+    archived = """
+        from character import CharacterSimulator
+        simulator = CharacterSimulator()
+        feed = simulator.instagram_feed.page(0, 100)
+        result([simulator.instagram_archive.count(), simulator.instagram_store.size(), len(feed),
+                [post.get("archived", False) for post in feed]])
+    """
+    first = simulation.run(archived, HISTORY_STORAGE=mode, HISTORY_ARCHIVE_AFTER_DAYS=30, HISTORY_MEMORY_WINDOW=1)
+    again = simulation.run(archived, HISTORY_STORAGE=mode, HISTORY_ARCHIVE_AFTER_DAYS=30, HISTORY_MEMORY_WINDOW=1)
+    assert first == [3, 2, 5, [False, False, True, True, True]]
+    assert again == first
+
+
+@pytest.mark.parametrize("mode", ["paged", "sqlite"])
+def test_paging_through_the_feed_keeps_memory_bounded(simulation, mode):
+    sizes = simulation.run("""
+        from character import CharacterSimulator
+        simulator = CharacterSimulator()
+        for _ in range(30):
+            simulator.simulate_supporting_character_post()
+        for _ in range(5):
+            for cursor in range(0, simulator.instagram_store.size(), 5):
+                for post in simulator.instagram_feed.page(cursor, 5):
+                    simulator.comment_index.thread(post)
+        store = simulator.instagram_store
+        maps = [len(store._slots), len(store._paged_slots)] if hasattr(store, "_slots") else [len(store._seqs), len(store._paged)]
+        result(maps + [len(simulator.comment_index)])
+    """, HISTORY_STORAGE=mode, HISTORY_MEMORY_WINDOW=2, HISTORY_PAGE_SIZE=5)
+    assert sizes[0] == 2 and sizes[1] <= 2
+    assert sizes[2] == 2 + 5
+
+
+def test_archiving_resumes_after_a_crash_without_duplicates(simulation):
+    # Crash after the archive committed the cold records but before the store dropped them
+    simulation.run("""
+        from history_store import JsonHistoryStore
+        JsonHistoryStore.drop_oldest = lambda store, count: (_ for _ in ()).throw(SystemExit(0))
+        from character import CharacterSimulator
+        CharacterSimulator()
+    """, HISTORY_ARCHIVE_AFTER_DAYS=30)
+    counts = simulation.run("""
+        from character import CharacterSimulator
+        simulator = CharacterSimulator()
+        result([simulator.instagram_archive.count(), simulator.instagram_store.size(), len(simulator.instagram_feed.page(0, 100))])
+    """, HISTORY_ARCHIVE_AFTER_DAYS=30)
+    assert counts == [3, 0, 3]
+
+
+def test_archive_ignores_an_uncommitted_append(simulation):
+    ids = simulation.run("""
+        from history_archive import HistoryArchive
+        archive = HistoryArchive("data/archive/test", "gzip")
+        archive.append([{"id": "a", "timestamp": "2025-01-01T10:00:00"}])
+        # An append whose manifest update never happened
+        with open("data/archive/test/" + archive.segments[0]["file"], "ab") as f:
+            f.write(b"torn")
+        reopened = HistoryArchive("data/archive/test", "gzip")
+        before = [record["id"] for record in reopened.page(0, 10)]
+        reopened.append([{"id": "b", "timestamp": "2025-01-02T10:00:00"}])
+        result([before, [record["id"] for record in HistoryArchive("data/archive/test", "gzip").page(0, 10)]])
+    """)
+    assert ids == [["a"], ["b", "a"]]
+
+
+@pytest.mark.parametrize("mode", ["json", "sqlite"])
+def test_invalid_history_records_are_rejected_on_load(simulation, mode):
+    with open(simulation.path("instagram_history.json")) as f:
+        posts = json.load(f)
+    posts.append({"author": "Nobody", "timestamp": "yesterday", "content": "Malformed", "likes": 1, "comments": []})
+    with open(simulation.path("instagram_history.json"), "w") as f:
+        json.dump(posts, f)
+    error = simulation.run("""
+        from character import CharacterSimulator
+        from record_schemas import SchemaError
+        try:
+            CharacterSimulator()
+        except SchemaError as e:
+            result(str(e))
+    """, HISTORY_STORAGE=mode)
+    assert error is not None and "1 invalid record" in error
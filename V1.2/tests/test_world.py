@@ -0,0 +1,44 @@
+# test_world.py
+import json
+import pytest
+
+STEP_AGENTS = """
+    import random
+    from character import CharacterSimulator
+    from data_handler import load_character_dna
+    from simulation_clock import VirtualClock
+    from world import World
+    random.seed(7)
+    world = World(concurrency=2, clock=VirtualClock())
+    dna = load_character_dna("data/dna_main.jsonl")
+    for agent_id in ("ada", "bo", "cy"):
+        world.add_agent(agent_id, dict(dna, **{"Basic Information": dict(dna["Basic Information"], Name=agent_id)}))
+    failures = [world.step(CharacterSimulator.simulate_daily_routine) for _ in range(20)]
+    failures.append(world.step())
+    world.close()
+    result({"failures": [str(error) for step in failures for error in step.values()],
+            "logs": {agent_id: len(agent.random_events["log"]) for agent_id, agent in world.agents.items()},
+            "named": sum(1 for agent in world.agents.values() for entry in agent.random_events["log"] if "name" in entry)})
+"""
+
+
+@pytest.mark.parametrize("mode", ["json", "sqlite", "wal"])
+def test_fresh_agents_step_without_event_definitions(simulation, mode):
+    stepped = simulation.run(STEP_AGENTS, HISTORY_STORAGE=mode)
+    assert stepped["failures"] == []
+    assert all(count >= 21 for count in stepped["logs"].values())
+    reloaded = simulation.run("""
+        from world import World
+        world = World()
+        world.load_agents()
+        result({agent_id: len(agent.random_events["log"]) for agent_id, agent in world.agents.items()})
+    """, HISTORY_STORAGE=mode)
+    assert reloaded == stepped["logs"]
+
+
+def test_fresh_agents_use_shared_event_definitions(simulation):
+    with open(simulation.path("random_events.json"), "w") as f:
+        json.dump({"events": [{"name": "baking bread", "probability": 1}], "log": []}, f)
+    stepped = simulation.run(STEP_AGENTS)
+    assert stepped["failures"] == []
+    assert stepped["named"] > 0
@@ -0,0 +1,70 @@
+# test_world_log.py
+import os
+import pytest
+
+ROUTINE = """
+    from character import CharacterSimulator
+    simulator = CharacterSimulator()
+    for _ in range(2):
+        simulator.update_character_state()
+        simulator.simulate_daily_routine()
+    simulator.simulate_twitter_post()
+    result([len(simulator.random_events["log"]), len(simulator.twitter_history), simulator.dna.get("current_mood")])
+"""
+
+RELOAD = """
+    from character import CharacterSimulator
+    simulator = CharacterSimulator()
+    result([len(simulator.random_events["log"]), len(simulator.twitter_history), simulator.dna.get("current_mood")])
+"""
+
+
+@pytest.mark.parametrize("data", ["simulation", "empty_simulation"])
+def test_wal_restart_recovers_the_world(request, data):
+    simulation = request.getfixturevalue(data)
+    before = simulation.run(ROUTINE, HISTORY_STORAGE="wal")
+    # A second run replays the log on top of the first run's state
+    again = simulation.run(ROUTINE, HISTORY_STORAGE="wal")
+    after = simulation.run(RELOAD, HISTORY_STORAGE="wal")
+    assert again[:2] == [before[0] + 2, before[1] + 1]
+    assert after == again
+
+
+def test_wal_restart_after_a_snapshot(simulation):
+    before = simulation.run(ROUTINE, HISTORY_STORAGE="wal", WORLD_SNAPSHOT_EVERY=3)
+    after = simulation.run(RELOAD, HISTORY_STORAGE="wal", WORLD_SNAPSHOT_EVERY=3)
+    assert after == before
+
+
+def test_wal_restart_cuts_off_a_torn_entry(simulation):
+    before = simulation.run(ROUTINE, HISTORY_STORAGE="wal")
+    with open(simulation.path("world.wal.jsonl"), "a") as f:
+        f.write('{"seq": 999, "dataset": "random_ev')
+    after = simulation.run(RELOAD, HISTORY_STORAGE="wal")
+    assert after == before
+
+
+@pytest.mark.parametrize("mode", ["json", "wal"])
+def test_dna_edits_survive_restart(simulation, mode):
+    simulation.run("""
+        from character import CharacterSimulator
+        simulator = CharacterSimulator()
+        simulator.update_character_state()
+        simulator.replace_dna(dict(simulator.dna, current_mood="Edited"))
+    """, HISTORY_STORAGE=mode)
+    reloaded = simulation.run("""
+        from character import CharacterSimulator
+        from data_handler import load_character_dna
+        simulator = CharacterSimulator()
+        result([simulator.dna.get("current_mood"), load_character_dna(simulator.dna_file).get("current_mood")])
+    """, HISTORY_STORAGE=mode)
+    assert reloaded == ["Edited", "Edited"]
+
+
+def test_wal_migration_keeps_the_logged_events(simulation):
+    before = simulation.run(ROUTINE, HISTORY_STORAGE="wal")
+    # Rerun the migrations on the next start; their flushes take snapshots
+    os.remove(simulation.path("schema_versions.json"))
+    simulation.run(RELOAD, HISTORY_STORAGE="wal", WORLD_SNAPSHOT_EVERY=1)
+    after = simulation.run(RELOAD, HISTORY_STORAGE="wal")
+    assert after == before
@@ -1,6 +1,12 @@
 # utils.py
 from datetime import datetime
+from functools import lru_cache
 
 def format_datetime(dt: datetime) -> str:
     """Formats a datetime object into a readable string."""
-    return dt.strftime("%dth %b %Y %I:%M%p").replace("AM", "am").replace("PM","pm")
\ No newline at end of file
+    return dt.strftime("%dth %b %Y %I:%M%p").replace("AM", "am").replace("PM","pm")
+
+@lru_cache(maxsize=4096)
+def parse_timestamp(value: str) -> datetime:
+    """Parses an ISO 8601 timestamp; repeated timestamps are served from a cache."""
+    return datetime.fromisoformat(value)
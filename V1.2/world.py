@@ -0,0 +1,84 @@
+# world.py
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+from character import CharacterSimulator
+from character_registry import CharacterRegistry
+from interaction_engine import InteractionEngine
+from relationship_graph import RelationshipGraph
+from data_handler import load_json, save_character_dna, save_json
+from config import AGENTS_DIR, DNA_FILE, RANDOM_EVENTS_FILE, SUPPORTING_CHARS_DIR, RELATIONSHIP_FILE, RELATIONSHIP_GRAPH_FILE, MAX_CONCURRENT_GENERATIONS, CHARACTER_REFRESH_INTERVAL
+
+
+class World:
+    """Many main characters ("agents") simulated in one process.
+
+    Each agent is a CharacterSimulator with its own DNA, histories and events
+    under `agents_dir/<agent id>`. They share one character registry (supporting
+    characters and relationships), one relationship graph and interaction engine,
+    one pool for comment thread generation and the module-level LLM client with
+    its rate limiter and cache. `step()` runs the agents on `concurrency` workers,
+    so how much work is in flight is set by the LLM concurrency limit rather than
+    by the number of agents. All agents read time from `clock` (real time by
+    default).
+    """
+
+    def __init__(self, agents_dir: str = AGENTS_DIR, concurrency: int = MAX_CONCURRENT_GENERATIONS, clock=None):
+        self.agents_dir = agents_dir
+        self.clock = clock
+        self.character_registry = CharacterRegistry(SUPPORTING_CHARS_DIR, RELATIONSHIP_FILE, CHARACTER_REFRESH_INTERVAL, RELATIONSHIP_GRAPH_FILE)
+        self.relationship_graph = RelationshipGraph()
+        self.interaction_engine = InteractionEngine(self.relationship_graph)
+        # Separate pools: agent steps wait on comment threads, so they must not share workers
+        self.generation_pool = ThreadPoolExecutor(max_workers=concurrency)
+        self._step_pool = ThreadPoolExecutor(max_workers=concurrency)
+        self.agents: Dict[str, CharacterSimulator] = {}
+        self.steps = 0
+        os.makedirs(agents_dir, exist_ok=True)
+
+    def add_agent(self, agent_id: str, dna: Optional[Dict[str, Any]] = None) -> CharacterSimulator:
+        """Loads an agent, creating its directory from `dna` (and the shared event definitions) if it is new."""
+        data_dir = os.path.join(self.agents_dir, agent_id)
+        os.makedirs(data_dir, exist_ok=True)
+        dna_file = os.path.join(data_dir, os.path.basename(DNA_FILE))
+        if dna is not None and not os.path.exists(dna_file):
+            save_character_dna(dna_file, dna)
+        events_file = os.path.join(data_dir, os.path.basename(RANDOM_EVENTS_FILE))
+        if not os.path.exists(events_file):
+            shared_events = load_json(RANDOM_EVENTS_FILE)
+            events = shared_events.get("events") if isinstance(shared_events, dict) else None
+            # No definitions means the agent's routine falls back to time-of-day events
+            save_json(events_file, {"events": events, "log": []} if events else {"log": []})
+        agent = CharacterSimulator(data_dir, self.character_registry, self.generation_pool, self.clock, self.interaction_engine)
+        self.agents[agent_id] = agent
+        return agent
+
+    def load_agents(self) -> int:
+        """Loads every agent found in `agents_dir`; returns how many there are."""
+        for agent_id in sorted(os.listdir(self.agents_dir)):
+            if agent_id not in self.agents and os.path.exists(os.path.join(self.agents_dir, agent_id, os.path.basename(DNA_FILE))):
+                self.add_agent(agent_id)
+        return len(self.agents)
+
+    def step(self, action: Optional[Callable[[CharacterSimulator], Any]] = None) -> Dict[str, Exception]:
+        """Runs `action` (the daily updates by default) for every agent; returns the agents that failed."""
+        action = action or CharacterSimulator.run_daily_updates
+        futures = {agent_id: self._step_pool.submit(action, agent) for agent_id, agent in self.agents.items()}
+        failures = {}
+        for agent_id, future in futures.items():
+            error = future.exception()
+            if error is not None:
+                print(f"DEBUG: Agent {agent_id} failed to step: {error}")
+                failures[agent_id] = error
+        self.steps += 1
+        return failures
+
+    def run(self, steps: int, action: Optional[Callable[[CharacterSimulator], Any]] = None):
+        """Steps every agent `steps` times."""
+        for _ in range(steps):
+            self.step(action)
+
+    def close(self):
+        """Waits for running steps and comment threads, then stops the worker pools."""
+        self._step_pool.shutdown(wait=True)
+        self.generation_pool.shutdown(wait=True)
@@ -0,0 +1,171 @@
+# world_log.py
+import os
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from data_handler import dumps, loads, load_json, save_json, write_atomic
+from history_store import JsonlHistoryStore, record_key
+from write_behind import writer
+
+
+class WorldLog:
+    """Write-ahead log plus periodic snapshots of the whole simulated world ("wal" storage mode).
+
+    Every change to the DNA, a history or the random events log is appended to one
+    log as a `{seq, dataset, op, ...}` line under `lock`, so the log orders changes
+    across datasets and recovery (latest snapshot + the log entries after it) always
+    lands on a state the running simulator actually passed through. A torn last
+    line is cut off on recovery.
+
+    Every `snapshot_every` entries all tracked datasets are written to one snapshot,
+    exported to their regular data files, and the log is truncated. Between
+    snapshots a change costs one appended line instead of a full-file rewrite.
+    """
+
+    def __init__(self, wal_path: str, snapshot_path: str, snapshot_every: int = 500):
+        self.wal_path = wal_path
+        self.snapshot_path = snapshot_path
+        self.snapshot_every = snapshot_every
+        self.lock = threading.RLock()
+        self._tracked: Dict[str, Tuple[Callable[[], Any], Optional[Callable[[Any], None]]]] = {}
+        self._pending: List[str] = []
+        self._seq = 0
+        self._entries_since_snapshot = 0
+        self._snapshot: Dict[str, Any] = {}
+        self._tail: Dict[str, List[Dict[str, Any]]] = {}
+        self._recover()
+
+    def _recover(self):
+        if os.path.exists(self.snapshot_path):
+            snapshot = load_json(self.snapshot_path)
+            self._seq = snapshot['seq']
+            self._snapshot = snapshot['datasets']
+        if not os.path.exists(self.wal_path):
+            return
+        good_bytes = 0
+        with open(self.wal_path, 'rb') as f:
+            for line in f:
+                try:
+                    entry = loads(line)
+                except ValueError:
+                    print(f"DEBUG: Cutting off truncated entry at byte {good_bytes} of {self.wal_path}")
+                    break
+                good_bytes += len(line)
+                if entry['seq'] <= self._seq:
+                    continue  # already part of the snapshot
+                self._tail.setdefault(entry['dataset'], []).append(entry)
+                self._seq = entry['seq']
+                self._entries_since_snapshot += 1
+        if good_bytes < os.path.getsize(self.wal_path):
+            # Later appends must not be glued onto the torn line
+            os.truncate(self.wal_path, good_bytes)
+
+    def base(self, name: str, default: Callable[[], Any]) -> Any:
+        """Returns a dataset as of the latest snapshot, or `default()` if it has never been snapshotted."""
+        return self._snapshot.pop(name) if name in self._snapshot else default()
+
+    def tail(self, name: str) -> List[Dict[str, Any]]:
+        """Returns (once) the log entries for a dataset written after the latest snapshot."""
+        return self._tail.pop(name, [])
+
+    def recover(self, name: str, default: Callable[[], Any]) -> Any:
+        """Recovers a dataset logged with `replace` and `append` entries (the DNA, the events log)."""
+        value = self.base(name, default)
+        for entry in self.tail(name):
+            if entry['op'] == 'replace':
+                value = entry['value']
+            elif entry['op'] == 'append':
+                value.setdefault(entry['field'], []).append(entry['item'])
+        return value
+
+    def track(self, name: str, get_state: Callable[[], Any], export: Optional[Callable[[Any], None]] = None):
+        """Includes a dataset in snapshots; `export` also writes it to its regular file at each snapshot."""
+        self._tracked[name] = (get_state, export)
+
+    def append(self, name: str, entry: Dict[str, Any]):
+        """Logs a change to dataset `name`. Callers hold `lock` while changing the data and logging it."""
+        with self.lock:
+            self._seq += 1
+            self._pending.append(dumps({'seq': self._seq, 'dataset': name, **entry}))
+
+    def commit(self):
+        """Schedules the logged changes to be written and fsynced."""
+        writer.schedule(self.wal_path, self.flush)
+
+    def flush(self):
+        """Appends pending entries to the log now, taking a snapshot when one is due."""
+        with self.lock:
+            pending, self._pending = self._pending, []
+            if pending:
+                with open(self.wal_path, 'a') as f:
+                    f.write('\n'.join(pending) + '\n')
+                    f.flush()
+                    os.fsync(f.fileno())
+                self._entries_since_snapshot += len(pending)
+            if self._entries_since_snapshot >= self.snapshot_every:
+                self.snapshot()
+
+    def snapshot(self):
+        """Writes every tracked dataset to a new snapshot and truncates the log."""
+        with self.lock:
+            datasets = {name: get_state() for name, (get_state, _) in self._tracked.items()}
+            write_atomic(self.snapshot_path, dumps({'seq': self._seq, 'datasets': datasets}))
+            # Everything up to self._seq, including entries not yet appended, is in the snapshot
+            self._pending = []
+            open(self.wal_path, 'w').close()
+            self._entries_since_snapshot = 0
+            for name, (_, export) in self._tracked.items():
+                if export is not None:
+                    export(datasets[name])
+        print(f"DEBUG: World snapshot written at seq {self._seq}")
+
+
+class WalHistoryStore(JsonlHistoryStore):
+    """A history whose changes go to the shared world log instead of a file of its own."""
+
+    def __init__(self, world: WorldLog, filepath: str):
+        super().__init__(filepath)
+        self.world = world
+        self.name = os.path.splitext(os.path.basename(filepath))[0]
+        # Changing a record and logging it must not interleave with a snapshot
+        self._lock = world.lock
+        world.track(self.name, lambda: self.records, lambda records: save_json(self.filepath, records))
+
+    def load(self) -> List[Dict[str, Any]]:
+        self.records = self.world.base(self.name, lambda: load_json(self.filepath))
+        self._index = {record_key(record): record for record in self.records}
+        for event in self.world.tail(self.name):
+            self._apply(event)
+        return self.records
+
+    def _changed(self, op: str, record: Dict[str, Any], **payload):
+        self.world.append(self.name, self._event(op, record, payload))
+
+    def commit(self):
+        self.world.commit()
+
+    def flush(self):
+        self.world.flush()
+
+    def compact(self):
+        self.world.snapshot()
+
+
+_world_logs: Dict[str, WorldLog] = {}
+_world_logs_lock = threading.Lock()
+
+
+def get_world_log(directory: Optional[str] = None) -> WorldLog:
+    """Returns the shared world log of a data directory (DATA_DIR by default), recovering it on first use."""
+    from config import DATA_DIR, WORLD_WAL_FILE, WORLD_SNAPSHOT_FILE, WORLD_SNAPSHOT_EVERY
+    directory = directory or DATA_DIR
+    with _world_logs_lock:
+        if directory not in _world_logs:
+            _world_logs[directory] = WorldLog(os.path.join(directory, os.path.basename(WORLD_WAL_FILE)),
+                                              os.path.join(directory, os.path.basename(WORLD_SNAPSHOT_FILE)),
+                                              WORLD_SNAPSHOT_EVERY)
+        return _world_logs[directory]
+
+
+def open_wal_store(filepath: str) -> WalHistoryStore:
+    """Returns the store for a history file path, backed by the world log of the file's directory."""
+    return WalHistoryStore(get_world_log(os.path.dirname(filepath)), filepath)
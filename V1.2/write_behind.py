@@ -0,0 +1,99 @@
+# write_behind.py
+import atexit
+import threading
+import time
+from typing import Callable, Dict, Optional
+from config import WRITE_BEHIND_ENABLED, WRITE_BEHIND_INTERVAL
+
+
+class WriteBehindWriter:
+    """Flushes dirty datasets from a background thread instead of on the request path.
+
+    `schedule(name, flush)` marks a dataset dirty; `flush` runs on the writer thread
+    once `interval` seconds have passed since the dataset first became dirty, so a
+    burst of changes results in one write. Everything still dirty is flushed on
+    `stop()` and at interpreter exit.
+    """
+
+    def __init__(self, interval: float = 1.0, enabled: bool = True):
+        self.interval = interval
+        self.enabled = enabled
+        self._dirty: Dict[str, Callable[[], None]] = {}
+        self._dirty_since: Dict[str, float] = {}
+        self._condition = threading.Condition()
+        self._stopped = False
+        self._thread: Optional[threading.Thread] = None
+        self.scheduled = 0
+        self.flushes = 0
+        atexit.register(self.stop)
+
+    def schedule(self, name: str, flush: Callable[[], None]):
+        """Marks `name` dirty; `flush` will persist it (the latest callable wins)."""
+        if not self.enabled:
+            flush()
+            return
+        with self._condition:
+            self.scheduled += 1
+            self._dirty[name] = flush
+            self._dirty_since.setdefault(name, time.monotonic())
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+            self._condition.notify_all()
+
+    def _take_due(self, force: bool = False) -> Dict[str, Callable[[], None]]:
+        now = time.monotonic()
+        due = {name: flush for name, flush in self._dirty.items()
+               if force or now - self._dirty_since[name] >= self.interval}
+        for name in due:
+            del self._dirty[name]
+            del self._dirty_since[name]
+        return due
+
+    def _run_flushes(self, due: Dict[str, Callable[[], None]]):
+        for name, flush in due.items():
+            try:
+                flush()
+                self.flushes += 1
+            except Exception as e:
+                print(f"DEBUG: Failed to flush {name}: {e}")
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._stopped and not self._dirty:
+                    self._condition.wait()
+                if self._stopped:
+                    return
+                due = self._take_due()
+                if not due:
+                    oldest = min(self._dirty_since.values())
+                    self._condition.wait(max(0.0, oldest + self.interval - time.monotonic()))
+                    continue
+            self._run_flushes(due)
+
+    def flush(self):
+        """Writes every dirty dataset now, on the calling thread."""
+        with self._condition:
+            due = self._take_due(force=True)
+        self._run_flushes(due)
+
+    def stop(self):
+        """Stops the writer thread after flushing everything that is still dirty."""
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+        with self._condition:
+            self._stopped = False
+
+    def stats(self) -> Dict[str, int]:
+        with self._condition:
+            return {"scheduled": self.scheduled, "flushes": self.flushes, "pending": len(self._dirty)}
+
+
+# Shared by every store and the simulator so all writes go through one thread
+writer = WriteBehindWriter(WRITE_BEHIND_INTERVAL, WRITE_BEHIND_ENABLED)